@@ -4,26 +4,40 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import fnmatch
+import io
 import os
+import shutil
 import sys
-from re import match, search
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from re import match, search, sub
 from subprocess import PIPE, Popen
 
 import sublime
 import sublime_plugin
 
+_load_started_at = time.time()
+
 IS_ST3 = int(sublime.version()) >= 3000
 IS_PY2 = sys.version_info[0] == 2
 
-PLUGIN_PATH = os.path.join(sublime.packages_path(), os.path.dirname(os.path.realpath(__file__)))
-
 if IS_PY2:
     # st with python 2x
     from jsprettier.const import \
+        EMBEDDED_HTML_SCOPES, \
+        MARKDOWN_CODE_BLOCK_LANGUAGES, \
+        MARKDOWN_CODE_FENCE_SCOPE, \
         PLUGIN_NAME, \
         PLUGIN_CMD_NAME, \
+        PRIORITY_BATCH, \
+        PRIORITY_INTERACTIVE, \
+        PRIORITY_SAVE, \
+        PRIORITY_SPECULATIVE, \
         SETTINGS_FILENAME, \
-        PRETTIER_OPTION_CLI_MAP
+        PRETTIER_OPTION_CLI_MAP, \
+        WORKER_MODE_OFF
 
     from jsprettier.sthelper import \
         st_status_message, \
@@ -34,12 +48,19 @@ if IS_PY2:
         scroll_view_to, \
         has_selection, \
         resolve_prettier_cli_path, \
+        resolve_node_bin_dir, \
+        resolve_workspace, \
+        get_cache_dir, \
         debug, \
         debug_enabled, \
+        log, \
         resolve_prettier_config
 
     from jsprettier.util import \
+        FormatContext, \
+        capture_login_shell_env, \
         contains, \
+        contains_path, \
         is_windows, \
         is_bool_str, \
         trim_trailing_ws_and_lines, \
@@ -47,18 +68,49 @@ if IS_PY2:
         is_str_empty_or_whitespace_only, \
         is_str_none_or_empty,\
         get_file_abs_dir, \
+        get_indentation, \
+        dedent_str, \
+        indent_str, \
+        remove_cli_args, \
         get_proc_env, \
+        reset_proc_env, \
+        set_login_shell_env, \
         resolve_prettier_ignore_path, \
         format_error_message, \
         format_debug_message, \
         parse_additional_cli_args,\
-        get_cli_arg_value
+        get_cli_arg_value, \
+        get_argv_value, \
+        get_line_range_offsets, \
+        get_first_diff_line, \
+        get_plugin_cli_args, \
+        communicate, \
+        get_proc_env_path, \
+        memoize, \
+        which
+
+    from jsprettier.stats import \
+        format_report, \
+        format_usage_report, \
+        increment, \
+        record_timing, \
+        record_usage
+
+    from jsprettier.lazy import LazyModule
 else:
     from .jsprettier.const import \
+        EMBEDDED_HTML_SCOPES, \
+        MARKDOWN_CODE_BLOCK_LANGUAGES, \
+        MARKDOWN_CODE_FENCE_SCOPE, \
         PLUGIN_NAME, \
         PLUGIN_CMD_NAME, \
+        PRIORITY_BATCH, \
+        PRIORITY_INTERACTIVE, \
+        PRIORITY_SAVE, \
+        PRIORITY_SPECULATIVE, \
         SETTINGS_FILENAME, \
-        PRETTIER_OPTION_CLI_MAP
+        PRETTIER_OPTION_CLI_MAP, \
+        WORKER_MODE_OFF
 
     from .jsprettier.sthelper import \
         st_status_message, \
@@ -69,12 +121,19 @@ else:
         scroll_view_to, \
         has_selection, \
         resolve_prettier_cli_path, \
+        resolve_node_bin_dir, \
+        resolve_workspace, \
+        get_cache_dir, \
         debug, \
         debug_enabled, \
+        log, \
         resolve_prettier_config
 
     from .jsprettier.util import \
+        FormatContext, \
+        capture_login_shell_env, \
         contains, \
+        contains_path, \
         is_windows, \
         is_bool_str, \
         trim_trailing_ws_and_lines, \
@@ -82,21 +141,166 @@ else:
         is_str_empty_or_whitespace_only, \
         is_str_none_or_empty,\
         get_file_abs_dir, \
+        get_indentation, \
+        dedent_str, \
+        indent_str, \
+        remove_cli_args, \
         get_proc_env, \
+        reset_proc_env, \
+        set_login_shell_env, \
         resolve_prettier_ignore_path, \
         format_error_message, \
         format_debug_message, \
         parse_additional_cli_args, \
-        get_cli_arg_value
+        get_cli_arg_value, \
+        get_argv_value, \
+        get_line_range_offsets, \
+        get_first_diff_line, \
+        get_plugin_cli_args, \
+        communicate, \
+        get_proc_env_path, \
+        memoize, \
+        which
+
+    from .jsprettier.stats import \
+        format_report, \
+        format_usage_report, \
+        increment, \
+        record_timing, \
+        record_usage
+
+    from .jsprettier.lazy import LazyModule
+
+# the subsystems that aren't needed to register the commands and listeners
+# are imported on first use, to keep the plugin's load time down:
+_JSPRETTIER_PACKAGE = 'jsprettier' if IS_PY2 else __package__ + '.jsprettier'
+_worker = LazyModule(_JSPRETTIER_PACKAGE + '.worker', on_load=lambda module: module.set_logger(log_worker_message))
+_jsonshard = LazyModule(_JSPRETTIER_PACKAGE + '.jsonshard')
+_nativejson = LazyModule(_JSPRETTIER_PACKAGE + '.nativejson')
+_manifest = LazyModule(_JSPRETTIER_PACKAGE + '.manifest')
+_git = LazyModule(_JSPRETTIER_PACKAGE + '.git')
+_profiler = LazyModule(_JSPRETTIER_PACKAGE + '.profiler')
+_standby = LazyModule(_JSPRETTIER_PACKAGE + '.standby')
+_markdown = LazyModule(_JSPRETTIER_PACKAGE + '.markdown')
+_probe = LazyModule(_JSPRETTIER_PACKAGE + '.probe')
+_workspace = LazyModule(_JSPRETTIER_PACKAGE + '.workspace')
+_scheduler = LazyModule(_JSPRETTIER_PACKAGE + '.scheduler')
+_trace = LazyModule(_JSPRETTIER_PACKAGE + '.trace')
+
+_login_shell_env_state = None
+_health_check_scheduled = False
+
+# speculative format results, by view id:
+_speculative_results = {}
+
+# format contexts resolved by `CommandOnSave`, taken by the `js_prettier`
+# run it triggers (see its `resolution_key` arg):
+_resolved_contexts = {}
+
+# the (content hash, format context, prettier version) keys of files known
+# to be formatted, most recent last:
+_formatted_files = OrderedDict()
+MAX_FORMATTED_FILES = 256
+
+
+def plugin_loaded():
+    settings = sublime.load_settings(SETTINGS_FILENAME)
+    settings.clear_on_change(PLUGIN_NAME)
+    settings.add_on_change(PLUGIN_NAME, on_settings_changed)
+    import_login_shell_env(settings)
+
+
+def plugin_unloaded():
+    sublime.load_settings(SETTINGS_FILENAME).clear_on_change(PLUGIN_NAME)
+    if _worker.is_loaded:
+        _worker.set_logger(None)
+        _worker.shutdown_workers()
+    if _standby.is_loaded:
+        _standby.discard_standbys()
+
+
+@memoize
+def get_plugin_path():
+    return os.path.join(sublime.packages_path(), os.path.dirname(os.path.realpath(__file__)))
+
+
+def log_worker_message(msg):
+    if sublime.load_settings(SETTINGS_FILENAME).get('debug', False):
+        log(msg)
+
+
+def schedule_worker_health_checks(interval):
+    """Periodically ping the prettier workers, and restart the failed ones.
+
+    Scheduled while there are workers, see `worker_health_check_interval`.
+    """
+    global _health_check_scheduled
+    if _health_check_scheduled or interval <= 0:
+        return
+    _health_check_scheduled = True
+
+    def run_checks():
+        global _health_check_scheduled
+        _health_check_scheduled = False
+        if not _worker.get_workers_stats():
+            return
+        thread = threading.Thread(target=_worker.check_workers_health)
+        thread.daemon = True
+        thread.start()
+        schedule_worker_health_checks(interval)
+
+    sublime.set_timeout(run_checks, interval * 1000)
+
+
+def on_settings_changed():
+    reset_proc_env()
+    # workers are restarted on demand, with the new environment:
+    if _worker.is_loaded:
+        _worker.shutdown_workers()
+    if _standby.is_loaded:
+        _standby.discard_standbys()
+    import_login_shell_env(sublime.load_settings(SETTINGS_FILENAME))
+
+
+def import_login_shell_env(settings):
+    """Capture the login shell environment in the background (once).
+
+    The captured environment seeds the cached subprocess environment,
+    so node installs managed by nvm, volta, etc. are found even when
+    Sublime Text was launched from a GUI session.
+    """
+    global _login_shell_env_state
+    if is_windows():
+        return
+    if not settings.get('import_login_shell_env', False):
+        if _login_shell_env_state is not None:
+            _login_shell_env_state = None
+            set_login_shell_env(None)
+        return
+    if _login_shell_env_state is not None:
+        # already captured, or a capture is in progress
+        return
+    _login_shell_env_state = 'capturing'
+
+    def capture():
+        global _login_shell_env_state
+        env = capture_login_shell_env()
+        if _login_shell_env_state != 'capturing':
+            # the setting was turned off in the meantime
+            return
+        _login_shell_env_state = 'captured'
+        if env:
+            set_login_shell_env(env)
 
-#
-# Monkey patch `sublime.Region` so it can be iterable:
-sublime.Region.totuple = lambda self: (self.a, self.b)
-sublime.Region.__iter__ = lambda self: self.totuple().__iter__()
+    thread = threading.Thread(target=capture)
+    thread.daemon = True
+    thread.start()
 
 
 class JsPrettierCommand(sublime_plugin.TextCommand):
     _error_message = None
+    # set when a worker reports that prettier left the code unchanged:
+    _unchanged = False
 
     @property
     def has_error(self):
@@ -104,6 +308,10 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
             return False
         return True
 
+    @property
+    def unchanged(self):
+        return self._unchanged
+
     @property
     def error_message(self):
         return self._error_message
@@ -133,6 +341,54 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
     def additional_cli_args(self):
         return get_setting(self.view, 'additional_cli_args', {})
 
+    @property
+    def worker_mode(self):
+        return get_setting(self.view, 'worker_mode', WORKER_MODE_OFF)
+
+    @property
+    def worker_service_idle_timeout(self):
+        return int(get_setting(self.view, 'worker_service_idle_timeout', 600))
+
+    @property
+    def worker_max_requests(self):
+        return int(get_setting(self.view, 'worker_max_requests', 5000))
+
+    @property
+    def worker_max_memory_mb(self):
+        return int(get_setting(self.view, 'worker_max_memory_mb', 512))
+
+    @property
+    def worker_cooldown(self):
+        return int(get_setting(self.view, 'worker_cooldown', 60))
+
+    @property
+    def worker_health_check_interval(self):
+        return int(get_setting(self.view, 'worker_health_check_interval', 30))
+
+    @property
+    def tracer(self):
+        return _trace.get_tracer(get_setting(self.view, 'trace_file', ''))
+
+    @property
+    def max_concurrent_formats(self):
+        return int(get_setting(self.view, 'max_concurrent_formats', 2))
+
+    @property
+    def large_json_shard_size(self):
+        return int(get_setting(self.view, 'large_json_shard_size', 2097152))
+
+    @property
+    def native_json_formatter(self):
+        return bool(get_setting(self.view, 'native_json_formatter', False))
+
+    @property
+    def probe_prettier_options(self):
+        return bool(get_setting(self.view, 'probe_prettier_options', True))
+
+    @property
+    def standby_prettier_process(self):
+        return bool(get_setting(self.view, 'standby_prettier_process', False))
+
     @property
     def max_file_size_limit(self):
         return int(get_setting(self.view, 'max_file_size_limit', -1))
@@ -144,9 +400,35 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
             return True
         return False
 
-    def run(self, edit, save_file=False, auto_format_prettier_config_path=None):
+    def run(self, edit, save_file=False, auto_format_prettier_config_path=None, resolution_key=None):
+        profile_request = _profiler.take_profile_request()
+        if profile_request is not None:
+            return self.run_profiled(profile_request, edit, save_file, auto_format_prettier_config_path,
+                                     resolution_key)
+        with self.tracer.span('format', file=self.view.file_name(), size=self.view.size(), save=save_file):
+            return self._run(edit, save_file, auto_format_prettier_config_path, resolution_key)
+
+    def run_profiled(self, profile_request, edit, *args):
+        """Run the format under cProfile, see `js_prettier_profile_next_format`."""
+        profiler = _profiler.FormatProfiler(profile_request['exclude_waits'])
+        try:
+            return profiler.run(self.run, edit, *args)
+        finally:
+            stats_file = profile_request['stats_file'] or _profiler.default_stats_file()
+            profiler.save(stats_file)
+            report = 'Profile saved to {0}'.format(stats_file)
+            if profiler.exclude_waits:
+                report += ' (excluding {0:.3f}s waiting for prettier)'.format(profiler.excluded)
+            report += '\n\n' + profiler.format_stats()
+            print(report)
+            window = self.view.window()
+            if window is not None:
+                show_report_panel(window, 'profile', report)
+
+    def _run(self, edit, save_file=False, auto_format_prettier_config_path=None, resolution_key=None):
         view = self.view
         source_file_path = view.file_name()
+        resolved_context = _resolved_contexts.pop(resolution_key, None) if resolution_key else None
 
         if source_file_path is None:
             #
@@ -176,95 +458,81 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
         if self.exceeds_max_file_size_limit(source_file_path):
             return st_status_message('Maximum file size reached.')
 
-        source_file_dir = get_file_abs_dir(source_file_path)
-        st_project_path = get_st_project_path()
-
-        #
-        # cd to the active sublime text project dir:
-        os.chdir(str(st_project_path))
-
-        #
-        # if a `--config <path>` option is set in 'additional_cli_args',
-        # no action is necessary. otherwise, try to sniff the config
-        # file path:
-        parsed_additional_cli_args = parse_additional_cli_args(self.additional_cli_args)
-        has_custom_config_defined = parsed_additional_cli_args.count('--config') > 0
-        has_no_config_defined = parsed_additional_cli_args.count('--no-config') > 0
-        has_config_precedence_defined = parsed_additional_cli_args.count('--config-precedence') > 0
-
-        prettier_config_path = None
-        if not has_no_config_defined:
-            if save_file and auto_format_prettier_config_path and os.path.exists(auto_format_prettier_config_path):
-                prettier_config_path = auto_format_prettier_config_path
-            if not prettier_config_path:
-                custom_prettier_config = get_cli_arg_value(self.additional_cli_args, '--config')
-                if custom_prettier_config and not os.path.exists(custom_prettier_config):
-                    prettier_config_path = custom_prettier_config
-            if not prettier_config_path:
-                prettier_config_path = resolve_prettier_config(view)
-
-        #
-        # Get node and prettier command paths:
-        node_path = self.node_path
-        prettier_cli_path = resolve_prettier_cli_path(view, PLUGIN_PATH)
-        if prettier_cli_path is None:
-            return st_status_message(
-                "Error\n\n"
-                "Command not found: 'prettier'\n\n"
-                "Ensure 'prettier' is installed in your environment PATH, "
-                "or manually specify an absolute path in your '{0}' file "
-                "and the 'prettier_cli_path' setting.".format(SETTINGS_FILENAME))
-
-        # try to find a '.prettierignore' file path in the project root
-        # if the '--ignore-path' option isn't specified in 'additional_cli_args':
-        prettier_ignore_filepath = None
-        if not parsed_additional_cli_args.count('--ignore-path') > 0:
-            prettier_ignore_filepath = resolve_prettier_ignore_path(source_file_dir, st_project_path)
-
-        #
-        # Parse prettier options:
-        prettier_options = self.parse_prettier_options(
-            view, parsed_additional_cli_args, prettier_config_path,
-            has_custom_config_defined, has_no_config_defined,
-            has_config_precedence_defined, prettier_ignore_filepath,
-            source_file_path)
+        if resolved_context is not None and resolved_context.source_file_path == source_file_path:
+            context = resolved_context
+        else:
+            context = self.resolve_format_context(view, source_file_path, save_file,
+                                                  auto_format_prettier_config_path)
+        self.tracer.annotate(resolution_handoff=context is resolved_context)
+        if context is None:
+            return
 
         #
         # Format entire file:
         if not has_selection(view) or save_file is True:
             region = sublime.Region(0, view.size())
-            source = view.substr(region)
-            if is_str_empty_or_whitespace_only(source):
-                return st_status_message('Nothing to format in file.')
-
-            transformed = self.format_code(source, node_path, prettier_cli_path, prettier_options, view)
+            # clean views are formatted from their file, without copying
+            # the buffer (source is None):
+            source = None
+            with self.tracer.span('hash_file'):
+                formatted_key = self.get_formatted_file_key(view, source_file_path, context)
+            self.tracer.annotate(from_file=formatted_key is not None)
+            if formatted_key is None:
+                source = view.substr(region)
+                if is_str_empty_or_whitespace_only(source):
+                    return st_status_message('Nothing to format in file.')
+            elif formatted_key in _formatted_files:
+                self.remember_formatted_file(formatted_key)
+                self.tracer.annotate(formatted_hit=True)
+                return st_status_message('File already formatted.')
+
+            transformed = None
+            self._unchanged = False
+            if save_file:
+                transformed = self.take_speculative_result(view, context)
+                self.tracer.annotate(speculative_hit=transformed is not None)
+            if transformed is None:
+                transformed = self.format_code(source, context, view,
+                                               priority=PRIORITY_SAVE if save_file else PRIORITY_INTERACTIVE,
+                                               source_path=source_file_path)
             if self.has_error:
                 self.format_console_error()
                 return self.show_status_bar_error()
+            if self.unchanged:
+                if source is None:
+                    self.remember_formatted_file(formatted_key)
+                return st_status_message('File already formatted.')
 
             # sanity check to ensure textual content was returned from cmd
             # stdout, not necessarily caught in OSError try/catch
             # exception handler
             if is_str_empty_or_whitespace_only(transformed):
+                if source is None and is_str_empty_or_whitespace_only(view.substr(region)):
+                    return st_status_message('Nothing to format in file.')
                 self.error_message = 'Empty content returned to stdout'
                 return self.show_status_bar_error()
 
-            source_modified = False
-            transformed = trim_trailing_ws_and_lines(transformed)
-            if transformed:
-                if transformed == trim_trailing_ws_and_lines(source):
-                    if self.ensure_newline_at_eof(view, edit) is True:
-                        # no formatting changes applied, however, a line
-                        # break was needed/inserted at the end of the file:
+            with self.tracer.span('edit_apply'):
+                source_modified = False
+                if source is None:
+                    unchanged = _manifest.hash_bytes(transformed.encode('utf-8')) == formatted_key[0]
+                    if unchanged:
+                        self.remember_formatted_file(formatted_key)
+                transformed = trim_trailing_ws_and_lines(transformed)
+                if transformed:
+                    if unchanged if source is None else transformed == trim_trailing_ws_and_lines(source):
+                        if self.ensure_newline_at_eof(view, edit) is True:
+                            # no formatting changes applied, however, a line
+                            # break was needed/inserted at the end of the file:
+                            source_modified = True
+                    else:
+                        view.replace(edit, region, transformed)
+                        self.ensure_newline_at_eof(view, edit)
                         source_modified = True
                 else:
                     view.replace(edit, region, transformed)
                     self.ensure_newline_at_eof(view, edit)
                     source_modified = True
-            else:
-                view.replace(edit, region, transformed)
-                self.ensure_newline_at_eof(view, edit)
-                source_modified = True
 
             if source_modified:
                 st_status_message('File formatted.')
@@ -283,7 +551,7 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
                 st_status_message('Nothing to format in selection.')
                 continue
 
-            transformed = self.format_code(source, node_path, prettier_cli_path, prettier_options, view)
+            transformed = self.format_code(source, context, view)
             if self.has_error:
                 self.format_console_error()
                 return self.show_status_bar_error()
@@ -299,50 +567,572 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
             if transformed and transformed == trim_trailing_ws_and_lines(source):
                 st_status_message('Selection(s) already formatted.')
             else:
-                view.replace(edit, region, transformed)
+                with self.tracer.span('edit_apply'):
+                    view.replace(edit, region, transformed)
                 st_status_message('Selection(s) formatted.')
 
-    def format_code(self, source, node_path, prettier_cli_path, prettier_options, view):
+    def resolve_format_context(self, view, source_file_path, save_file=False,
+                               auto_format_prettier_config_path=None, view_indentation=True):
+        """Resolve the project path, node and prettier paths, and the prettier options.
+
+        Prettier runs in the project dir (`FormatContext.cwd`), rather than
+        changing the working dir of the whole plugin host.
+
+        :param view_indentation: Pass the view's indentation settings to
+            prettier, or False for a file that isn't open in the view (see
+            `resolve_file_format_context()`).
+        :return: A `FormatContext`, or None if prettier can't be found.
+        """
+        tracer = self.tracer
+        source_file_dir = get_file_abs_dir(source_file_path)
+        st_project_path = get_st_project_path(view, source_file_path)
+        with tracer.span('workspace_lookup') as span:
+            workspace = resolve_workspace(view, source_file_path, st_project_path)
+            span.set(cache_hit=workspace is not None)
+
+        #
+        # if a `--config <path>` option is set in 'additional_cli_args',
+        # no action is necessary. otherwise, try to sniff the config
+        # file path:
+        parsed_additional_cli_args = parse_additional_cli_args(self.additional_cli_args)
+        has_custom_config_defined = parsed_additional_cli_args.count('--config') > 0
+        has_no_config_defined = parsed_additional_cli_args.count('--no-config') > 0
+        has_config_precedence_defined = parsed_additional_cli_args.count('--config-precedence') > 0
+
+        prettier_config_path = None
+        # the config file prettier ends up using:
+        used_config_path = None
+        if not has_no_config_defined:
+            with tracer.span('config_lookup') as span:
+                custom_prettier_config = get_cli_arg_value(self.additional_cli_args, '--config')
+                custom_config_path = None
+                if custom_prettier_config:
+                    # relative paths are relative to the project dir (the cwd of prettier):
+                    custom_config_path = os.path.join(st_project_path, custom_prettier_config)
+                    if not os.path.exists(custom_config_path):
+                        custom_config_path = None
+                if save_file and auto_format_prettier_config_path and \
+                        os.path.exists(auto_format_prettier_config_path):
+                    prettier_config_path = auto_format_prettier_config_path
+                if not prettier_config_path and custom_prettier_config and custom_config_path is None:
+                    prettier_config_path = custom_prettier_config
+                if not prettier_config_path:
+                    prettier_config_path = resolve_prettier_config(view, workspace, source_file_path)
+                used_config_path = custom_config_path if has_custom_config_defined else prettier_config_path
+                span.set(config=used_config_path)
+
+        #
+        # Get node and prettier command paths:
+        node_path = self.node_path
+        with tracer.span('cli_lookup') as span:
+            node_bin_dir = resolve_node_bin_dir(view, source_file_dir)
+            prettier_cli_path = resolve_prettier_cli_path(view, get_plugin_path(), node_bin_dir, source_file_dir,
+                                                          workspace, st_project_path)
+            span.set(prettier=prettier_cli_path, node_bin_dir=node_bin_dir)
+        if prettier_cli_path is None:
+            st_status_message(
+                "Error\n\n"
+                "Command not found: 'prettier'\n\n"
+                "Ensure 'prettier' is installed in your environment PATH, "
+                "or manually specify an absolute path in your '{0}' file "
+                "and the 'prettier_cli_path' setting.".format(SETTINGS_FILENAME))
+            return None
+
+        # the options the prettier version supports, to only pass valid options:
+        supported_options = None
+        if self.probe_prettier_options:
+            with tracer.span('probe') as span:
+                supported_options = _probe.get_probe(
+                    node_path, prettier_cli_path, os.path.join(get_cache_dir(), 'prettier-probes.json'),
+                    str(st_project_path), get_proc_env(node_bin_dir))
+                span.set(probed=supported_options is not None)
+
+        # try to find a '.prettierignore' file path in the project root
+        # if the '--ignore-path' option isn't specified in 'additional_cli_args':
+        prettier_ignore_filepath = None
+        if not parsed_additional_cli_args.count('--ignore-path') > 0:
+            if workspace is not None and workspace.ignore_path:
+                prettier_ignore_filepath = workspace.ignore_path
+            else:
+                prettier_ignore_filepath = resolve_prettier_ignore_path(source_file_dir, st_project_path)
+
+        #
+        # Parse prettier options:
+        with tracer.span('argv_build'):
+            prettier_options = self.parse_prettier_options(
+                view, parsed_additional_cli_args, prettier_config_path,
+                has_custom_config_defined, has_no_config_defined,
+                has_config_precedence_defined, prettier_ignore_filepath,
+                source_file_path, supported_options, view_indentation)
+
+        return FormatContext(
+            source_file_path=source_file_path,
+            project_path=st_project_path,
+            cwd=str(st_project_path),
+            node_path=node_path,
+            node_bin_dir=node_bin_dir,
+            prettier_cli_path=prettier_cli_path,
+            prettier_options=tuple(prettier_options),
+            prettier_config_path=used_config_path)
+
+    def resolve_file_format_context(self, source_file_path):
+        """Resolve the `FormatContext` of a file that isn't open in a view.
+
+        The plugin settings are read from this command's view (e.g. the
+        active view), but not its indentation: it's left to the file's
+        prettier config, or taken from the global preferences. Prettier
+        infers the parser from the file path.
+
+        :return: A `FormatContext`, or None if prettier can't be found.
+        """
+        context = self.resolve_format_context(self.view, source_file_path, view_indentation=False)
+        if context is None:
+            return None
+        prettier_options = remove_cli_args(context.prettier_options, ['--parser', '--stdin-filepath'])
+        return context._replace(prettier_options=tuple(prettier_options + ['--stdin-filepath', source_file_path]))
+
+    def format_line_ranges(self, source, context, line_ranges=None, priority=PRIORITY_BATCH):
+        """Format the whole source, or only some of its lines.
+
+        Line ranges are formatted bottom up, one prettier call each (with
+        the `--range-start` and `--range-end` options), so formatting a
+        range doesn't move the ranges above it.
+
+        :param line_ranges: A list of (first line, last line) tuples, 1-based
+            and inclusive, or None to format the whole source.
+        :return: The formatted code, or None on error (see `error_message`).
+        """
+        if line_ranges is None:
+            return self.format_code(source, context, self.view, interactive=False, priority=priority)
+        transformed = source
+        for first_line, last_line in sorted(line_ranges, reverse=True):
+            range_start, range_end = get_line_range_offsets(transformed, first_line, last_line)
+            range_context = context._replace(prettier_options=context.prettier_options + (
+                '--range-start', str(range_start), '--range-end', str(range_end)))
+            transformed = self.format_code(transformed, range_context, self.view, interactive=False,
+                                           priority=priority)
+            if transformed is None or self.has_error:
+                return None
+        return transformed
+
+    @staticmethod
+    def get_formatted_file_key(view, source_file_path, context):
+        """Get the key a clean view is known to be formatted by.
+
+        The buffer of a clean view is the content of its file (if it's
+        utf-8, with unix line endings, as sublime converts others on load),
+        so the file is hashed instead (see `manifest.hash_file()`).
+
+        :return: A (content hash, context, prettier version) tuple, or None
+            if the view must be formatted from its buffer.
+        """
+        if view.is_dirty() or view.size() == 0 or view.encoding() != 'UTF-8' or view.line_endings() != 'Unix':
+            return None
+        try:
+            content_hash = _manifest.hash_file(source_file_path)
+        except (IOError, OSError, ValueError):
+            return None
+        return content_hash, context, _worker.get_prettier_version(context.prettier_cli_path)
+
+    @staticmethod
+    def remember_formatted_file(formatted_key):
+        _formatted_files.pop(formatted_key, None)
+        _formatted_files[formatted_key] = True
+        while len(_formatted_files) > MAX_FORMATTED_FILES:
+            _formatted_files.popitem(last=False)
+
+    def speculative_format(self, auto_format_prettier_config_path=None, context=None):
+        """Format the entire (dirty) buffer in the background.
+
+        The result is stored with the view's change count, and picked up
+        by the next format on save if the buffer didn't change meanwhile.
+
+        :param context: The `FormatContext`, if already resolved.
+        :return: The thread formatting the buffer, or None.
+        """
+        view = self.view
+        source_file_path = view.file_name()
+        if source_file_path is None or self.exceeds_max_file_size_limit(source_file_path):
+            return
+
+        if context is None:
+            context = self.resolve_format_context(view, source_file_path, True, auto_format_prettier_config_path)
+        if context is None:
+            return
+
+        source = view.substr(sublime.Region(0, view.size()))
+        if is_str_empty_or_whitespace_only(source):
+            return
+        view_id = view.id()
+        change_count = view.change_count()
+
+        def format_in_background():
+            try:
+                with self.tracer.span('speculative_format', file=source_file_path, size=len(source)):
+                    transformed = self.format_code(source, context, view, interactive=False,
+                                                   priority=PRIORITY_SPECULATIVE)
+            except OSError:
+                return
+            if self.has_error or is_str_empty_or_whitespace_only(transformed):
+                # leave it to the format on save to report errors
+                return
+            _speculative_results[view_id] = (
+                change_count, context, transformed)
+            debug(view, 'Speculative format finished (change count {0}).'.format(change_count))
+
+        thread = threading.Thread(target=format_in_background)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def take_speculative_result(self, view, context):
+        """Get the speculative format result for the view, if still valid.
+
+        :param context: The `FormatContext` resolved for the current format,
+            which must equal the one used by the speculative format.
+        :return: The formatted code, or None.
+        """
+        speculative_result = _speculative_results.pop(view.id(), None)
+        if speculative_result is None:
+            return None
+        change_count, speculative_context, transformed = speculative_result
+        if change_count != view.change_count() or speculative_context != context:
+            return None
+        debug(view, 'Using the speculative format result (change count {0}).'.format(change_count))
         self._error_message = None
+        return transformed
 
-        if is_str_none_or_empty(node_path):
-            cmd = [prettier_cli_path] \
-                + ['--stdin'] \
-                + prettier_options
+    def format_code(self, source, context, view, interactive=True, priority=PRIORITY_INTERACTIVE, source_path=None):
+        """Format code, once the scheduler hands out a slot for its priority class.
+
+        :param source: The code to format, or None to have prettier read it
+            from source_path.
+        :param context: The `FormatContext` resolved for the source file.
+        :param priority: The scheduler priority class, see `jsprettier.scheduler`.
+        """
+        self._error_message = None
+        self._unchanged = False
+        parser = get_argv_value(context.prettier_options, '--parser')
+        self.tracer.annotate(parser=parser)
+        if source is None and self.is_json_context(context, parser) \
+                and (self.native_json_formatter or 0 < self.large_json_shard_size < os.path.getsize(source_path) // 2):
+            # the json fast paths need the code itself:
+            with io.open(source_path, encoding='utf-8') as f:
+                source = f.read()
+        # (source is still None if prettier reads the file itself)
+        if source is not None and parser == 'json' and self.native_json_formatter:
+            transformed = self.format_json_natively(source, context)
+            if transformed is not None:
+                return transformed
+        if source is not None and 0 < self.large_json_shard_size < len(source) // 2 \
+                and self.is_json_context(context, parser):
+            transformed = self.format_json_shards(source, context, view, priority)
+            if transformed is not None or self.has_error:
+                return transformed
+        return self.run_scheduled(priority, self._format_code, source, context, view, interactive, source_path)
+
+    @staticmethod
+    def is_json_context(context, parser):
+        """Check if prettier formats with the json parser (and nothing else)."""
+        options = context.prettier_options
+        if get_argv_value(options, '--range-start') is not None \
+                or get_argv_value(options, '--range-end') is not None:
+            return False
+        for pragma_option in ('--insert-pragma', '--require-pragma'):
+            # the plugin passes `--require-pragma false` without a config file
+            if pragma_option in options and get_argv_value(options, pragma_option) != 'false':
+                return False
+        if parser is not None:
+            return parser == 'json'
+        file_name = os.path.basename(context.source_file_path or '')
+        # prettier formats these with the `json-stringify` parser:
+        return file_name.endswith('.json') and file_name not in ('package.json', 'package-lock.json', 'composer.json')
+
+    def format_json_natively(self, source, context):
+        """Format json in-process, like prettier would (see `jsprettier.nativejson`).
+
+        :return: The formatted json, or None if prettier has to format it.
+        """
+        with self.tracer.span('native_json', size=len(source)) as span:
+            transformed = _nativejson.format_json(source, context.prettier_options,
+                                                  _worker.get_prettier_version(context.prettier_cli_path),
+                                                  context.cwd)
+            span.set(handled=transformed is not None)
+        increment('native_json_formats' if transformed is not None else 'native_json_fallbacks')
+        return transformed
+
+    def format_json_shards(self, source, context, view, priority):
+        """Format a large json document in shards, in parallel (see `jsprettier.jsonshard`).
+
+        :return: The formatted document, or None on error (see
+            `error_message`), or if the document can't be split.
+        """
+        with self.tracer.span('json_split', size=len(source)) as span:
+            split = _jsonshard.split_json(source, self.large_json_shard_size)
+            span.set(shards=len(split[1]) if split is not None else 0)
+        if split is None:
+            return None
+        kind, shards = split
+        formatted_shards = [None] * len(shards)
+        errors = []
+        pending = list(reversed(range(len(shards))))
+        lock = threading.Lock()
+
+        def work():
+            command = JsPrettierCommand(view)
+            while True:
+                with lock:
+                    if not pending or errors:
+                        return
+                    index = pending.pop()
+                formatted = command.run_scheduled(priority, command._format_code, shards[index], context, view, False)
+                if formatted is None or command.has_error:
+                    with lock:
+                        errors.append(command.error_message or 'Empty content returned to stdout')
+                    return
+                formatted_shards[index] = formatted
+
+        threads = [threading.Thread(target=work) for _ in range(min(self.max_concurrent_formats, len(shards)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            self.error_message = errors[0]
+            return None
+
+        with self.tracer.span('json_join'):
+            transformed = _jsonshard.join_json_shards(kind, formatted_shards)
+        if transformed is None:
+            debug(view, 'Unexpected json shard output, formatting the document as a whole.')
+        return transformed
+
+    def run_scheduled(self, priority, func, *args):
+        """Call func once the scheduler hands out a slot for the priority class.
+
+        :return: The result of func, or None if the queue is full.
+        """
+        scheduler = _scheduler.get_scheduler(self.max_concurrent_formats)
+        try:
+            with self.tracer.span('queue_wait', priority=priority):
+                with _profiler.waiting():
+                    scheduler.acquire(priority)
+        except _scheduler.SchedulerFullError as ex:
+            self.error_message = 'Format queue is full: {0}'.format(ex)
+            return None
+        try:
+            return func(*args)
+        finally:
+            scheduler.release()
+
+    def _format_code(self, source, context, view, interactive, source_path=None):
+        if self.worker_mode != WORKER_MODE_OFF:
+            transformed = self.format_code_with_worker(source, context, view, interactive=interactive,
+                                                       source_path=source_path)
+            if transformed is not None or self.has_error:
+                return transformed
+
+        if source is None:
+            # prettier reads the file itself:
+            prettier_args = remove_cli_args(context.prettier_options, ['--stdin-filepath']) + [source_path]
+            input_data = None
+        else:
+            prettier_args = ['--stdin'] + list(context.prettier_options)
+            input_data = source.encode('utf-8')
+        if is_str_none_or_empty(context.node_path):
+            cmd = [context.prettier_cli_path] \
+                + prettier_args
         else:
-            cmd = [node_path] \
-                + [prettier_cli_path] \
-                + ['--stdin'] \
-                + prettier_options
+            cmd = [context.node_path] \
+                + [context.prettier_cli_path] \
+                + prettier_args
 
+        env = get_proc_env(context.node_bin_dir)
+        # the standby process waits for its input on stdin, see `standby.StandbyProcess`:
+        use_standby = input_data is not None and self.standby_prettier_process and not is_windows()
+        binary = tuple(cmd[:len(cmd) - len(prettier_args)])
+
+        tracer = self.tracer
         try:
             format_debug_message('Prettier CLI Command', list_to_str(cmd), debug_enabled(view))
 
-            proc = Popen(
-                cmd, stdin=PIPE,
-                stderr=PIPE,
-                stdout=PIPE,
-                env=get_proc_env(),
-                shell=is_windows())
-
-            stdout, stderr = proc.communicate(input=source.encode('utf-8'))
+            with tracer.span('spawn') as span:
+                proc = _standby.take_standby(binary, cmd, context.cwd, env) if use_standby else None
+                span.set(standby=proc is not None)
+                if proc is None:
+                    proc = Popen(
+                        cmd, stdin=PIPE,
+                        stderr=PIPE,
+                        stdout=PIPE,
+                        cwd=context.cwd,
+                        env=env,
+                        shell=is_windows())
+            if use_standby:
+                # for the next format, likely of the same file (e.g. its next save):
+                _standby.spawn_standby(binary, cmd, context.cwd, env)
+
+            with tracer.span('prettier', pid=proc.pid):
+                with _profiler.waiting():
+                    stdout, stderr, usage = communicate(proc, input_data)
+            self.record_usage(context, usage)
             if proc.returncode != 0:
                 error_output = stderr.decode('utf-8')
                 self.error_message = format_error_message(error_output, str(proc.returncode))
 
                 # detect and scroll to 'Syntax Errors':
-                _, _, error_line, error_col = self.has_syntax_error(error_output)
-                if error_line != -1 and error_col != -1:
-                    scroll_view_to(view, error_line, error_col)
+                if interactive:
+                    self.scroll_to_syntax_error(view, error_output)
 
                 return None
             if stderr:
                 # allow warnings to pass-through
                 print(format_error_message(stderr.decode('utf-8'), str(proc.returncode)))
-            return stdout.decode('utf-8')
+            if source is None and not stdout.strip():
+                # prettier prints nothing for a file path its ignore file
+                # matches (from stdin, it prints the source as is)
+                self._unchanged = True
+                return u''
+            with tracer.span('decode', size=len(stdout)):
+                return stdout.decode('utf-8')
+        except OSError as ex:
+            if interactive:
+                sublime.error_message('{0} - {1}'.format(PLUGIN_NAME, ex))
+            raise
+
+    def format_code_with_worker(self, source, context, view, interactive=True, source_path=None):
+        """Format code with a warm prettier worker (see the `worker_mode` setting).
+
+        :return: The formatted code, or None on prettier errors (see
+            `error_message`), or when no worker is available, in which case
+            the prettier cli is used instead.
+        """
+        prettier_dir = _worker.find_prettier_package_dir(context.prettier_cli_path)
+        node_path = context.node_path
+        if is_str_none_or_empty(node_path):
+            node_path = which('node.exe' if is_windows() else 'node', get_proc_env_path(context.node_bin_dir))
+        if prettier_dir is None or node_path is None:
+            debug(view, 'No prettier package or node found for the worker, using the prettier cli.')
+            return None
+        schedule_worker_health_checks(self.worker_health_check_interval)
+
+        try:
+            # plugins are preloaded by the worker, so requests go to a worker
+            # with the same plugins:
+            plugin_args = get_plugin_cli_args(context.prettier_options)
+            worker = _worker.get_worker(node_path, prettier_dir, get_proc_env(context.node_bin_dir),
+                                        self.worker_mode, self.worker_service_idle_timeout, self.worker_cooldown,
+                                        plugin_args, context.cwd)
+            format_debug_message('Prettier Worker Request', list_to_str(context.prettier_options),
+                                 debug_enabled(view))
+            with self.tracer.span('prettier', worker=worker.mode, pid=worker.info.get('pid')):
+                with _profiler.waiting():
+                    transformed, error_output, usage = worker.format(
+                        list(context.prettier_options), source, context.cwd, source_path)
+        except _worker.WorkerError as ex:
+            debug(view, 'Prettier worker failed, using the prettier cli: {0}'.format(ex))
+            return None
+
+        if _worker.recycle_if_needed(worker, self.worker_max_requests, self.worker_max_memory_mb) is not None:
+            debug(view, 'Recycling prettier worker (pid {0}).'.format(worker.info.get('pid')))
+        self.record_usage(context, usage)
+
+        if error_output is not None:
+            self.error_message = format_error_message(error_output, '2')
+            if interactive:
+                self.scroll_to_syntax_error(view, error_output)
+            return None
+        if transformed is None or transformed is source:
+            self._unchanged = True
+            if transformed is None:
+                # the worker read the (formatted) file itself
+                return u''
+        return transformed
+
+    def record_usage(self, context, usage):
+        """Record the cpu time and peak rss of a prettier run (see `js_prettier_usage`)."""
+        if usage is None:
+            return
+        record_usage(context.source_file_path, context.project_path, usage)
+        self.tracer.annotate(cpu_user=usage['user'], cpu_system=usage['system'], max_rss=usage['max_rss'])
+
+    def scroll_to_syntax_error(self, view, error_output):
+        _, _, error_line, error_col = self.has_syntax_error(error_output)
+        if error_line != -1 and error_col != -1:
+            scroll_view_to(view, error_line, error_col)
+
+    def format_code_batch(self, sources, context, view, priority=PRIORITY_BATCH):
+        """Format several sources with a single prettier call.
+
+        Each source is written to a temporary file named with the file
+        extension prettier infers the parser from, and all files are then
+        formatted in place with `--write`.
+
+        :param sources: A list of (source, file extension) tuples.
+        :param context: The `FormatContext` resolved for the source file.
+        :param priority: The scheduler priority class, see `jsprettier.scheduler`.
+        :return: A list with the formatted code of each source (or None
+            when prettier failed to format it), or None on error.
+        """
+        self._error_message = None
+        return self.run_scheduled(priority, self._format_code_batch, sources, context, view)
+
+    def _format_code_batch(self, sources, context, view):
+        temp_dir = tempfile.mkdtemp(prefix='{0}-'.format(PLUGIN_NAME))
+        try:
+            temp_file_paths = []
+            for index, (source, file_ext) in enumerate(sources):
+                temp_file_path = os.path.join(temp_dir, 'block-{0}.{1}'.format(index, file_ext))
+                with io.open(temp_file_path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(source)
+                temp_file_paths.append(temp_file_path)
+
+            if is_str_none_or_empty(context.node_path):
+                cmd = [context.prettier_cli_path]
+            else:
+                cmd = [context.node_path, context.prettier_cli_path]
+            cmd += ['--write'] + list(context.prettier_options) + temp_file_paths
+
+            format_debug_message('Prettier CLI Command', list_to_str(cmd), debug_enabled(view))
+
+            tracer = self.tracer
+            with tracer.span('spawn'):
+                proc = Popen(
+                    cmd, stdin=PIPE,
+                    stderr=PIPE,
+                    stdout=PIPE,
+                    cwd=context.cwd,
+                    env=get_proc_env(context.node_bin_dir),
+                    shell=is_windows())
+            with tracer.span('prettier', pid=proc.pid, files=len(temp_file_paths)):
+                with _profiler.waiting():
+                    _, stderr, usage = communicate(proc)
+            self.record_usage(context, usage)
+            error_output = stderr.decode('utf-8')
+
+            results = []
+            with tracer.span('decode'):
+                for temp_file_path in temp_file_paths:
+                    if contains_path(temp_file_path, error_output):
+                        # prettier failed to format this source, e.g. syntax errors
+                        results.append(None)
+                        continue
+                    with io.open(temp_file_path, encoding='utf-8', newline='') as f:
+                        results.append(f.read())
+
+            if proc.returncode != 0 and None not in results:
+                # the error isn't specific to any of the sources
+                self.error_message = format_error_message(error_output, str(proc.returncode))
+                return None
+            if error_output:
+                # report per source errors and warnings:
+                print(format_error_message(error_output, str(proc.returncode)))
+            return results
         except OSError as ex:
             sublime.error_message('{0} - {1}'.format(PLUGIN_NAME, ex))
             raise
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
     def should_show_plugin(self):
         view = self.view
@@ -365,7 +1155,17 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
     def parse_prettier_options(self, view, parsed_additional_cli_args,
                                prettier_config_path, has_custom_config_defined,
                                has_no_config_defined, has_config_precedence_defined,
-                               prettier_ignore_filepath, file_name):
+                               prettier_ignore_filepath, file_name, supported_options=None,
+                               view_indentation=True):
+        """Build the prettier cli options.
+
+        :param supported_options: The options the prettier version supports
+            (see `probe.get_probe()`), to leave out the unsupported options
+            and values, or None to pass them all.
+        :param view_indentation: Set the indentation from the view, or
+            False to leave it to the prettier config, if any, and otherwise
+            take it from the global preferences.
+        """
         prettier_options = []
 
         #
@@ -397,34 +1197,13 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
             option_value = get_sub_setting(self.view, option_name)
 
             if option_name == 'parser':
-                if self.is_css(view):
-                    prettier_options.append(cli_option_name)
-                    prettier_options.append('css')
-                    continue
-
-                if self.is_typescript(view):
-                    prettier_options.append(cli_option_name)
-                    prettier_options.append('typescript')
-                    continue
-
-                if self.is_json(view):
-                    prettier_options.append(cli_option_name)
-                    prettier_options.append('json')
-                    continue
-
-                if self.is_graphql(view):
-                    prettier_options.append(cli_option_name)
-                    prettier_options.append('graphql')
-                    continue
-
-                if self.is_markdown(view):
-                    prettier_options.append(cli_option_name)
-                    prettier_options.append('markdown')
-                    continue
-
-                if self.is_vue(view):
-                    prettier_options.append(cli_option_name)
-                    prettier_options.append('vue')
+                view_parser = self.get_view_parser(view)
+                if view_parser is not None:
+                    # left out if unsupported, prettier then infers it from the file path:
+                    view_parser = _probe.get_option_value(supported_options, option_name, view_parser)
+                    if view_parser is not None:
+                        prettier_options.append(cli_option_name)
+                        prettier_options.append(view_parser)
                     continue
 
             if not prettier_config_exists and not has_custom_config_defined:
@@ -434,16 +1213,27 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
                 option_value = str(option_value).strip()
                 if is_bool_str(option_value):
                     option_value = option_value.lower()
+                option_value = _probe.get_option_value(supported_options, option_name, option_value, mapping['default'])
+                if option_value is None:
+                    continue
                 prettier_options.append(cli_option_name)
                 prettier_options.append(option_value)
 
-        # set the `tabWidth` option based on the current view:
-        prettier_options.append('--tab-width')
-        prettier_options.append(str(self.tab_size))
-
-        # set the `useTabs` option based on the current view:
-        prettier_options.append('--use-tabs')
-        prettier_options.append(str(self.use_tabs).lower())
+        if view_indentation:
+            # set the `tabWidth` option based on the current view:
+            prettier_options.append('--tab-width')
+            prettier_options.append(str(self.tab_size))
+
+            # set the `useTabs` option based on the current view:
+            prettier_options.append('--use-tabs')
+            prettier_options.append(str(self.use_tabs).lower())
+        elif not prettier_config_exists and not has_custom_config_defined:
+            # a file that isn't open in the view, without a config:
+            preferences = sublime.load_settings('Preferences.sublime-settings')
+            prettier_options.append('--tab-width')
+            prettier_options.append(str(int(preferences.get('tab_size', 2))))
+            prettier_options.append('--use-tabs')
+            prettier_options.append(str(not preferences.get('translate_tabs_to_spaces', True)).lower())
 
         # add the current file name to `--stdin-filepath`, only when
         # the current file being edited is NOT html, and in order
@@ -461,6 +1251,22 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
 
         return prettier_options
 
+    def get_view_parser(self, view):
+        """Get the parser of the view's syntax, or None to use the parser option."""
+        if self.is_css(view):
+            return 'css'
+        if self.is_typescript(view):
+            return 'typescript'
+        if self.is_json(view):
+            return 'json'
+        if self.is_graphql(view):
+            return 'graphql'
+        if self.is_markdown(view):
+            return 'markdown'
+        if self.is_vue(view):
+            return 'vue'
+        return None
+
     def format_console_error(self):
         print('\n------------------\n {0} ERROR \n------------------\n\n'
               '{1}'.format(PLUGIN_NAME, self.error_message))
@@ -577,31 +1383,606 @@ class JsPrettierCommand(sublime_plugin.TextCommand):
         return new_line_inserted
 
 
+class JsPrettierFormatEmbeddedCommand(JsPrettierCommand):
+    """Format all embedded <script> and <style> blocks of an html file.
+
+    The blocks are found by scope, and formatted with a single (batched)
+    prettier call, using the parser that matches each block's syntax.
+    """
+
+    def run(self, edit):
+        with self.tracer.span('format_embedded', file=self.view.file_name(), size=self.view.size()):
+            return self._run(edit)
+
+    def _run(self, edit):
+        view = self.view
+        source_file_path = view.file_name()
+        if source_file_path is None:
+            return st_status_message('File must first be saved.')
+
+        blocks = []
+        for region, file_ext in self.find_embedded_blocks(view):
+            source = view.substr(region)
+            if is_str_empty_or_whitespace_only(source):
+                continue
+            body, indentation, leading, trailing = self.split_embedded_block(view, region, source)
+            blocks.append((region, file_ext, source, dedent_str(body, indentation), indentation, leading, trailing))
+        if not blocks:
+            return st_status_message('No embedded script or style blocks found.')
+
+        context = self.resolve_format_context(view, source_file_path)
+        if context is None:
+            return
+
+        # the parser is inferred from each block's temp file extension, and
+        # ignore files don't apply to the temp files:
+        context = context._replace(prettier_options=tuple(remove_cli_args(
+            context.prettier_options, ('--parser', '--stdin-filepath', '--ignore-path'))))
+
+        transformed = self.format_code_batch(
+            [(block[3], block[1]) for block in blocks], context, view,
+            # the blocks of the file the user is looking at:
+            priority=PRIORITY_INTERACTIVE)
+        if self.has_error:
+            self.format_console_error()
+            return self.show_status_bar_error()
+
+        formatted_count = 0
+        failed_count = 0
+        # replace back-to-front, so the regions of preceding blocks stay valid:
+        for block, block_transformed in reversed(list(zip(blocks, transformed))):
+            region, _, source, _, indentation, leading, trailing = block
+            if is_str_empty_or_whitespace_only(block_transformed):
+                failed_count += 1
+                continue
+            block_transformed = leading \
+                + indent_str(trim_trailing_ws_and_lines(block_transformed), indentation) \
+                + trailing
+            if block_transformed != source:
+                view.replace(edit, region, block_transformed)
+                formatted_count += 1
+
+        if failed_count:
+            self.show_status_bar_error()
+        elif formatted_count:
+            st_status_message('{0} embedded block(s) formatted.'.format(formatted_count))
+        else:
+            st_status_message('Embedded blocks already formatted.')
+
+    def should_show_plugin(self):
+        return self.is_html(self.view)
+
+    @staticmethod
+    def find_embedded_blocks(view):
+        """Find the embedded script and style regions.
+
+        :return: A list of (region, file extension) tuples, in document order.
+        """
+        blocks = []
+        for selector, file_ext in EMBEDDED_HTML_SCOPES:
+            for region in view.find_by_selector(selector):
+                # only the contents of <script> and <style> elements, not
+                # inline `style="..."` attributes:
+                if region.begin() > 0 and view.substr(region.begin() - 1) == '>':
+                    blocks.append((region, file_ext))
+        return sorted(blocks, key=lambda block: block[0].begin())
+
+    def split_embedded_block(self, view, region, source):
+        """Split an embedded block into its code and surrounding whitespace.
+
+        :return: A (body, indentation, leading, trailing) tuple, where body
+            is the code with its common indentation, leading is the text to
+            put before the re-indented code, and trailing the text to put
+            after it (up to the closing tag).
+        """
+        leading_ws = source[:len(source) - len(source.lstrip())]
+        trailing_ws = source[len(source.rstrip()):]
+        tag_line = view.substr(view.line(region.begin()))
+        tag_indentation = tag_line[:len(tag_line) - len(tag_line.lstrip())]
+
+        if '\n' not in leading_ws:
+            # inline block, e.g. `<script>foo()</script>`: move the code to
+            # its own lines, indented one level deeper than the tag
+            indent_unit = '\t' if self.use_tabs else ' ' * self.tab_size
+            return source.strip(), tag_indentation + indent_unit, '\n', '\n' + tag_indentation
+
+        # drop the leading blank lines and trailing whitespace:
+        body = sub(r'^(?:[ \t]*\n)+', '', source.rstrip())
+        if '\n' in trailing_ws:
+            # keep the closing tag's indentation
+            trailing = '\n' + trailing_ws[trailing_ws.rindex('\n') + 1:]
+        else:
+            trailing = '\n' + tag_indentation
+        return body, get_indentation(body), '\n', trailing
+
+
+class JsPrettierFormatCodeBlocksCommand(JsPrettierCommand):
+    """Format all fenced code blocks of a markdown file.
+
+    The blocks are found by scope, and formatted with a single (batched)
+    prettier call, using the parser prettier infers from the file extension
+    mapped to each block's language (see `MARKDOWN_CODE_BLOCK_LANGUAGES`).
+    """
+
+    def run(self, edit):
+        with self.tracer.span('format_code_blocks', file=self.view.file_name(), size=self.view.size()):
+            return self._run(edit)
+
+    def _run(self, edit):
+        view = self.view
+        source_file_path = view.file_name()
+        if source_file_path is None:
+            return st_status_message('File must first be saved.')
+
+        blocks = self.find_code_blocks(view)
+        if not blocks:
+            return st_status_message('No code blocks to format found.')
+
+        context = self.resolve_format_context(view, source_file_path)
+        if context is None:
+            return
+
+        # the parser is inferred from each block's temp file extension, and
+        # ignore files don't apply to the temp files:
+        context = context._replace(prettier_options=tuple(remove_cli_args(
+            context.prettier_options, ('--parser', '--stdin-filepath', '--ignore-path'))))
+
+        transformed = self.format_code_batch(
+            [(dedent_str(block[2], block[3]), block[1]) for block in blocks], context, view,
+            # the blocks of the file the user is looking at:
+            priority=PRIORITY_INTERACTIVE)
+        if self.has_error:
+            self.format_console_error()
+            return self.show_status_bar_error()
+
+        formatted_count = 0
+        failed_count = 0
+        # replace back-to-front, so the regions of preceding blocks stay valid:
+        for block, block_transformed in reversed(list(zip(blocks, transformed))):
+            region, _, source, indentation = block
+            if is_str_empty_or_whitespace_only(block_transformed):
+                # e.g. syntax errors, the other blocks are still formatted
+                failed_count += 1
+                continue
+            block_transformed = indent_str(trim_trailing_ws_and_lines(block_transformed), indentation) + '\n'
+            if block_transformed != source:
+                view.replace(edit, region, block_transformed)
+                formatted_count += 1
+
+        if failed_count:
+            st_status_message('{0} code block(s) formatted, {1} failed! Open the console window to inspect '
+                              'errors.'.format(formatted_count, failed_count))
+        elif formatted_count:
+            st_status_message('{0} code block(s) formatted.'.format(formatted_count))
+        else:
+            st_status_message('Code blocks already formatted.')
+
+    def should_show_plugin(self):
+        return self.is_markdown(self.view)
+
+    @staticmethod
+    def find_code_blocks(view):
+        """Find the fenced code blocks in a language prettier formats.
+
+        Blocks following a `<!-- prettier-ignore -->` comment are skipped.
+
+        :return: A list of (region, file extension, source, indentation)
+            tuples, in document order, where region spans the lines between
+            the block's fences.
+        """
+        txt = view.substr(sublime.Region(0, view.size()))
+        positions = set(view.line(region.begin()).begin()
+                        for region in view.find_by_selector(MARKDOWN_CODE_FENCE_SCOPE))
+        blocks = []
+        for pos in sorted(positions):
+            block = _markdown.parse_code_block(txt, pos)
+            if block is None or block.language not in MARKDOWN_CODE_BLOCK_LANGUAGES \
+                    or _markdown.is_prettier_ignored(txt, pos):
+                continue
+            source = txt[block.begin:block.end]
+            if is_str_empty_or_whitespace_only(source):
+                continue
+            blocks.append((sublime.Region(block.begin, block.end), MARKDOWN_CODE_BLOCK_LANGUAGES[block.language],
+                           source, block.indentation))
+        return blocks
+
+
+def show_report_panel(window, name, report, result_file_regex=None):
+    """Show a report in an output panel.
+
+    :param result_file_regex: Makes the panel lines matching the regex
+        (with file, line and column groups) open the file on double click.
+    """
+    panel_name = '{0}_{1}'.format(PLUGIN_CMD_NAME, name)
+    if IS_ST3:
+        panel = window.create_output_panel(panel_name)
+    else:
+        panel = window.get_output_panel(panel_name)
+    if result_file_regex:
+        panel.settings().set('result_file_regex', result_file_regex)
+    panel.set_read_only(False)
+    panel.run_command('append', {'characters': report})
+    panel.set_read_only(True)
+    window.run_command('show_panel', {'panel': 'output.{0}'.format(panel_name)})
+
+
+class JsPrettierStatsCommand(sublime_plugin.WindowCommand):
+    """Show the prettier worker memory usage, recycles and counters."""
+
+    def run(self):
+        max_concurrent_formats = int(sublime.load_settings(SETTINGS_FILENAME).get('max_concurrent_formats', 2))
+        workers_stats = _worker.get_workers_stats() if _worker.is_loaded else []
+        report = format_report(workers_stats, _scheduler.get_scheduler(max_concurrent_formats).get_stats())
+        show_report_panel(self.window, 'stats', report)
+
+
+class JsPrettierUsageCommand(sublime_plugin.WindowCommand):
+    """Show the files, file extensions and projects that take the most prettier cpu time."""
+
+    def run(self, limit=20):
+        show_report_panel(self.window, 'usage', format_usage_report(limit))
+
+
+class JsPrettierProfileNextFormatCommand(sublime_plugin.WindowCommand):
+    """Run the next `js_prettier` format under cProfile.
+
+    The stats are saved to a `.pstats` file, and the top entries (by
+    cumulative time) are shown in an output panel. With `exclude_waits`,
+    the time spent waiting for prettier and for a format slot is left out.
+    """
+
+    def run(self, exclude_waits=True, stats_file=None):
+        _profiler.request_profile(exclude_waits, stats_file)
+        st_status_message('The next format will be profiled.')
+
+
+class JsPrettierReplaceCommand(sublime_plugin.TextCommand):
+    """Replace the content of the view, unless it changed since change_count."""
+
+    def run(self, edit, text, change_count):
+        view = self.view
+        if view.change_count() != change_count:
+            return
+        view.replace(edit, sublime.Region(0, view.size()), text)
+
+
+class JsPrettierFormatChangedFilesCommand(sublime_plugin.WindowCommand):
+    """Format the files changed in the git repositories of the project folders.
+
+    Modified, staged and untracked files are formatted (or only their
+    changed lines, with `changed_lines_only`), when their extension can be
+    auto formatted and they don't match `auto_format_on_save_excludes`.
+    Files are formatted concurrently, with the batch priority. Open files
+    are formatted in their views, the others are written to disk.
+    """
+
+    def run(self, changed_lines_only=False):
+        view = self.window.active_view()
+        folders = self.window.folders()
+        if view is None or not folders:
+            return st_status_message('No project folders to format the changed files of.')
+        st_status_message('Looking for changed files...')
+        thread = threading.Thread(target=self.find_changed_files, args=(view, folders, changed_lines_only))
+        thread.daemon = True
+        thread.start()
+
+    def find_changed_files(self, view, folders, changed_lines_only):
+        env = get_proc_env()
+        git_path = which('git.exe' if is_windows() else 'git', get_proc_env_path())
+        if git_path is None:
+            return st_status_message("Command not found: 'git'")
+
+        max_file_size_limit = int(get_setting(view, 'max_file_size_limit', -1))
+        repo_roots = set()
+        changes = []
+        for folder in folders:
+            repo_root = _git.find_repo_root(folder, git_path, env)
+            if repo_root is None or repo_root in repo_roots:
+                continue
+            repo_roots.add(repo_root)
+            try:
+                changed_files = _git.get_changed_files(repo_root, git_path, env)
+            except _git.GitError as ex:
+                log("Failed to get the changed files of '{0}': {1}".format(repo_root, ex))
+                continue
+            for changed_file in changed_files:
+                path = changed_file.path
+                if not any(path.startswith(os.path.join(f, '')) for f in folders) \
+                        or not is_file_auto_formattable(view, path) \
+                        or CommandOnSave.matches_excludes(view, path) \
+                        or not os.path.isfile(path) \
+                        or (max_file_size_limit != -1 and os.path.getsize(path) > max_file_size_limit):
+                    continue
+                line_ranges = None
+                if changed_lines_only:
+                    line_ranges = _git.get_changed_line_ranges(repo_root, changed_file, git_path, env)
+                    if line_ranges == []:
+                        # only deleted lines
+                        continue
+                changes.append((path, line_ranges))
+
+        if not changes:
+            return st_status_message('No changed files to format.')
+        sublime.set_timeout(lambda: self.format_files(view, changes, changed_lines_only), 0)
+
+    def format_files(self, view, changes, changed_lines_only):
+        open_views = dict((v.file_name(), v) for v in self.window.views() if v.file_name())
+        jobs = []
+        # the (path, view, change count, formatted code, status) of the skipped files:
+        skipped = []
+        for path, line_ranges in changes:
+            file_view = open_views.get(path)
+            if file_view is not None:
+                command = JsPrettierCommand(file_view)
+                context = command.resolve_format_context(file_view, path)
+                source = file_view.substr(sublime.Region(0, file_view.size()))
+                change_count = file_view.change_count()
+            else:
+                command = JsPrettierCommand(view)
+                context = command.resolve_file_format_context(path)
+                source = change_count = None
+            if context is None:
+                # prettier wasn't found, see `resolve_format_context()`
+                skipped.append((path, None, None, None, 'skipped: prettier not found'))
+                continue
+            jobs.append((command, context, file_view, source, change_count, line_ranges))
+
+        st_status_message('Formatting {0} changed file(s)...'.format(len(jobs)))
+        concurrency = max(1, JsPrettierCommand(view).max_concurrent_formats)
+        thread = threading.Thread(target=self.format_in_background,
+                                  args=(jobs, concurrency, changed_lines_only, skipped))
+        thread.daemon = True
+        thread.start()
+
+    def format_in_background(self, jobs, concurrency, changed_lines_only, skipped=()):
+        pending = list(reversed(jobs))
+        results = list(skipped)
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    job = pending.pop()
+                result = self.format_file(*job)
+                with lock:
+                    results.append(result)
+
+        threads = [threading.Thread(target=work) for _ in range(min(concurrency, len(jobs)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sublime.set_timeout(lambda: self.apply_results(results, changed_lines_only), 0)
+
+    @staticmethod
+    def format_file(command, context, file_view, source, change_count, line_ranges):
+        """Format a changed file, and write it to disk if it isn't open.
+
+        :return: A (path, view, change count, formatted code, status) tuple.
+        """
+        path = context.source_file_path
+        try:
+            if source is None:
+                with io.open(path, encoding='utf-8', newline='') as f:
+                    source = f.read()
+            transformed = command.format_line_ranges(source, context, line_ranges)
+            if transformed is None:
+                return path, None, None, None, 'failed: {0}'.format(command.error_message)
+            if transformed == source:
+                return path, None, None, None, 'unchanged'
+            if file_view is None:
+                with io.open(path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(transformed)
+        except (IOError, OSError, UnicodeError) as ex:
+            return path, None, None, None, 'failed: {0}'.format(ex)
+        return path, file_view, change_count, transformed, 'formatted'
+
+    def apply_results(self, results, changed_lines_only):
+        lines = []
+        formatted_count = 0
+        for path, file_view, change_count, transformed, status in sorted(results, key=lambda r: r[0]):
+            if file_view is not None:
+                if not file_view.is_valid() or file_view.change_count() != change_count:
+                    status = 'skipped: the view changed while formatting'
+                else:
+                    file_view.run_command('{0}_replace'.format(PLUGIN_CMD_NAME),
+                                          {'text': transformed, 'change_count': change_count})
+            if status == 'formatted':
+                formatted_count += 1
+            lines.append('{0}: {1}'.format(path, status.strip().replace('\n', '\n    ')))
+        title = 'Formatted {0} of {1} changed file(s){2}'.format(
+            formatted_count, len(results), ' (changed lines only)' if changed_lines_only else '')
+        show_report_panel(self.window, 'changed_files', title + ':\n\n' + '\n'.join(lines) + '\n')
+        st_status_message(title + '.')
+
+
+class JsPrettierCheckProjectCommand(sublime_plugin.WindowCommand):
+    """List the project files that aren't formatted, without changing them.
+
+    The results are kept in a manifest (see `jsprettier.manifest`), so the
+    next check only runs prettier on new and modified files. Files are
+    filtered like format on save, and checked concurrently with the batch
+    priority.
+    """
+
+    RESULT_FILE_REGEX = r'^(.+?):(\d+):(\d+): (.*)$'
+
+    def run(self):
+        view = self.window.active_view()
+        folders = self.window.folders()
+        if view is None or not folders:
+            return st_status_message('No project folders to check.')
+        st_status_message('Checking the project files...')
+        thread = threading.Thread(target=self.check_project, args=(view, folders))
+        thread.daemon = True
+        thread.start()
+
+    def check_project(self, view, folders):
+        folders_hash = _manifest.hash_argv(sorted(folders))
+        manifest_file = os.path.join(get_cache_dir(), 'check-{0}.json'.format(folders_hash[:16]))
+        manifest = _manifest.CheckManifest(manifest_file).load()
+        paths = self.find_files(view, folders)
+        prettier_versions = {}
+        pending = list(reversed(paths))
+        results = []
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    path = pending.pop()
+                result = self.check_file(view, manifest, prettier_versions, path)
+                with lock:
+                    results.append(result)
+
+        concurrency = max(1, JsPrettierCommand(view).max_concurrent_formats)
+        threads = [threading.Thread(target=work) for _ in range(min(concurrency, len(paths)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        manifest.retain(paths)
+        manifest.save()
+        sublime.set_timeout(lambda: self.show_results(results), 0)
+
+    @staticmethod
+    def find_files(view, folders):
+        max_file_size_limit = int(get_setting(view, 'max_file_size_limit', -1))
+        paths = set()
+        for folder in folders:
+            for root, dirs, files in os.walk(folder):
+                dirs[:] = [d for d in dirs if not d.startswith('.') and d not in _workspace.SKIPPED_DIRS]
+                for name in files:
+                    path = os.path.join(root, name)
+                    if not is_file_auto_formattable(view, path) or CommandOnSave.matches_excludes(view, path):
+                        continue
+                    if max_file_size_limit != -1 and os.path.getsize(path) > max_file_size_limit:
+                        continue
+                    paths.add(path)
+        return sorted(paths)
+
+    @staticmethod
+    def check_file(view, manifest, prettier_versions, path):
+        """Check if a file is formatted.
+
+        :return: A (path, first unformatted line, status) tuple, where the
+            line is 0 if the file is formatted, and the status is 'cached',
+            'checked' or an error message.
+        """
+        command = JsPrettierCommand(view)
+        context = command.resolve_file_format_context(path)
+        if context is None:
+            return path, 1, "Command not found: 'prettier'"
+        argv_hash = _manifest.hash_argv(remove_cli_args(context.prettier_options, ['--stdin-filepath']))
+        prettier_version = prettier_versions.get(context.prettier_cli_path)
+        if prettier_version is None:
+            prettier_version = prettier_versions[context.prettier_cli_path] = \
+                _worker.get_prettier_version(context.prettier_cli_path)
+        try:
+            stat = os.stat(path)
+            line = manifest.get_result(path, stat.st_mtime, stat.st_size, argv_hash, prettier_version)
+            if line is not None:
+                return path, line, 'cached'
+            with io.open(path, 'rb') as f:
+                data = f.read()
+            content_hash = _manifest.hash_bytes(data)
+            line = manifest.get_result(path, stat.st_mtime, stat.st_size, argv_hash, prettier_version,
+                                       content_hash)
+            if line is not None:
+                return path, line, 'cached'
+            source = data.decode('utf-8')
+            transformed = command.format_code(source, context, view, interactive=False, priority=PRIORITY_BATCH)
+            if transformed is None or command.has_error:
+                return path, 1, command.error_message or 'Empty content returned to stdout'
+            line = get_first_diff_line(source, transformed)
+            manifest.set_result(path, stat.st_mtime, stat.st_size, content_hash, argv_hash, prettier_version, line)
+            return path, line, 'checked'
+        except (IOError, OSError, UnicodeError) as ex:
+            return path, 1, str(ex)
+
+    def show_results(self, results):
+        lines = []
+        cached_count = 0
+        unformatted_count = 0
+        for path, line, status in sorted(results):
+            if status == 'cached':
+                cached_count += 1
+            if status in ('cached', 'checked'):
+                if line:
+                    unformatted_count += 1
+                    lines.append('{0}:{1}:1: not formatted'.format(path, line))
+                continue
+            lines.append('{0}:{1}:1: failed\n    {2}'.format(path, line, status.strip().replace('\n', '\n    ')))
+        title = '{0} of {1} file(s) not formatted ({2} unchanged since the last check)'.format(
+            unformatted_count, len(results), cached_count)
+        show_report_panel(self.window, 'check', title + ':\n\n' + '\n'.join(lines) + '\n',
+                          self.RESULT_FILE_REGEX)
+        st_status_message(title + '.')
+
+
 class CommandOnSave(sublime_plugin.EventListener):
     def on_pre_save(self, view):
         if self.is_allowed(view) and self.is_enabled(view) and self.is_excluded(view):
-            if self.get_auto_format_on_save_requires_prettier_config(view):
-
-                # check if '--config <filename>' is defined in 'additional_cli_args'
-                # parsed_additional_cli_args = parse_additional_cli_args(self.get_additional_cli_args(view))
-                prettier_config_path = get_cli_arg_value(self.get_additional_cli_args, '--config')
-                if not prettier_config_path or not os.path.exists(prettier_config_path):
-                    # trying to resolve the config path
-                    prettier_config_path = resolve_prettier_config(view)
-
-                if prettier_config_path and os.path.exists(prettier_config_path):
-                    debug(view, "Auto format Prettier config file found '{0}'".format(prettier_config_path))
-                    view.run_command(PLUGIN_CMD_NAME, {
-                        'save_file': True,
-                        'auto_format_prettier_config_path': prettier_config_path
-                    })
-                else:
-                    debug(view, "Auto formatting ignored - no Prettier config file found.")
-            else:
+            context = self.get_auto_format_context(view)
+            if context is not None:
+                # the command takes over the resolved context, instead of
+                # resolving it again:
+                resolution_key = '{0}:{1}'.format(view.id(), view.change_count())
+                _resolved_contexts[resolution_key] = context
                 view.run_command(PLUGIN_CMD_NAME, {
                     'save_file': True,
-                    'auto_format_prettier_config_path': None
+                    'resolution_key': resolution_key
                 })
+                _resolved_contexts.pop(resolution_key, None)
+
+    def on_modified(self, view):
+        if not self.get_speculative_format_on_idle(view):
+            return
+        if self.is_allowed(view) and self.is_enabled(view) and self.is_excluded(view):
+            change_count = view.change_count()
+            sublime.set_timeout(lambda: self.on_idle(view, change_count),
+                                self.get_speculative_format_idle_delay(view))
+
+    def on_idle(self, view, change_count):
+        """Speculatively format the buffer once the user stopped typing."""
+        if not view.is_valid() or view.change_count() != change_count or not view.is_dirty():
+            return
+        context = self.get_auto_format_context(view)
+        if context is not None:
+            JsPrettierCommand(view).speculative_format(context=context)
+
+    def on_close(self, view):
+        _speculative_results.pop(view.id(), None)
+
+    def get_auto_format_context(self, view):
+        """Resolve the `FormatContext` used to auto format on save.
+
+        The config, ignore file, cli and node paths, and the prettier
+        options, are resolved once per save, by a single resolution pass.
+
+        :return: The context, or None when auto formatting is ignored
+            because no (required) Prettier config file was found, or
+            prettier isn't found.
+        """
+        source_file_path = view.file_name()
+        if source_file_path is None:
+            return None
+        context = JsPrettierCommand(view).resolve_format_context(view, source_file_path, save_file=True)
+        if context is None:
+            return None
+        if self.get_auto_format_on_save_requires_prettier_config(view):
+            if not context.prettier_config_path:
+                debug(view, "Auto formatting ignored - no Prettier config file found.")
+                return None
+            debug(view, "Auto format Prettier config file found '{0}'".format(context.prettier_config_path))
+        return context
 
     @staticmethod
     def get_auto_format_on_save(view):
@@ -620,12 +2001,16 @@ class CommandOnSave(sublime_plugin.EventListener):
         return bool(get_setting(view, 'auto_format_on_save_requires_prettier_config', False))
 
     @staticmethod
-    def is_allowed(view):
-        return is_file_auto_formattable(view)
+    def get_speculative_format_on_idle(view):
+        return bool(get_setting(view, 'speculative_format_on_idle', False))
 
     @staticmethod
-    def get_additional_cli_args(view):
-        return dict(get_setting(view, 'additional_cli_args', {}))
+    def get_speculative_format_idle_delay(view):
+        return int(get_setting(view, 'speculative_format_idle_delay', 1000))
+
+    @staticmethod
+    def is_allowed(view):
+        return is_file_auto_formattable(view)
 
     def is_enabled(self, view):
         return self.get_auto_format_on_save(view)
@@ -634,9 +2019,21 @@ class CommandOnSave(sublime_plugin.EventListener):
         filename = view.file_name()
         if not filename:
             return False
-        excludes = self.get_auto_format_on_save_excludes(view)
+        return not self.matches_excludes(view, filename)
+
+    @classmethod
+    def matches_excludes(cls, view, filename):
+        """Check if filename matches one of the `auto_format_on_save_excludes` patterns."""
+        excludes = cls.get_auto_format_on_save_excludes(view)
         regmatch_ef = [fnmatch.translate(os.path.normpath(pattern)) for pattern in excludes]
         for regmatch in regmatch_ef:
             if match(regmatch, filename):
-                return False
-        return True
+                return True
+        return False
+
+
+if not IS_ST3:
+    # sublime text 2x doesn't call `plugin_loaded`:
+    plugin_loaded()
+
+record_timing('plugin_load', time.time() - _load_started_at)
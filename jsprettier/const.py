@@ -8,6 +8,16 @@ PROJECT_SETTINGS_KEY = PLUGIN_CMD_NAME
 SETTINGS_FILENAME = '{0}.sublime-settings'.format(PLUGIN_NAME)
 PRETTIER_OPTIONS_KEY = 'prettier_options'
 
+WORKER_MODE_OFF = 'off'
+WORKER_MODE_PROCESS = 'process'
+WORKER_MODE_SERVICE = 'service'
+
+# the scheduler's priority classes, most urgent first:
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SAVE = 1
+PRIORITY_SPECULATIVE = 2
+PRIORITY_BATCH = 3
+
 # https://prettier.io/docs/en/configuration.html
 PRETTIER_CONFIG_FILES = [
     '.prettierrc',
@@ -21,6 +31,11 @@ PRETTIER_CONFIG_FILES = [
 
 PRETTIER_IGNORE_FILE = '.prettierignore'
 
+NODE_VERSION_FILES = [
+    '.nvmrc',
+    '.node-version'
+]
+
 PRETTIER_OPTION_CLI_MAP = [
     {
         'option': 'printWidth',
@@ -74,6 +89,46 @@ PRETTIER_OPTION_CLI_MAP = [
     }
 ]
 
+# scope selectors of the code embedded in html, and the file extension
+# prettier infers the parser from:
+EMBEDDED_HTML_SCOPES = [
+    ('source.js.embedded.html', 'js'),
+    ('source.jsx.embedded.html', 'jsx'),
+    ('source.ts.embedded.html', 'ts'),
+    ('source.tsx.embedded.html', 'tsx'),
+    ('source.json.embedded.html', 'json'),
+    ('source.css.embedded.html', 'css'),
+    ('source.scss.embedded.html', 'scss'),
+    ('source.less.embedded.html', 'less')
+]
+
+# the scope of markdown's opening code fence lines:
+MARKDOWN_CODE_FENCE_SCOPE = 'meta.code-fence.definition.begin'
+
+# the file extension (prettier infers the parser from) of each markdown code
+# block language, i.e. the first word of the code fence info string:
+MARKDOWN_CODE_BLOCK_LANGUAGES = {
+    'js': 'js',
+    'javascript': 'js',
+    'mjs': 'mjs',
+    'cjs': 'cjs',
+    'jsx': 'jsx',
+    'ts': 'ts',
+    'typescript': 'ts',
+    'tsx': 'tsx',
+    'json': 'json',
+    'json5': 'json5',
+    'css': 'css',
+    'scss': 'scss',
+    'less': 'less',
+    'graphql': 'graphql',
+    'gql': 'graphql',
+    'yaml': 'yaml',
+    'yml': 'yaml',
+    'html': 'html',
+    'vue': 'vue'
+}
+
 AUTO_FORMAT_FILE_EXTENSIONS = [
     'js',
     'jsx',
@@ -0,0 +1,105 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import re
+from collections import namedtuple
+from subprocess import PIPE, Popen
+
+# a file changed in the work tree or index, or an untracked file:
+ChangedFile = namedtuple('ChangedFile', ['path', 'untracked'])
+
+_HUNK_HEADER_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+class GitError(Exception):
+    pass
+
+
+def run_git(args, cwd, git_path='git', env=None):
+    """Run a git command, and get its (decoded) output.
+
+    :raises GitError: When git fails, e.g. cwd isn't in a git repository.
+    """
+    try:
+        proc = Popen([git_path] + list(args), stdin=PIPE, stdout=PIPE, stderr=PIPE, cwd=cwd, env=env)
+        stdout, stderr = proc.communicate()
+    except OSError as ex:
+        raise GitError('Failed to run git: {0}'.format(ex))
+    if proc.returncode != 0:
+        raise GitError(stderr.decode('utf-8', 'replace').strip())
+    return stdout.decode('utf-8', 'replace')
+
+
+def find_repo_root(path, git_path='git', env=None):
+    """Get the root dir of the git repository containing path, or None."""
+    try:
+        root = run_git(['rev-parse', '--show-toplevel'], path, git_path, env).strip()
+    except GitError:
+        return None
+    return os.path.normpath(root) if root else None
+
+
+def parse_status(output, repo_root):
+    """Parse the output of `git status --porcelain -z`.
+
+    :return: A sorted list of `ChangedFile`, without deleted files.
+    """
+    changed_files = {}
+    entries = output.split('\0')
+    index = 0
+    while index < len(entries):
+        entry = entries[index]
+        index += 1
+        if len(entry) < 4:
+            continue
+        status, path = entry[:2], entry[3:]
+        if 'R' in status or 'C' in status:
+            # renames and copies are followed by the source path:
+            index += 1
+        if 'D' in status or status == '!!':
+            continue
+        path = os.path.normpath(os.path.join(repo_root, path))
+        changed_files[path] = ChangedFile(path, status == '??')
+    return [changed_files[path] for path in sorted(changed_files)]
+
+
+def get_changed_files(repo_root, git_path='git', env=None):
+    """Get the modified, staged and untracked files of a git repository."""
+    output = run_git(['status', '--porcelain', '-z', '--untracked-files=all'], repo_root, git_path, env)
+    return parse_status(output, repo_root)
+
+
+def parse_diff_hunks(output):
+    """Parse the new side line ranges of a `git diff -U0` output.
+
+    Hunks that only delete lines have no new lines, and are skipped.
+
+    :return: A list of (first line, last line) tuples, 1-based and inclusive.
+    """
+    ranges = []
+    for line in output.splitlines():
+        match = _HUNK_HEADER_RE.match(line)
+        if not match:
+            continue
+        first_line = int(match.group(1))
+        count = int(match.group(2)) if match.group(2) is not None else 1
+        if count > 0:
+            ranges.append((first_line, first_line + count - 1))
+    return ranges
+
+
+def get_changed_line_ranges(repo_root, changed_file, git_path='git', env=None):
+    """Get the line ranges of a file changed since HEAD (staged or not).
+
+    :return: A list of (first line, last line) tuples, or None if the whole
+        file is new, i.e. untracked or in a repository without commits.
+    """
+    if changed_file.untracked:
+        return None
+    try:
+        output = run_git(['diff', '-U0', '--no-color', '--no-ext-diff', 'HEAD', '--', changed_file.path],
+                         repo_root, git_path, env)
+    except GitError:
+        return None
+    return parse_diff_hunks(output)
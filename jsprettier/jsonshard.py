@@ -0,0 +1,150 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import json
+import re
+
+# a member (or an object element) added to the shards, and removed again
+# from the formatted shards, see `split_json()`:
+SHARD_KEY = '__jsprettier_shard__'
+SHARD_MEMBER = '"{0}": 0'.format(SHARD_KEY)
+SHARD_ELEMENT = '{\n' + SHARD_MEMBER + '}'
+
+_WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+def _skip_whitespace(source, pos):
+    return _WHITESPACE_RE.match(source, pos).end()
+
+
+def _scan_top_level(source):
+    """Find the top level array elements or object members of a json document.
+
+    Values are skipped with the (C accelerated) json decoder, one at a
+    time, so the document is never decoded as a whole.
+
+    :return: A (kind, spans, close position) tuple, where kind is '[' or
+        '{', and spans the (start, end) positions of each element or member,
+        or None for scalars, empty containers, arrays of numbers, comments
+        and other input that isn't strict json.
+    """
+    pos = _skip_whitespace(source, 0)
+    if pos >= len(source) or source[pos] not in '[{':
+        return None
+    kind = source[pos]
+    close = ']' if kind == '[' else '}'
+    spans = []
+    all_numbers = True
+    pos = _skip_whitespace(source, pos + 1)
+    try:
+        while True:
+            start = pos
+            if kind == '{':
+                key, pos = _decoder.raw_decode(source, pos)
+                if not isinstance(key, type(u'')):
+                    return None
+                pos = _skip_whitespace(source, pos)
+                if source[pos:pos + 1] != ':':
+                    return None
+                pos = _skip_whitespace(source, pos + 1)
+            value, pos = _decoder.raw_decode(source, pos)
+            if all_numbers and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                all_numbers = False
+            spans.append((start, pos))
+            pos = _skip_whitespace(source, pos)
+            char = source[pos:pos + 1]
+            if char == ',':
+                pos = _skip_whitespace(source, pos + 1)
+            elif char == close:
+                break
+            else:
+                return None
+    except ValueError:
+        return None
+    if kind == '[' and all_numbers:
+        # prettier fills arrays of numbers, across the whole array
+        return None
+    if source[pos + 1:].strip():
+        return None
+    return kind, spans, pos
+
+
+def split_json(source, shard_size):
+    """Split a json document into shards of top level elements or members.
+
+    Each shard is a json document by itself, which prettier formats the
+    same as the corresponding part of the whole document:
+
+    - the shards are in the same (broken) container, their elements at the
+      same indentation, with the same printed width
+    - all but the last shard end with a sentinel element or member, so
+      their last element is followed by a comma, as in the whole document
+    - the last shard of an array starts with a sentinel element, which
+      breaks the array, as the whole document doesn't fit on a line
+    - the original whitespace between elements is kept, so blank lines are
+      preserved at shard boundaries too
+
+    :param shard_size: The approximate size of each shard (in characters).
+    :return: A (kind, shards) tuple, or None if the document can't be split
+        (see `_scan_top_level()`), or would be a single shard.
+    """
+    scan = _scan_top_level(source)
+    if scan is None:
+        return None
+    kind, spans, close_pos = scan
+    groups = []
+    first = 0
+    for index, (start, end) in enumerate(spans):
+        if end - spans[first][0] >= shard_size or index == len(spans) - 1:
+            groups.append((first, index))
+            first = index + 1
+    if len(groups) < 2:
+        return None
+
+    shards = []
+    for first, last in groups[:-1]:
+        body = source[spans[first][0]:spans[last + 1][0]]
+        if kind == '[':
+            shards.append('[' + body + SHARD_ELEMENT + ']')
+        else:
+            shards.append('{\n' + body + SHARD_MEMBER + '}')
+    body = source[spans[groups[-1][0]][0]:close_pos]
+    if kind == '[':
+        shards.append('[' + SHARD_ELEMENT + ',\n' + body + ']')
+    else:
+        shards.append('{\n' + body + '}')
+    return kind, shards
+
+
+def join_json_shards(kind, formatted_shards):
+    """Stitch the formatted shards of `split_json()` back together.
+
+    :return: The formatted document, or None if a shard isn't formatted
+        as expected (e.g. by a prettier version that formats json in other
+        ways), in which case the document should be formatted as a whole.
+    """
+    close = ']' if kind == '[' else '}'
+    newline = '\r\n' if '\r\n' in formatted_shards[0] else '\n'
+    body_lines = []
+    last_index = len(formatted_shards) - 1
+    for index, formatted in enumerate(formatted_shards):
+        lines = formatted.rstrip('\r\n').split(newline)
+        if len(lines) < 3 or lines[0] != kind or lines[-1] != close:
+            return None
+        lines = lines[1:-1]
+        if kind == '[':
+            if index == last_index:
+                sentinel, lines = lines[:3], lines[3:]
+                expected = ['{', SHARD_MEMBER, '},']
+            else:
+                sentinel, lines = lines[-3:], lines[:-3]
+                expected = ['{', SHARD_MEMBER, '}']
+            if [line.strip() for line in sentinel] != expected:
+                return None
+        elif index != last_index:
+            if not lines or lines[-1].strip() != SHARD_MEMBER:
+                return None
+            lines = lines[:-1]
+        body_lines.extend(lines)
+    return kind + newline + newline.join(body_lines) + newline + close + newline
@@ -0,0 +1,50 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import importlib
+import threading
+import time
+
+from . import stats
+
+
+class LazyModule(object):
+    """A module imported on first use, i.e. on its first attribute access.
+
+    Keeps the subsystems that aren't needed to register the plugin's
+    commands and listeners (workers, caches, batch tooling) out of its load
+    time. The import time is recorded as the `import_<name>` timing.
+    """
+
+    def __init__(self, name, package=None, on_load=None):
+        """
+        :param name: The module name, relative to package if it starts with a dot.
+        :param on_load: Called with the module once it's imported.
+        """
+        self._name = name
+        self._package = package
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.RLock()
+
+    @property
+    def is_loaded(self):
+        return self._module is not None
+
+    def load(self):
+        with self._lock:
+            if self._module is None:
+                started = time.time()
+                module = importlib.import_module(self._name, self._package)
+                stats.record_timing('import_{0}'.format(self._name.rsplit('.', 1)[-1]), time.time() - started)
+                if self._on_load is not None:
+                    self._on_load(module)
+                self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        # only called for the attributes not set in `__init__()`
+        module = self._module
+        if module is None:
+            module = self.load()
+        return getattr(module, attr)
@@ -0,0 +1,119 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import threading
+
+from .const import PLUGIN_NAME
+from .util import load_json_file
+
+# bumped when the manifest format changes, older manifests are dropped:
+MANIFEST_VERSION = 1
+
+
+def hash_bytes(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Hash a file like `hash_bytes()`, without reading it into memory.
+
+    The file is memory-mapped, and hashed a chunk at a time.
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # empty files can't be mapped
+            return digest.hexdigest()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for offset in range(0, size, chunk_size):
+                digest.update(mapped[offset:offset + chunk_size])
+        finally:
+            mapped.close()
+    return digest.hexdigest()
+
+
+def hash_argv(argv):
+    return hash_bytes('\0'.join(argv).encode('utf-8'))
+
+
+class CheckManifest(object):
+    """The results of the last project check, by file path.
+
+    A result is reused while the file (mtime and size, or else content
+    hash), the prettier options (argv hash) and the prettier version are
+    the same as when the file was checked.
+    """
+
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        manifest = load_json_file(self.manifest_file)
+        if isinstance(manifest, dict) and manifest.get('version') == MANIFEST_VERSION:
+            self.entries = manifest.get('files') or {}
+        return self
+
+    def save(self):
+        with self._lock:
+            data = json.dumps({'version': MANIFEST_VERSION, 'files': self.entries})
+        temp_file = self.manifest_file + '.tmp'
+        try:
+            with io.open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(type(u'')(data))
+            if os.path.exists(self.manifest_file):
+                # os.rename() doesn't replace files on windows
+                os.remove(self.manifest_file)
+            os.rename(temp_file, self.manifest_file)
+        except (IOError, OSError) as ex:
+            print('{0}: failed to save the check manifest: {1}'.format(PLUGIN_NAME, ex))
+
+    def get_result(self, path, mtime, size, argv_hash, prettier_version, content_hash=None):
+        """Get the last result of a file, if it's still valid.
+
+        Without content_hash, the result is only valid if the file's mtime
+        and size didn't change; with it, if the content didn't change.
+
+        :return: The first line that isn't formatted (0 if the file is
+            formatted), or None if the file must be checked.
+        """
+        with self._lock:
+            entry = self.entries.get(path)
+            if entry is None or entry['argv'] != argv_hash or entry['prettier'] != prettier_version:
+                return None
+            if content_hash is None:
+                if entry['mtime'] != mtime or entry['size'] != size:
+                    return None
+            elif entry['hash'] != content_hash:
+                return None
+            else:
+                # touched, but not modified:
+                entry['mtime'] = mtime
+                entry['size'] = size
+            return entry['line']
+
+    def set_result(self, path, mtime, size, content_hash, argv_hash, prettier_version, line):
+        with self._lock:
+            self.entries[path] = {
+                'mtime': mtime,
+                'size': size,
+                'hash': content_hash,
+                'argv': argv_hash,
+                'prettier': prettier_version,
+                'line': line
+            }
+
+    def retain(self, paths):
+        """Drop the entries of files that weren't checked, e.g. deleted files."""
+        paths = set(paths)
+        with self._lock:
+            for path in [p for p in self.entries if p not in paths]:
+                del self.entries[path]
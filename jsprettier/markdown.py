@@ -0,0 +1,44 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import re
+from collections import namedtuple
+
+# a fenced code block, where begin and end are the positions of the lines
+# between its fences:
+CodeBlock = namedtuple('CodeBlock', ['language', 'indentation', 'begin', 'end'])
+
+# an opening code fence line, and the first word of its info string, e.g.
+# "```js" or "~~~ts {1,3}":
+_OPENING_FENCE_RE = re.compile(r'([ \t]*)(`{3,}|~{3,})[ \t]*([^\s`{]*)[^\n]*\n')
+_PRETTIER_IGNORE_RE = re.compile(r'[ \t]*<!--\s*prettier-ignore\s*-->[ \t]*$')
+
+
+def parse_code_block(txt, pos):
+    """Parse the fenced code block whose opening fence line starts at pos.
+
+    The block is closed by a fence of the same character, at least as long
+    as the opening fence.
+
+    :return: A `CodeBlock` (with a lower case language), or None if there's
+        no opening fence at pos, or the block isn't closed.
+    """
+    opening = _OPENING_FENCE_RE.match(txt, pos)
+    if opening is None:
+        return None
+    indentation, fence, info = opening.groups()
+    closing_re = re.compile(r'^[ \t]*{0}{{{1},}}[ \t]*$'.format(re.escape(fence[0]), len(fence)), re.M)
+    closing = closing_re.search(txt, opening.end())
+    if closing is None:
+        return None
+    return CodeBlock(info.lower(), indentation, opening.end(), closing.start())
+
+
+def is_prettier_ignored(txt, pos):
+    """Check if the line at pos follows a `<!-- prettier-ignore -->` comment.
+
+    Blank lines between the comment and the line are skipped, as prettier
+    ignores the next markdown node.
+    """
+    before = txt[:pos].rstrip()
+    return _PRETTIER_IGNORE_RE.match(before[before.rfind('\n') + 1:]) is not None
@@ -0,0 +1,482 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import io
+import os
+import re
+
+# the prettier versions whose json output is reproduced, i.e. since the
+# assignment layouts (`never-break-after-operator` for json) and the
+# concisely printed (filled) number arrays of prettier 2.3:
+MIN_PRETTIER_VERSION = (2, 3)
+MAX_PRETTIER_VERSION = (4, 0)
+
+# larger documents are left to prettier (see `large_json_shard_size`):
+MAX_SOURCE_SIZE = 1024 * 1024
+
+# prettier options that don't change how json is printed:
+_NEUTRAL_OPTIONS = frozenset([
+    '--arrow-parens',
+    '--bracket-same-line',
+    '--embedded-language-formatting',
+    '--html-whitespace-sensitivity',
+    '--jsx-bracket-same-line',
+    '--jsx-single-quote',
+    '--prose-wrap',
+    '--quote-props',
+    '--semi',
+    '--single-quote',
+    '--stdin-filepath',
+    '--vue-indent-script-and-style'
+])
+
+_OPTION_DEFAULTS = {
+    '--print-width': '80',
+    '--tab-width': '2',
+    '--use-tabs': 'false',
+    '--bracket-spacing': 'true',
+    '--end-of-line': 'lf'
+}
+
+_STRING_RE = re.compile(r'"(?:[^"\\\x00-\x1f]|\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4}))*"')
+_NUMBER_RE = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+# numbers printed as is by prettier's `printNumber()`:
+_CANONICAL_NUMBER_RE = re.compile(r'^-?(?:0|[1-9]\d*)(?:\.\d*[1-9])?(?:e-?[1-9]\d*)?$')
+_WHITESPACE_RE = re.compile(r'[ \t\n]*')
+_LITERALS = ('true', 'false', 'null')
+_TEXT_TYPES = (str, type(u''))
+
+
+class _Unsupported(Exception):
+    """Raised for input that isn't formatted exactly like prettier does."""
+
+
+#
+# Prettier's doc builders and printer (src/document), reduced to what the
+# json printer uses:
+
+class _Group(object):
+    __slots__ = ('contents', 'brk')
+
+    def __init__(self, contents, brk=False):
+        self.contents = contents
+        self.brk = brk
+
+
+class _Indent(object):
+    __slots__ = ('contents',)
+
+    def __init__(self, contents):
+        self.contents = contents
+
+
+class _Fill(object):
+    __slots__ = ('parts',)
+
+    def __init__(self, parts):
+        self.parts = parts
+
+
+class _Line(object):
+    __slots__ = ('soft', 'hard')
+
+    def __init__(self, soft=False, hard=False):
+        self.soft = soft
+        self.hard = hard
+
+
+_LINE = _Line()
+_SOFTLINE = _Line(soft=True)
+_BREAK_PARENT = object()
+_HARDLINE = [_Line(hard=True), _BREAK_PARENT]
+
+_MODE_BREAK = 1
+_MODE_FLAT = 2
+
+
+def _propagate_breaks(doc):
+    """Break the groups containing a hard line or a broken group.
+
+    :return: True if doc breaks its enclosing group.
+    """
+    if isinstance(doc, list):
+        contains_break = False
+        for part in doc:
+            contains_break = _propagate_breaks(part) or contains_break
+        return contains_break
+    if isinstance(doc, _Group):
+        if _propagate_breaks(doc.contents):
+            doc.brk = True
+        return doc.brk
+    if isinstance(doc, _Indent):
+        return _propagate_breaks(doc.contents)
+    if isinstance(doc, _Fill):
+        return _propagate_breaks(doc.parts)
+    return doc is _BREAK_PARENT
+
+
+def _fits(next_cmd, rest_cmds, width, must_be_flat):
+    rest_index = len(rest_cmds)
+    cmds = [next_cmd]
+    while width >= 0:
+        if not cmds:
+            if rest_index == 0:
+                return True
+            rest_index -= 1
+            cmds.append(rest_cmds[rest_index])
+            continue
+        ind, mode, doc = cmds.pop()
+        if isinstance(doc, _TEXT_TYPES):
+            width -= len(doc)
+        elif isinstance(doc, list):
+            for part in reversed(doc):
+                cmds.append((ind, mode, part))
+        elif isinstance(doc, _Group):
+            if must_be_flat and doc.brk:
+                return False
+            cmds.append((ind, _MODE_BREAK if doc.brk else mode, doc.contents))
+        elif isinstance(doc, _Indent):
+            cmds.append((ind + 1, mode, doc.contents))
+        elif isinstance(doc, _Fill):
+            for part in reversed(doc.parts):
+                cmds.append((ind, mode, part))
+        elif isinstance(doc, _Line):
+            if mode == _MODE_BREAK or doc.hard:
+                return True
+            if not doc.soft:
+                width -= 1
+    return False
+
+
+def _trim(out):
+    while out:
+        trimmed = out[-1].rstrip(' \t')
+        if trimmed:
+            out[-1] = trimmed
+            return
+        out.pop()
+
+
+def _print_doc(doc, print_width, indent_unit, indent_width, newline):
+    out = []
+    pos = 0
+    should_remeasure = False
+    cmds = [(0, _MODE_BREAK, doc)]
+    while cmds:
+        ind, mode, doc = cmds.pop()
+        if isinstance(doc, _TEXT_TYPES):
+            out.append(doc)
+            pos += len(doc)
+        elif isinstance(doc, list):
+            for part in reversed(doc):
+                cmds.append((ind, mode, part))
+        elif isinstance(doc, _Indent):
+            cmds.append((ind + 1, mode, doc.contents))
+        elif isinstance(doc, _Group):
+            if mode == _MODE_FLAT and not should_remeasure:
+                cmds.append((ind, _MODE_BREAK if doc.brk else _MODE_FLAT, doc.contents))
+                continue
+            should_remeasure = False
+            next_cmd = (ind, _MODE_FLAT, doc.contents)
+            if not doc.brk and _fits(next_cmd, cmds, print_width - pos, False):
+                cmds.append(next_cmd)
+            else:
+                cmds.append((ind, _MODE_BREAK, doc.contents))
+        elif isinstance(doc, _Fill):
+            _print_fill(doc.parts, ind, mode, cmds, print_width - pos)
+        elif isinstance(doc, _Line):
+            if mode == _MODE_FLAT:
+                if not doc.hard:
+                    if not doc.soft:
+                        out.append(' ')
+                        pos += 1
+                    continue
+                should_remeasure = True
+            _trim(out)
+            out.append(newline + indent_unit * ind)
+            pos = indent_width * ind
+    return ''.join(out)
+
+
+def _print_fill(parts, ind, mode, cmds, rem):
+    if not parts:
+        return
+    content = parts[0]
+    content_fits = _fits((ind, _MODE_FLAT, content), [], rem, True)
+    content_mode = _MODE_FLAT if content_fits else _MODE_BREAK
+    if len(parts) == 1:
+        cmds.append((ind, content_mode, content))
+        return
+    whitespace = parts[1]
+    if len(parts) == 2:
+        cmds.append((ind, content_mode, whitespace))
+        cmds.append((ind, content_mode, content))
+        return
+    first_and_second_fit = _fits((ind, _MODE_FLAT, [content, whitespace, parts[2]]), [], rem, True)
+    cmds.append((ind, mode, _Fill(parts[2:])))
+    cmds.append((ind, _MODE_FLAT if first_and_second_fit else _MODE_BREAK, whitespace))
+    cmds.append((ind, content_mode, content))
+
+
+#
+# Strict json parser, keeping the raw text and the positions prettier
+# uses (nodes are (type, raw text or children, start, end) tuples):
+
+def _skip_whitespace(text, pos):
+    return _WHITESPACE_RE.match(text, pos).end()
+
+
+def _parse_value(text, pos):
+    char = text[pos:pos + 1]
+    if char == '{':
+        return _parse_object(text, pos)
+    if char == '[':
+        return _parse_array(text, pos)
+    if char == '"':
+        match = _STRING_RE.match(text, pos)
+        if not match:
+            raise _Unsupported('string')
+        return ('string', match.group(), pos, match.end())
+    match = _NUMBER_RE.match(text, pos)
+    if match and match.group():
+        raw = match.group()
+        if not _CANONICAL_NUMBER_RE.match(raw):
+            # prettier normalizes these
+            raise _Unsupported('number')
+        return ('number', raw, pos, match.end())
+    for literal in _LITERALS:
+        if text.startswith(literal, pos):
+            return ('literal', literal, pos, pos + len(literal))
+    raise _Unsupported('value')
+
+
+def _parse_items(text, pos, close, parse_item):
+    items = []
+    pos = _skip_whitespace(text, pos + 1)
+    if text[pos:pos + 1] == close:
+        return items, pos + 1
+    while True:
+        item = parse_item(text, pos)
+        items.append(item)
+        pos = _skip_whitespace(text, item[3])
+        char = text[pos:pos + 1]
+        if char == close:
+            return items, pos + 1
+        if char != ',':
+            raise _Unsupported('separator')
+        pos = _skip_whitespace(text, pos + 1)
+
+
+def _parse_property(text, pos):
+    match = _STRING_RE.match(text, pos)
+    if not match:
+        raise _Unsupported('key')
+    colon_pos = _skip_whitespace(text, match.end())
+    if text[colon_pos:colon_pos + 1] != ':':
+        raise _Unsupported('colon')
+    value = _parse_value(text, _skip_whitespace(text, colon_pos + 1))
+    return ('property', (match.group(), value), pos, value[3])
+
+
+def _parse_object(text, pos):
+    properties, end = _parse_items(text, pos, '}', _parse_property)
+    return ('object', properties, pos, end)
+
+
+def _parse_array(text, pos):
+    elements, end = _parse_items(text, pos, ']', _parse_value)
+    return ('array', elements, pos, end)
+
+
+def _parse(text):
+    pos = _skip_whitespace(text, 0)
+    if pos == len(text):
+        raise _Unsupported('empty')
+    node = _parse_value(text, pos)
+    if _skip_whitespace(text, node[3]) != len(text):
+        raise _Unsupported('trailing content')
+    return node
+
+
+#
+# Prettier's estree printer, for json nodes:
+
+def _is_next_line_empty(text, index):
+    """Port of prettier's `isNextLineEmptyAfterIndex()`, without comments."""
+    length = len(text)
+    while index < length and text[index] in ',; \t':
+        index += 1
+    if index < length and text[index] == '\n':
+        index += 1
+    newline_index = index
+    while newline_index < length and text[newline_index] in ' \t':
+        newline_index += 1
+    return newline_index < length and text[newline_index] == '\n'
+
+
+def _is_number(node):
+    return node[0] == 'number'
+
+
+def _print_node(node, text, bracket_spacing):
+    kind = node[0]
+    if kind == 'object':
+        return _print_object(node, text, bracket_spacing)
+    if kind == 'array':
+        return _print_array(node, text, bracket_spacing)
+    return node[1]
+
+
+def _print_object(node, text, bracket_spacing):
+    properties = node[1]
+    if not properties:
+        return '{}'
+    parts = []
+    separator = []
+    for prop in properties:
+        key, value = prop[1]
+        parts.extend(separator)
+        # the `never-break-after-operator` assignment layout of json:
+        parts.append(_Group(_Group([_Group(key), ':', ' ', _print_node(value, text, bracket_spacing)])))
+        separator = [',', _LINE]
+        if _is_next_line_empty(text, prop[3]):
+            separator.append(_HARDLINE)
+    # objects with a newline before their first property stay expanded:
+    should_break = '\n' in text[node[2]:properties[0][2]]
+    line = _LINE if bracket_spacing else _SOFTLINE
+    return _Group(['{', _Indent([line] + parts), line, '}'], should_break)
+
+
+def _is_breaking_element(elements, index):
+    """Check if an element is an object (or array) of 2+ entries, followed by one of the same kind."""
+    element = elements[index]
+    if element[0] not in ('object', 'array') or len(element[1]) <= 1:
+        return False
+    return index == len(elements) - 1 or elements[index + 1][0] == element[0]
+
+
+def _print_array(node, text, bracket_spacing):
+    elements = node[1]
+    if not elements:
+        return '[]'
+    should_break = len(elements) > 1 and all(_is_breaking_element(elements, i) for i in range(len(elements)))
+
+    if len(elements) > 1 and all(_is_number(element) for element in elements):
+        # concisely printed (filled) arrays of numbers:
+        parts = []
+        for index, element in enumerate(elements):
+            is_last = index == len(elements) - 1
+            parts.append([element[1], '' if is_last else ','])
+            if not is_last:
+                parts.append([_HARDLINE, _HARDLINE] if _is_next_line_empty(text, element[3]) else _LINE)
+        items = _Fill(parts)
+    else:
+        items = []
+        separator = []
+        for element in elements:
+            items.extend(separator)
+            items.append(_Group(_print_node(element, text, bracket_spacing)))
+            separator = [',', _LINE]
+            if _is_next_line_empty(text, element[3]):
+                separator.append(_SOFTLINE)
+    return _Group(['[', _Indent([_SOFTLINE, items]), _SOFTLINE, ']'], should_break)
+
+
+#
+# Options:
+
+def parse_version(version):
+    """Parse a version string, e.g. '2.8.8' -> (2, 8, 8), or None."""
+    match = re.match(r'^(\d+)\.(\d+)(?:\.(\d+))?', version or '')
+    if not match:
+        return None
+    return tuple(int(part or 0) for part in match.groups())
+
+
+def _has_ignore_patterns(ignore_path):
+    try:
+        with io.open(ignore_path, encoding='utf-8') as f:
+            return any(line.strip() and not line.startswith('#') for line in f)
+    except (IOError, OSError, ValueError):
+        return False
+
+
+def _parse_options(argv, cwd):
+    options = dict(_OPTION_DEFAULTS)
+    index = 0
+    while index < len(argv):
+        name = argv[index]
+        value = None
+        if index + 1 < len(argv) and not str(argv[index + 1]).startswith('--'):
+            value = argv[index + 1]
+            index += 1
+        index += 1
+        if name in _NEUTRAL_OPTIONS:
+            continue
+        if name == '--no-config':
+            options[name] = True
+        elif name == '--parser':
+            if value != 'json':
+                raise _Unsupported('parser')
+        elif name == '--trailing-comma':
+            if value != 'none':
+                raise _Unsupported(name)
+        elif name in ('--require-pragma', '--insert-pragma'):
+            if value != 'false':
+                raise _Unsupported(name)
+        elif name == '--ignore-path':
+            # the ignore patterns aren't matched here
+            if value and _has_ignore_patterns(os.path.join(cwd or '', value)):
+                raise _Unsupported(name)
+        elif name in _OPTION_DEFAULTS and value is not None:
+            options[name] = value
+        else:
+            raise _Unsupported(name)
+    if not options.get('--no-config'):
+        # the options could come from a config file, or .editorconfig
+        raise _Unsupported('config')
+    return options
+
+
+def format_json(source, argv, prettier_version, cwd=None):
+    """Format json like prettier's `json` parser, without running prettier.
+
+    Only strict json, in ascii (so the printed width of each character is
+    1), formatted with the options given in argv (i.e. `--no-config`) is
+    handled; everything else is left to prettier.
+
+    :param argv: The prettier cli options, see `FormatContext.prettier_options`.
+    :param prettier_version: The version of the prettier that would format
+        the source, see `MIN_PRETTIER_VERSION`.
+    :param cwd: The dir relative paths in argv are relative to.
+    :return: The formatted json, or None if prettier has to format it.
+    """
+    version = parse_version(prettier_version)
+    if version is None or not MIN_PRETTIER_VERSION <= version < MAX_PRETTIER_VERSION:
+        return None
+    if len(source) > MAX_SOURCE_SIZE:
+        return None
+    try:
+        source.encode('ascii')
+    except UnicodeError:
+        return None
+    try:
+        options = _parse_options(list(argv), cwd)
+        print_width = int(options['--print-width'])
+        tab_width = int(options['--tab-width'])
+        use_tabs = options['--use-tabs'] == 'true'
+        bracket_spacing = options['--bracket-spacing'] != 'false'
+        newline = {'lf': '\n', 'crlf': '\r\n', 'cr': '\r'}.get(options['--end-of-line'])
+        if newline is None:
+            # 'auto': guessed from the first line ending
+            first_cr = source.find('\r')
+            newline = '\n' if first_cr == -1 else ('\r\n' if source[first_cr + 1:first_cr + 2] == '\n' else '\r')
+
+        text = source.replace('\r\n', '\n').replace('\r', '\n')
+        doc = [_print_node(_parse(text), text, bracket_spacing), _HARDLINE]
+        _propagate_breaks(doc)
+    except (_Unsupported, ValueError, RuntimeError):
+        # RuntimeError: too deeply nested for the recursive parser
+        return None
+    indent_unit = '\t' if use_tabs else ' ' * tab_width
+    return _print_doc(doc, print_width, indent_unit, tab_width, newline)
@@ -0,0 +1,261 @@
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import with_statement
+
+import io
+import os
+from re import match, sub
+
+from .const import NODE_VERSION_FILES
+from .util import \
+    _climb_dirs, \
+    _list_dir, \
+    is_windows, \
+    load_json_file
+
+# https://github.com/nodejs/Release/blob/master/CODENAMES.md
+NODE_LTS_CODENAMES = {
+    'argon': 4,
+    'boron': 6,
+    'carbon': 8,
+    'dubnium': 10,
+    'erbium': 12,
+    'fermium': 14,
+    'gallium': 16,
+    'hydrogen': 18,
+    'iron': 20,
+    'jod': 22
+}
+
+_version_file_cache = {}
+_runtime_cache = {}
+
+
+def find_node_version_spec(start_dir, limit=100):
+    """Find the node version pinned for the project of start_dir.
+
+    Walks up the file hierarchy from start_dir (using the same cached
+    directory listings as the config file discovery), checking each
+    directory for a `.nvmrc` or `.node-version` file, or a `package.json`
+    with a `volta.node` or `engines.node` entry. The nearest pin wins.
+
+    :param start_dir: The search start path.
+    :return: A (version spec, pin file path) tuple, or (None, None).
+    """
+    for d in _climb_dirs(start_dir, limit=limit):
+        names = _list_dir(d)
+        for version_file in NODE_VERSION_FILES:
+            if version_file in names:
+                version_file_path = os.path.join(d, version_file)
+                spec = _read_version_file(version_file_path)
+                if spec:
+                    return spec, version_file_path
+        if 'package.json' in names:
+            package_json_path = os.path.join(d, 'package.json')
+            spec = _package_json_node_spec(package_json_path)
+            if spec:
+                return spec, package_json_path
+    return None, None
+
+
+def _read_version_file(version_file_path):
+    try:
+        mtime = os.stat(version_file_path).st_mtime
+    except OSError:
+        return None
+    cached = _version_file_cache.get(version_file_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    spec = None
+    try:
+        with io.open(version_file_path, encoding='utf-8') as f:
+            for line in f:
+                # ignore comments and blank lines:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    spec = line
+                    break
+    except (IOError, OSError, ValueError):
+        pass
+    _version_file_cache[version_file_path] = (mtime, spec)
+    return spec
+
+
+def _package_json_node_spec(package_json_path):
+    json_data = load_json_file(package_json_path)
+    if not isinstance(json_data, dict):
+        return None
+    for key in ('volta', 'engines'):
+        section = json_data.get(key)
+        if isinstance(section, dict) and section.get('node'):
+            return str(section.get('node')).strip()
+    return None
+
+
+def parse_version(version_str):
+    """Parse a version string like 'v16.3.0' into a tuple of ints.
+
+    :return: The version tuple, or None if the string isn't a version.
+    """
+    m = match(r'^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?', version_str.strip())
+    if not m:
+        return None
+    return tuple(int(part) for part in m.groups() if part is not None)
+
+
+def _version_dirs(versions_dir, bin_subdir):
+    """Generate (version, bin dir) tuples for a version manager's install dir."""
+    if not versions_dir:
+        return
+    for name in _list_dir(versions_dir):
+        version = parse_version(name)
+        if version is None or len(version) != 3:
+            continue
+        bin_dir = os.path.join(versions_dir, name, bin_subdir) if bin_subdir else os.path.join(versions_dir, name)
+        yield version, bin_dir
+
+
+def _version_manager_dirs():
+    """The install locations of common node version managers.
+
+    :return: A list of (versions dir, relative bin dir) tuples.
+    """
+    home = os.path.expanduser('~')
+    env = os.environ
+    if is_windows():
+        nvm_home = env.get('NVM_HOME') or os.path.join(env.get('APPDATA', home), 'nvm')
+        return [
+            (nvm_home, ''),
+            (os.path.join(env.get('VOLTA_HOME') or os.path.join(env.get('LOCALAPPDATA', home), 'Volta'),
+                          'tools', 'image', 'node'), ''),
+            (os.path.join(env.get('FNM_DIR') or os.path.join(env.get('APPDATA', home), 'fnm'), 'node-versions'),
+             'installation')
+        ]
+    return [
+        (os.path.join(env.get('NVM_DIR') or os.path.join(home, '.nvm'), 'versions', 'node'), 'bin'),
+        (os.path.join(env.get('VOLTA_HOME') or os.path.join(home, '.volta'), 'tools', 'image', 'node'), 'bin'),
+        (os.path.join(env.get('NODENV_ROOT') or os.path.join(home, '.nodenv'), 'versions'), 'bin'),
+        (os.path.join(env.get('FNM_DIR') or os.path.join(home, '.fnm'), 'node-versions'),
+         os.path.join('installation', 'bin')),
+        (os.path.join(home, '.local', 'share', 'fnm', 'node-versions'), os.path.join('installation', 'bin')),
+        (os.path.join(env.get('ASDF_DATA_DIR') or os.path.join(home, '.asdf'), 'installs', 'nodejs'), 'bin'),
+        (os.path.join(env.get('N_PREFIX') or '/usr/local', 'n', 'versions', 'node'), 'bin')
+    ]
+
+
+def find_installed_node_versions():
+    """Find the node runtimes installed by the common version managers.
+
+    :return: A list of (version tuple, bin dir) tuples, highest version first.
+    """
+    node_exe = 'node.exe' if is_windows() else 'node'
+    installed = {}
+    for versions_dir, bin_subdir in _version_manager_dirs():
+        for version, bin_dir in _version_dirs(versions_dir, bin_subdir):
+            if version not in installed and os.path.isfile(os.path.join(bin_dir, node_exe)):
+                installed[version] = bin_dir
+    return sorted(installed.items(), reverse=True)
+
+
+def _satisfies_comparator(version, comparator):
+    m = match(r'^(\^|~|>=|<=|>|<|=)?\s*v?([\dxX*]+(?:\.[\dxX*]+){0,2})$', comparator)
+    if not m:
+        return False
+    operator = m.group(1) or '='
+    parts = m.group(2).split('.')
+    wanted = []
+    for part in parts:
+        if part in ('x', 'X', '*'):
+            break
+        wanted.append(int(part))
+    wanted = tuple(wanted)
+    if not wanted:
+        return True
+    padded = wanted + (0,) * (3 - len(wanted))
+    if operator == '=':
+        return version[:len(wanted)] == wanted
+    if operator == '^':
+        # allow changes that don't modify the left-most non-zero part:
+        lock = len(wanted)
+        for i, part in enumerate(wanted):
+            if part != 0:
+                lock = i + 1
+                break
+        return version >= padded and version[:lock] == wanted[:lock]
+    if operator == '~':
+        lock = min(2, len(wanted))
+        return version >= padded and version[:lock] == wanted[:lock]
+    if operator == '>=':
+        return version >= padded
+    if operator == '>':
+        return version[:len(wanted)] > wanted
+    if operator == '<':
+        return version < padded
+    if operator == '<=':
+        return version[:len(wanted)] <= wanted
+    return False
+
+
+def satisfies(version, spec):
+    """Check if a version satisfies a (simplified) semver range spec.
+
+    Supports exact and partial versions ('16', '16.3'), x-ranges ('16.x'),
+    the ^, ~, >, >=, <, <= operators, space separated comparator sets and
+    '||' alternatives.
+
+    :param version: The version tuple.
+    :param spec: The version spec str.
+    """
+    for alternative in spec.split('||'):
+        # '>= 14' -> '>=14'
+        comparators = sub(r'([<>=^~])\s+', r'\1', alternative).split()
+        if comparators and all(_satisfies_comparator(version, c) for c in comparators):
+            return True
+    return False
+
+
+def match_node_version(spec, installed_versions):
+    """Pick the highest installed node runtime matching a version spec.
+
+    :param spec: The version spec, e.g. from a `.nvmrc` file.
+    :param installed_versions: A list of (version tuple, bin dir) tuples, highest first.
+    :return: The matched runtime's bin dir, or None.
+    """
+    spec = spec.strip().lower()
+    if not installed_versions:
+        return None
+    if spec in ('node', 'stable', 'latest', 'current'):
+        return installed_versions[0][1]
+    if spec.startswith('lts/'):
+        codename = spec[4:]
+        for version, bin_dir in installed_versions:
+            if codename == '*' and version[0] % 2 == 0 and version[0] >= 4:
+                return bin_dir
+            if NODE_LTS_CODENAMES.get(codename) == version[0]:
+                return bin_dir
+        return None
+    for version, bin_dir in installed_versions:
+        if satisfies(version, spec):
+            return bin_dir
+    return None
+
+
+def resolve_node_runtime(start_dir):
+    """Resolve the node runtime pinned for the project of start_dir.
+
+    The result is cached per pin file, until the pin file or the list of
+    installed runtimes changes.
+
+    :param start_dir: The search start path, i.e. the source file's dir.
+    :return: The bin dir of the matched node runtime, or None.
+    """
+    spec, pin_file = find_node_version_spec(start_dir)
+    if not spec:
+        return None
+    installed_versions = find_installed_node_versions()
+    cache_key = (pin_file, spec, tuple(installed_versions))
+    if cache_key in _runtime_cache:
+        return _runtime_cache[cache_key]
+    node_bin_dir = match_node_version(spec, installed_versions)
+    _runtime_cache[cache_key] = node_bin_dir
+    return node_bin_dir
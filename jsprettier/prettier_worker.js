@@ -0,0 +1,595 @@
+/*
+ * JsPrettier worker: a long-lived node process that keeps Prettier loaded.
+ *
+ * Messages are JSON objects framed by a 4-byte (big-endian) length header.
+ * The same framing is used on stdio, and on the connections of the shared
+ * service's unix domain socket.
+ *
+ * Usage:
+ *
+ *     node prettier_worker.js --prettier <dir> [--socket <path> [--idle-timeout <seconds>]]
+ *         [--plugin <name or path>]... [--plugin-search-dir <dir>]... [--plugin-cwd <dir>]
+ *
+ * The plugins are loaded once, on start, and used for the requests with
+ * the same `--plugin` options.
+ */
+
+'use strict';
+
+var fs = require('fs');
+var net = require('net');
+var path = require('path');
+
+var HEADER_SIZE = 4;
+
+function parseWorkerArgs(argv) {
+    var args = {prettier: null, socket: null, idleTimeout: 600, plugins: [], pluginSearchDirs: [], pluginCwd: null};
+    for (var i = 0; i < argv.length; i++) {
+        if (argv[i] === '--prettier') {
+            args.prettier = argv[++i];
+        } else if (argv[i] === '--socket') {
+            args.socket = argv[++i];
+        } else if (argv[i] === '--idle-timeout') {
+            args.idleTimeout = Number(argv[++i]);
+        } else if (argv[i] === '--plugin') {
+            args.plugins.push(argv[++i]);
+        } else if (argv[i] === '--plugin-search-dir') {
+            args.pluginSearchDirs.push(argv[++i]);
+        } else if (argv[i] === '--plugin-cwd') {
+            args.pluginCwd = argv[++i];
+        }
+    }
+    return args;
+}
+
+var workerArgs = parseWorkerArgs(process.argv.slice(2));
+
+// plugins, or prettier itself, must never write to stdout, as it's used
+// for framed messages:
+var stdoutWrite = process.stdout.write.bind(process.stdout);
+console.log = console.error;
+console.info = console.error;
+console.warn = console.error;
+
+var prettier = require(workerArgs.prettier);
+
+// Load the plugins like prettier does (relative to the cwd, or in the
+// search dirs), or leave them to prettier (e.g. es module plugins):
+function preloadPlugins(names, searchDirs, cwd) {
+    var paths = [cwd].concat(searchDirs.map(function (dir) {
+        return path.resolve(cwd, dir);
+    }));
+    return names.map(function (name) {
+        try {
+            return require(require.resolve(name, {paths: paths}));
+        } catch (error) {
+            console.error('Failed to preload plugin ' + name + ': ' + error.message);
+            return name;
+        }
+    });
+}
+
+var preloadedPlugins = preloadPlugins(workerArgs.plugins, workerArgs.pluginSearchDirs,
+    workerArgs.pluginCwd || process.cwd());
+
+// the preloaded plugins, if the request has the worker's plugin options:
+function getPlugins(request) {
+    var same = request.plugins.length === workerArgs.plugins.length &&
+        request.plugins.every(function (name, i) {
+            return name === workerArgs.plugins[i];
+        });
+    return same ? preloadedPlugins : request.plugins;
+}
+
+//
+// Framing
+
+function encodeFrame(message) {
+    var payload = Buffer.from(JSON.stringify(message), 'utf8');
+    var header = Buffer.alloc(HEADER_SIZE);
+    header.writeUInt32BE(payload.length, 0);
+    return Buffer.concat([header, payload]);
+}
+
+function FrameReader(onMessage) {
+    var buffered = Buffer.alloc(0);
+    return function (chunk) {
+        buffered = Buffer.concat([buffered, chunk]);
+        while (buffered.length >= HEADER_SIZE) {
+            var size = buffered.readUInt32BE(0);
+            if (buffered.length < HEADER_SIZE + size) {
+                break;
+            }
+            var payload = buffered.slice(HEADER_SIZE, HEADER_SIZE + size);
+            buffered = buffered.slice(HEADER_SIZE + size);
+            onMessage(JSON.parse(payload.toString('utf8')));
+        }
+    };
+}
+
+//
+// Prettier cli args -> api options
+
+function camelCase(name) {
+    return name.replace(/-([a-z])/g, function (_, c) {
+        return c.toUpperCase();
+    });
+}
+
+function coerceValue(value) {
+    if (value === undefined || value === 'true') {
+        return true;
+    }
+    if (value === 'false') {
+        return false;
+    }
+    if (/^-?\d+$/.test(value)) {
+        return Number(value);
+    }
+    return value;
+}
+
+function parseCliArgs(argv, cwd) {
+    var request = {
+        options: {},
+        config: null,
+        noConfig: false,
+        configPrecedence: 'cli-override',
+        ignorePath: null,
+        filepath: null,
+        editorconfig: true,
+        withNodeModules: false,
+        plugins: [],
+        pluginSearchDirs: []
+    };
+    for (var i = 0; i < argv.length; i++) {
+        var arg = String(argv[i]);
+        if (arg.indexOf('--') !== 0) {
+            continue;
+        }
+        var name = arg.slice(2);
+        var value = undefined;
+        if (i + 1 < argv.length && String(argv[i + 1]).indexOf('--') !== 0) {
+            value = String(argv[++i]);
+        }
+        switch (name) {
+            case 'stdin':
+                break;
+            case 'config':
+                request.config = path.resolve(cwd, value);
+                break;
+            case 'no-config':
+                request.noConfig = true;
+                break;
+            case 'config-precedence':
+                request.configPrecedence = value;
+                break;
+            case 'ignore-path':
+                request.ignorePath = path.resolve(cwd, value);
+                break;
+            case 'stdin-filepath':
+                request.filepath = path.resolve(cwd, value);
+                break;
+            case 'no-editorconfig':
+                request.editorconfig = false;
+                break;
+            case 'with-node-modules':
+                request.withNodeModules = true;
+                break;
+            case 'plugin':
+                request.plugins.push(value);
+                break;
+            case 'plugin-search-dir':
+                request.pluginSearchDirs.push(path.resolve(cwd, value));
+                break;
+            default:
+                if (name.indexOf('no-') === 0 && value === undefined) {
+                    request.options[camelCase(name.slice(3))] = false;
+                } else {
+                    request.options[camelCase(name)] = coerceValue(value);
+                }
+        }
+    }
+    return request;
+}
+
+function resolveConfig(request, cwd) {
+    if (request.noConfig || !prettier.resolveConfig) {
+        return Promise.resolve(null);
+    }
+    // config files may change between requests:
+    if (prettier.clearConfigCache) {
+        prettier.clearConfigCache();
+    }
+    return Promise.resolve(prettier.resolveConfig(request.filepath || path.join(cwd, 'stdin'), {
+        config: request.config || undefined,
+        editorconfig: request.editorconfig
+    }));
+}
+
+function isIgnored(request) {
+    if (!request.ignorePath || !request.filepath || !prettier.getFileInfo) {
+        return Promise.resolve(false);
+    }
+    return Promise.resolve(prettier.getFileInfo(request.filepath, {
+        ignorePath: request.ignorePath,
+        withNodeModules: request.withNodeModules,
+        plugins: getPlugins(request)
+    })).then(function (fileInfo) {
+        return fileInfo.ignored;
+    });
+}
+
+function mergeOptions(request, fileOptions) {
+    var options = {};
+    var assign = function (source) {
+        Object.keys(source || {}).forEach(function (key) {
+            options[key] = source[key];
+        });
+    };
+    if (request.configPrecedence === 'file-override') {
+        assign(request.options);
+        assign(fileOptions);
+    } else if (request.configPrecedence === 'prefer-file' && fileOptions) {
+        assign(fileOptions);
+    } else {
+        assign(fileOptions);
+        assign(request.options);
+    }
+    if (request.filepath) {
+        options.filepath = request.filepath;
+    }
+    if (request.plugins.length) {
+        options.plugins = getPlugins(request);
+    }
+    if (request.pluginSearchDirs.length) {
+        options.pluginSearchDirs = request.pluginSearchDirs;
+    }
+    return options;
+}
+
+function formatError(error, request) {
+    var filename = request.filepath || 'stdin';
+    var lines = [];
+    if (error instanceof SyntaxError || error.loc) {
+        lines.push('[error] ' + filename + ': ' + String(error));
+        if (error.codeFrame) {
+            error.codeFrame.split('\n').forEach(function (line) {
+                lines.push('[error] ' + line);
+            });
+        }
+    } else {
+        lines.push('[error] ' + filename + ': ' + (error.stack || String(error)));
+    }
+    return lines.join('\n') + '\n';
+}
+
+//
+// Compact results
+
+// the most lines a `hunks` result may change:
+var MAX_HUNK_EDITS = 200;
+
+// The lines changed from a to b (arrays of lines), as [start, delete count,
+// inserted lines] hunks, where start indexes a, or null when more than
+// maxEdits lines changed (Myers' O(ND) diff, between the common prefix and
+// suffix):
+function diffLines(a, b, maxEdits) {
+    var prefix = 0;
+    while (prefix < a.length && prefix < b.length && a[prefix] === b[prefix]) {
+        prefix++;
+    }
+    var suffix = 0;
+    while (suffix < a.length - prefix && suffix < b.length - prefix &&
+            a[a.length - 1 - suffix] === b[b.length - 1 - suffix]) {
+        suffix++;
+    }
+    var n = a.length - prefix - suffix;
+    var m = b.length - prefix - suffix;
+    var max = Math.min(n + m, maxEdits);
+    var offset = max + 1;
+    var v = [];
+    for (var i = 0; i < 2 * max + 3; i++) {
+        v.push(0);
+    }
+    var trace = [];
+    var d, k, x, y;
+    var found = false;
+    for (d = 0; d <= max && !found; d++) {
+        trace.push(v.slice());
+        for (k = -d; k <= d; k += 2) {
+            if (k === -d || (k !== d && v[offset + k - 1] < v[offset + k + 1])) {
+                x = v[offset + k + 1];
+            } else {
+                x = v[offset + k - 1] + 1;
+            }
+            y = x - k;
+            while (x < n && y < m && a[prefix + x] === b[prefix + y]) {
+                x++;
+                y++;
+            }
+            v[offset + k] = x;
+            if (x >= n && y >= m) {
+                found = true;
+                break;
+            }
+        }
+    }
+    if (!found) {
+        return null;
+    }
+
+    // backtrack, collecting the deletions and insertions:
+    var edits = [];
+    x = n;
+    y = m;
+    for (d = trace.length - 1; d > 0; d--) {
+        v = trace[d];
+        k = x - y;
+        var prevK = (k === -d || (k !== d && v[offset + k - 1] < v[offset + k + 1])) ? k + 1 : k - 1;
+        var prevX = v[offset + prevK];
+        var prevY = prevX - prevK;
+        while (x > prevX && y > prevY) {
+            x--;
+            y--;
+        }
+        edits.push(x === prevX ? {at: prevX, line: b[prefix + prevY]} : {at: prevX, line: null});
+        x = prevX;
+        y = prevY;
+    }
+    edits.reverse();
+
+    var hunks = [];
+    var hunk = null;
+    edits.forEach(function (edit) {
+        if (hunk === null || edit.at !== hunk[0] - prefix + hunk[1]) {
+            hunk = [prefix + edit.at, 0, []];
+            hunks.push(hunk);
+        }
+        if (edit.line === null) {
+            hunk[1]++;
+        } else {
+            hunk[2].push(edit.line);
+        }
+    });
+    return hunks;
+}
+
+// The result of a format request that asked for a compact result:
+// `unchanged` when the source is formatted already, or the changed lines
+// (`hunks`), when they're much smaller than the formatted code.
+function compactResult(source, formatted, sourceSent) {
+    if (formatted === source) {
+        return {unchanged: true};
+    }
+    if (sourceSent) {
+        var hunks = diffLines(source.split('\n'), formatted.split('\n'), MAX_HUNK_EDITS);
+        if (hunks !== null) {
+            var size = 0;
+            hunks.forEach(function (hunk) {
+                hunk[2].forEach(function (line) {
+                    size += line.length + 1;
+                });
+            });
+            if (size * 2 < formatted.length) {
+                return {hunks: hunks};
+            }
+        }
+    }
+    return {formatted: formatted};
+}
+
+//
+// Methods
+
+var requestCount = 0;
+var retired = false;
+var retire = function () {
+    retired = true;
+};
+
+function workerStats() {
+    var memory = process.memoryUsage();
+    return {
+        rss: memory.rss,
+        heapUsed: memory.heapUsed,
+        heapTotal: memory.heapTotal,
+        requests: requestCount,
+        retired: retired
+    };
+}
+
+// the cpu time spent on a request (which, in 'service' mode, may overlap
+// with other clients' requests), and the peak rss of the worker:
+function requestUsage(cpuStart) {
+    var cpu = process.cpuUsage(cpuStart);
+    return {
+        user: cpu.user / 1e6,
+        system: cpu.system / 1e6,
+        maxRss: process.resourceUsage ? process.resourceUsage().maxRSS * 1024 : process.memoryUsage().rss
+    };
+}
+
+var methods = {
+    hello: function () {
+        return {
+            pid: process.pid,
+            node: process.version,
+            prettier: prettier.version,
+            plugins: workerArgs.plugins.map(function (name, i) {
+                return {name: name, preloaded: typeof preloadedPlugins[i] !== 'string'};
+            })
+        };
+    },
+
+    ping: function () {
+        return {};
+    },
+
+    stats: function () {
+        return workerStats();
+    },
+
+    // stop taking new clients, and exit once the current ones are gone:
+    retire: function () {
+        retire();
+        return {};
+    },
+
+    format: function (params) {
+        var cwd = params.cwd || process.cwd();
+        var request = parseCliArgs(params.argv || [], cwd);
+        var cpuStart = process.cpuUsage();
+        var source = params.source;
+        return isIgnored(request).then(function (ignored) {
+            if (source === undefined) {
+                // clean files are read here, instead of being sent over:
+                source = fs.readFileSync(params.sourcePath, 'utf8');
+            }
+            var result = function (formatted) {
+                return params.compact ? compactResult(source, formatted, params.source !== undefined)
+                    : {formatted: formatted};
+            };
+            if (ignored) {
+                return result(source);
+            }
+            return resolveConfig(request, cwd).then(function (fileOptions) {
+                var options = mergeOptions(request, fileOptions);
+                return Promise.resolve(prettier.format(source, options)).then(result);
+            });
+        }).catch(function (error) {
+            return {error: formatError(error, request)};
+        }).then(function (result) {
+            result.usage = requestUsage(cpuStart);
+            return result;
+        });
+    }
+};
+
+function handleMessage(message, send) {
+    var method = methods[message.method];
+    if (!method) {
+        send({id: message.id, error: 'Unknown method: ' + message.method});
+        return;
+    }
+    requestCount++;
+    // every response reports the worker's memory usage, so clients can
+    // recycle it without extra round trips:
+    Promise.resolve()
+        .then(function () {
+            return method(message.params || {});
+        })
+        .then(function (result) {
+            send({id: message.id, result: result, worker: workerStats()});
+        }, function (error) {
+            send({id: message.id, error: String(error && error.stack || error), worker: workerStats()});
+        });
+}
+
+//
+// Transports
+
+function serveStdio() {
+    var send = function (message) {
+        stdoutWrite(encodeFrame(message));
+    };
+    process.stdin.on('data', FrameReader(function (message) {
+        handleMessage(message, send);
+    }));
+    process.stdin.on('end', function () {
+        process.exit(0);
+    });
+}
+
+function serveSocket(socketPath, idleTimeout) {
+    var clients = 0;
+    var idleTimer = null;
+    var server;
+
+    var unlinkSocket = function () {
+        try {
+            fs.unlinkSync(socketPath);
+        } catch (e) {
+            // already removed
+        }
+    };
+
+    var shutdown = function () {
+        server.close();
+        if (!retired) {
+            unlinkSocket();
+        }
+        process.exit(0);
+    };
+
+    retire = function () {
+        // the replacement service takes over the socket path, while the
+        // connected clients drain:
+        retired = true;
+        server.close();
+        unlinkSocket();
+        if (clients === 0) {
+            shutdown();
+        }
+    };
+
+    var scheduleShutdown = function () {
+        clearTimeout(idleTimer);
+        idleTimer = setTimeout(shutdown, idleTimeout * 1000);
+    };
+
+    server = net.createServer(function (connection) {
+        // clients hold their connection open while they use the service:
+        clients++;
+        clearTimeout(idleTimer);
+        var send = function (message) {
+            if (!connection.destroyed) {
+                connection.write(encodeFrame(message));
+            }
+        };
+        connection.on('data', FrameReader(function (message) {
+            handleMessage(message, send);
+        }));
+        connection.on('error', function () {
+            connection.destroy();
+        });
+        connection.on('close', function () {
+            clients--;
+            if (clients === 0) {
+                if (retired) {
+                    shutdown();
+                } else {
+                    scheduleShutdown();
+                }
+            }
+        });
+    });
+
+    var listen = function () {
+        server.listen(socketPath, function () {
+            scheduleShutdown();
+        });
+    };
+
+    // another service may already be listening, otherwise it's a stale
+    // socket file left behind:
+    var probe = net.connect(socketPath);
+    probe.on('connect', function () {
+        probe.destroy();
+        process.exit(0);
+    });
+    probe.on('error', function () {
+        try {
+            fs.unlinkSync(socketPath);
+        } catch (e) {
+            // no socket file
+        }
+        listen();
+    });
+}
+
+if (workerArgs.socket) {
+    serveSocket(workerArgs.socket, workerArgs.idleTimeout);
+} else {
+    serveStdio();
+}
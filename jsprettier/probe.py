@@ -0,0 +1,156 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import io
+import json
+import os
+import threading
+from subprocess import PIPE, Popen
+
+from . import stats
+from .const import PLUGIN_NAME
+from .util import \
+    is_windows, \
+    load_json_file
+from .worker import get_prettier_version
+
+# bumped when the probe format changes, older probes are dropped:
+PROBE_VERSION = 2
+
+# the probes of the prettier clis, by real path, see `get_probe()`:
+_probes = {}
+_probes_lock = threading.Lock()
+_loaded_cache_file = None
+
+
+def parse_support_info(support_info):
+    """Get the options (and their valid values) from `prettier --support-info`.
+
+    :return: A dict of the options by name, where each option is a dict
+        with its 'deprecated' flag, and for choice options, its valid
+        'choices' and the 'redirects' of its deprecated choices (to the
+        choices replacing them).
+    """
+    options = {}
+    for option in support_info.get('options') or []:
+        parsed = {'deprecated': bool(option.get('deprecated'))}
+        if option.get('choices') is not None:
+            parsed['choices'] = []
+            parsed['redirects'] = {}
+            for choice in option['choices']:
+                value = choice.get('value')
+                # as passed on the command line, e.g. `--prose-wrap false`:
+                value = str(value).lower() if isinstance(value, bool) else str(value)
+                if not choice.get('deprecated'):
+                    parsed['choices'].append(value)
+                elif choice.get('redirect'):
+                    parsed['redirects'][value] = str(choice['redirect'])
+        options[option['name']] = parsed
+    return options
+
+
+def get_option_value(options, name, value, default=None):
+    """Get the value to pass to a prettier option, as supported by the probed prettier.
+
+    :param options: The probed options (see `parse_support_info()`), or
+        None if prettier wasn't probed, in which case value is returned.
+    :param default: The plugin's default value of the option.
+    :return: The value, redirected if it's a deprecated choice, or None if
+        the option (or value) isn't supported, or the option is deprecated
+        and value is the plugin's default, i.e. the option should be left out.
+    """
+    if options is None:
+        return value
+    option = options.get(name)
+    if option is None:
+        return None
+    if option['deprecated'] and value == default:
+        return None
+    choices = option.get('choices')
+    if choices is None or value in choices:
+        return value
+    return option['redirects'].get(value)
+
+
+def _get_probe_key(prettier_cli_path):
+    """Get the (real path, prettier version) a probe is cached by, or None.
+
+    The version is read from prettier's package.json, as npm installs the
+    package files with a fixed mtime, which an upgrade doesn't change.
+    """
+    real_path = os.path.realpath(prettier_cli_path)
+    if not os.path.exists(real_path):
+        return None
+    return real_path, get_prettier_version(real_path)
+
+
+def _load_cache(cache_file):
+    global _loaded_cache_file
+    if _loaded_cache_file == cache_file:
+        return
+    _loaded_cache_file = cache_file
+    cache = load_json_file(cache_file)
+    if isinstance(cache, dict) and cache.get('version') == PROBE_VERSION:
+        _probes.update(cache.get('probes') or {})
+
+
+def _save_cache(cache_file):
+    data = json.dumps({'version': PROBE_VERSION, 'probes': _probes})
+    temp_file = cache_file + '.tmp'
+    try:
+        with io.open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(type(u'')(data))
+        if os.path.exists(cache_file):
+            # os.rename() doesn't replace files on windows
+            os.remove(cache_file)
+        os.rename(temp_file, cache_file)
+    except (IOError, OSError) as ex:
+        print('{0}: failed to save the prettier probes: {1}'.format(PLUGIN_NAME, ex))
+
+
+def _run_probe(node_path, prettier_cli_path, cwd=None, env=None):
+    if node_path:
+        cmd = [node_path, prettier_cli_path, '--support-info']
+    else:
+        cmd = [prettier_cli_path, '--support-info']
+    try:
+        proc = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, cwd=cwd, env=env, shell=is_windows())
+        stdout, _ = proc.communicate()
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    try:
+        return parse_support_info(json.loads(stdout.decode('utf-8')))
+    except (ValueError, KeyError, AttributeError, TypeError):
+        return None
+
+
+def get_probe(node_path, prettier_cli_path, cache_file, cwd=None, env=None):
+    """Get the supported options of a prettier cli, probing it once.
+
+    Probes are cached (in memory, and on disk in cache_file) by the cli's
+    real path and prettier version, so prettier is only run again when it's
+    upgraded (or downgraded).
+
+    :return: The supported options (see `parse_support_info()`), or None
+        if prettier can't be probed, e.g. versions without `--support-info`.
+    """
+    key = _get_probe_key(prettier_cli_path)
+    if key is None:
+        return None
+    real_path, version = key
+    with _probes_lock:
+        _load_cache(cache_file)
+        probe = _probes.get(real_path)
+    if probe is not None and probe['version'] == version:
+        stats.increment('probe_hits')
+        return probe['options']
+
+    stats.increment('probe_runs')
+    options = _run_probe(node_path, prettier_cli_path, cwd, env)
+    with _probes_lock:
+        # replaces the probe of the previous version, if any:
+        _probes[real_path] = {'version': version, 'options': options}
+        _save_cache(cache_file)
+    return options
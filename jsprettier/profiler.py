@@ -0,0 +1,107 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+# the options of the next profiled format, see `request_profile()`:
+_requested = None
+_requested_lock = threading.Lock()
+
+# the profiler of the format running now:
+_active = None
+
+
+class FormatProfiler(object):
+    """Profile a format with cProfile, optionally excluding the time spent waiting.
+
+    While excluding waits, the profiler's clock is stopped in `waiting()`
+    blocks (i.e. while waiting for prettier or for a scheduler slot), so the
+    stats only show the plugin's own cost. Only the thread that created the
+    profiler is profiled.
+    """
+
+    def __init__(self, exclude_waits=True):
+        # imported here, as profiles are rare (see `request_profile()`):
+        import cProfile
+        self.exclude_waits = exclude_waits
+        self.excluded = 0.0
+        self._paused_at = None
+        self._thread_id = threading.current_thread().ident
+        self.profile = cProfile.Profile(self._timer)
+
+    def _timer(self):
+        now = self._paused_at if self._paused_at is not None else _clock()
+        return now - self.excluded
+
+    @contextmanager
+    def waiting(self):
+        if not self.exclude_waits or self._paused_at is not None \
+                or threading.current_thread().ident != self._thread_id:
+            yield
+            return
+        self._paused_at = _clock()
+        try:
+            yield
+        finally:
+            self.excluded += _clock() - self._paused_at
+            self._paused_at = None
+
+    def run(self, func, *args, **kwargs):
+        global _active
+        _active = self
+        try:
+            return self.profile.runcall(func, *args, **kwargs)
+        finally:
+            _active = None
+
+    def save(self, stats_file):
+        self.profile.dump_stats(stats_file)
+
+    def format_stats(self, limit=30):
+        """Format the top entries, by cumulative time."""
+        import pstats
+        stream = StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+
+def request_profile(exclude_waits=True, stats_file=None):
+    """Profile the next format, see `take_profile_request()`."""
+    global _requested
+    with _requested_lock:
+        _requested = {'exclude_waits': exclude_waits, 'stats_file': stats_file}
+
+
+def take_profile_request():
+    """Get (and clear) the options of the requested profile, or None."""
+    global _requested
+    with _requested_lock:
+        requested, _requested = _requested, None
+    return requested
+
+
+def default_stats_file():
+    return os.path.join(tempfile.gettempdir(), 'JsPrettier-{0}.pstats'.format(time.strftime('%Y%m%d-%H%M%S')))
+
+
+@contextmanager
+def waiting():
+    """Mark a block as waiting, i.e. excluded from the running profile."""
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    with profiler.waiting():
+        yield
@@ -0,0 +1,143 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import threading
+import time
+from contextlib import contextmanager
+
+from . import stats
+# the priority classes, most urgent first (in `const`, so the plugin
+# doesn't import the scheduler before its first format):
+from .const import \
+    PRIORITY_BATCH, \
+    PRIORITY_INTERACTIVE, \
+    PRIORITY_SAVE, \
+    PRIORITY_SPECULATIVE
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_SAVE: 'save',
+    PRIORITY_SPECULATIVE: 'speculative',
+    PRIORITY_BATCH: 'batch'
+}
+
+# the user waits on interactive and save formats, not on background ones:
+FOREGROUND_PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_SAVE)
+
+# queued jobs move up one priority class for every AGING_INTERVAL seconds
+# they waited, so batch jobs aren't starved by speculative ones:
+AGING_INTERVAL = 5.0
+
+MAX_QUEUED_BACKGROUND = 1000
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class SchedulerFullError(Exception):
+    """The queue is at capacity, and the (background) job was rejected."""
+
+
+class _Job(object):
+    __slots__ = ('priority', 'enqueued_at', 'seq')
+
+    def __init__(self, priority, enqueued_at, seq):
+        self.priority = priority
+        self.enqueued_at = enqueued_at
+        self.seq = seq
+
+    @property
+    def is_foreground(self):
+        return self.priority in FOREGROUND_PRIORITIES
+
+    def rank(self, now):
+        # aging never lifts background jobs into the foreground classes:
+        floor = PRIORITY_INTERACTIVE if self.is_foreground else PRIORITY_SPECULATIVE
+        return max(floor, self.priority - (now - self.enqueued_at) / AGING_INTERVAL), self.seq
+
+
+class Scheduler(object):
+    """Hand out a limited number of format slots by priority class.
+
+    `reserved_slots` of the slots are only used by foreground (interactive
+    and save) jobs, so a format the user waits on never queues behind
+    background jobs. Background jobs are rejected with `SchedulerFullError` once
+    `max_queued` of them are waiting, foreground jobs are always queued.
+    """
+
+    def __init__(self, slots=2, reserved_slots=1, max_queued=MAX_QUEUED_BACKGROUND):
+        self.slots = max(1, slots)
+        self.reserved_slots = min(reserved_slots, self.slots - 1) if self.slots > 1 else 0
+        self.max_queued = max_queued
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = []
+        self._seq = 0
+
+    def _next_job(self, now):
+        """The queued job to run next, if there's a free slot for it."""
+        if not self._waiting:
+            return None
+        job = min(self._waiting, key=lambda j: j.rank(now))
+        limit = self.slots if job.is_foreground else self.slots - self.reserved_slots
+        if self._running >= limit:
+            return None
+        return job
+
+    def acquire(self, priority):
+        """Wait for a slot.
+
+        :raise SchedulerFullError: If a background job can't be queued.
+        """
+        with self._cond:
+            if priority not in FOREGROUND_PRIORITIES:
+                queued = sum(1 for j in self._waiting if not j.is_foreground)
+                if queued >= self.max_queued:
+                    stats.increment('scheduler_rejected_{0}'.format(PRIORITY_NAMES[priority]))
+                    raise SchedulerFullError('{0} background formats queued'.format(queued))
+            self._seq += 1
+            job = _Job(priority, time.time(), self._seq)
+            self._waiting.append(job)
+            try:
+                while self._next_job(time.time()) is not job:
+                    # wake up regularly, as aging changes the job order:
+                    self._cond.wait(AGING_INTERVAL)
+            finally:
+                self._waiting.remove(job)
+            self._running += 1
+            # other jobs may fit in the remaining slots:
+            self._cond.notify_all()
+        stats.record_timing('scheduler_wait_{0}'.format(PRIORITY_NAMES[priority]), time.time() - job.enqueued_at)
+
+    def release(self):
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self):
+        """Get the running jobs count, and the queue depth by priority class."""
+        with self._cond:
+            queued = dict((name, 0) for name in PRIORITY_NAMES.values())
+            for job in self._waiting:
+                queued[PRIORITY_NAMES[job.priority]] += 1
+            return {'slots': self.slots, 'running': self._running, 'queued': queued}
+
+
+def get_scheduler(slots=2):
+    """Get the shared scheduler, resized if the slot count changed.
+
+    Resizing only affects jobs queued from now on.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or _scheduler.slots != max(1, slots):
+            _scheduler = Scheduler(slots)
+        return _scheduler
@@ -0,0 +1,112 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import threading
+import time
+from subprocess import PIPE, Popen
+
+from . import stats
+
+# seconds a standby process waits for its input, before it's discarded:
+STANDBY_IDLE_TIMEOUT = 300
+
+# the standby process of each prettier binary, see `take_standby()`:
+_standbys = {}
+_standbys_lock = threading.Lock()
+
+
+class StandbyProcess(object):
+    """A pre-spawned prettier cli process, waiting for its input on stdin.
+
+    Node is started, and prettier loaded, while the process waits, so the
+    format that consumes it skips most of the spawn latency. Prettier
+    resolves its config (and ignore file) after reading stdin, so config
+    changes made while the process waits are picked up.
+    """
+
+    def __init__(self, cmd, cwd=None, env=None):
+        self.cmd = list(cmd)
+        self.cwd = cwd
+        self.env = env
+        self.started_at = time.time()
+        self.proc = Popen(self.cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, cwd=cwd, env=env)
+
+    def matches(self, cmd, cwd, env):
+        return self.cmd == list(cmd) and self.cwd == cwd and self.env == env
+
+    def is_usable(self, now=None):
+        now = time.time() if now is None else now
+        return self.proc.poll() is None and now - self.started_at < STANDBY_IDLE_TIMEOUT
+
+    def discard(self):
+        try:
+            self.proc.kill()
+        except OSError:
+            pass
+        # reap the process, and close its pipes:
+        self.proc.communicate()
+
+
+def take_standby(binary, cmd, cwd=None, env=None):
+    """Take the standby process of a prettier binary, if it runs cmd.
+
+    A standby process running another command (e.g. for another file, or
+    with other options), or waiting for too long, is discarded.
+
+    :param binary: The (node path, prettier cli path) the process runs.
+    :return: The process (a `Popen`), waiting for its input, or None.
+    """
+    with _standbys_lock:
+        standby = _standbys.pop(binary, None)
+    if standby is None:
+        stats.increment('standby_misses')
+        return None
+    if standby.matches(cmd, cwd, env) and standby.is_usable():
+        stats.increment('standby_hits')
+        return standby.proc
+    stats.increment('standby_discards')
+    standby.discard()
+    return None
+
+
+def spawn_standby(binary, cmd, cwd=None, env=None):
+    """Spawn a standby process for the next format, in the background.
+
+    It replaces the binary's previous standby process, if any.
+    """
+    def spawn():
+        try:
+            standby = StandbyProcess(cmd, cwd, env)
+        except OSError:
+            return
+        with _standbys_lock:
+            previous = _standbys.get(binary)
+            _standbys[binary] = standby
+        if previous is not None:
+            previous.discard()
+        timer = threading.Timer(STANDBY_IDLE_TIMEOUT, _expire, [binary, standby])
+        timer.daemon = True
+        timer.start()
+
+    thread = threading.Thread(target=spawn)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def _expire(binary, standby):
+    with _standbys_lock:
+        if _standbys.get(binary) is not standby:
+            # already taken, or replaced
+            return
+        del _standbys[binary]
+    standby.discard()
+
+
+def discard_standbys():
+    """Discard all the standby processes, e.g. when the environment changes."""
+    with _standbys_lock:
+        standbys = list(_standbys.values())
+        _standbys.clear()
+    for standby in standbys:
+        standby.discard()
@@ -0,0 +1,182 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import threading
+import time
+
+# the number of recent events kept per kind:
+MAX_EVENTS = 50
+
+# the number of files whose resource usage is kept (the cheapest are dropped):
+MAX_USAGE_FILES = 1000
+
+USAGE_BY_FILE = 'file'
+USAGE_BY_EXTENSION = 'extension'
+USAGE_BY_PROJECT = 'project'
+
+_lock = threading.Lock()
+_counters = {}
+_events = {}
+_timings = {}
+_usage = {USAGE_BY_FILE: {}, USAGE_BY_EXTENSION: {}, USAGE_BY_PROJECT: {}}
+
+
+def increment(name, value=1):
+    """Increment a named counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def record_event(kind, details):
+    """Record an event, e.g. a worker recycle, and count it.
+
+    :param kind: The event kind, also the name of its counter.
+    :param details: A dict describing the event.
+    """
+    event = dict(details)
+    event['time'] = time.time()
+    with _lock:
+        _counters[kind] = _counters.get(kind, 0) + 1
+        events = _events.setdefault(kind, [])
+        events.append(event)
+        del events[:-MAX_EVENTS]
+
+
+def record_timing(name, seconds):
+    """Record a duration, e.g. a queue wait time."""
+    with _lock:
+        count, total, longest = _timings.get(name, (0, 0.0, 0.0))
+        _timings[name] = (count + 1, total + seconds, max(longest, seconds))
+
+
+def get_timings():
+    """Get the recorded durations, as a dict of (count, total, max) tuples."""
+    with _lock:
+        return dict(_timings)
+
+
+def record_usage(file_path, project_path, usage):
+    """Record the resource usage of formatting a file.
+
+    The usage is summed up per file, per file extension and per project.
+
+    :param usage: A dict with the 'user' and 'system' cpu seconds, and the
+        peak rss in bytes ('max_rss'), see `util.communicate()`.
+    """
+    extension = os.path.splitext(file_path or '')[1] or '(none)'
+    keys = ((USAGE_BY_FILE, file_path), (USAGE_BY_EXTENSION, extension), (USAGE_BY_PROJECT, project_path))
+    with _lock:
+        for kind, key in keys:
+            count, user, system, max_rss = _usage[kind].get(key, (0, 0.0, 0.0, 0))
+            _usage[kind][key] = (count + 1, user + usage['user'], system + usage['system'],
+                                 max(max_rss, usage['max_rss']))
+        files = _usage[USAGE_BY_FILE]
+        if len(files) > MAX_USAGE_FILES:
+            del files[min(files, key=lambda f: files[f][1] + files[f][2])]
+
+
+def get_top_usage(kind, limit=20):
+    """Get the most expensive files, extensions or projects, by cpu time.
+
+    :param kind: One of USAGE_BY_FILE, USAGE_BY_EXTENSION or USAGE_BY_PROJECT.
+    :return: A list of (key, count, user, system, max_rss) tuples.
+    """
+    with _lock:
+        items = list(_usage[kind].items())
+    items.sort(key=lambda item: item[1][1] + item[1][2], reverse=True)
+    return [(key,) + totals for key, totals in items[:limit]]
+
+
+def format_usage_report(limit=20):
+    """Format the report shown by the `js_prettier_usage` command."""
+    lines = []
+    for kind, title in ((USAGE_BY_FILE, 'Most expensive files'), (USAGE_BY_EXTENSION, 'By file extension'),
+                        (USAGE_BY_PROJECT, 'By project')):
+        lines.extend([title + ':', ''])
+        top_usage = get_top_usage(kind, limit)
+        if not top_usage:
+            lines.append('  (none)')
+        for key, count, user, system, max_rss in top_usage:
+            lines.append('  {0:8.2f}s cpu ({1:.2f}s user, {2:.2f}s sys), peak rss {3}, {4} formats: {5}'.format(
+                user + system, user, system, format_bytes(max_rss), count, key))
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def get_counters():
+    with _lock:
+        return dict(_counters)
+
+
+def get_events(kind):
+    with _lock:
+        return list(_events.get(kind, []))
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _events.clear()
+        _timings.clear()
+        for usage in _usage.values():
+            usage.clear()
+
+
+def format_bytes(size):
+    return '{0:.1f} MB'.format(size / (1024.0 * 1024.0))
+
+
+def format_report(workers_stats, scheduler_stats=None):
+    """Format the stats report shown by the `js_prettier_stats` command.
+
+    :param workers_stats: The running workers' stats, see `worker.get_workers_stats()`.
+    :param scheduler_stats: The scheduler's stats, see `Scheduler.get_stats()`.
+    """
+    lines = []
+    if scheduler_stats is not None:
+        lines.extend(['Scheduler:', ''])
+        lines.append('  {0} of {1} slots running'.format(scheduler_stats['running'], scheduler_stats['slots']))
+        for name, depth in sorted(scheduler_stats['queued'].items()):
+            lines.append('  queued {0}: {1}'.format(name, depth))
+        lines.append('')
+
+    lines.extend(['Workers:', ''])
+    if not workers_stats:
+        lines.append('  (none running)')
+    for worker_stats in workers_stats:
+        lines.append('  {0} pid {1} (node {2}, prettier {3}{4}){5}'.format(
+            worker_stats.get('mode'), worker_stats.get('pid'), worker_stats.get('node'),
+            worker_stats.get('prettier'),
+            ', {0} plugins'.format(worker_stats['plugins']) if worker_stats.get('plugins') else '',
+            '' if worker_stats.get('alive') else ' [stopped]'))
+        lines.append('    rss {0}, heap {1} / {2}, {3} requests, up {4:.0f}s'.format(
+            format_bytes(worker_stats.get('rss', 0)), format_bytes(worker_stats.get('heapUsed', 0)),
+            format_bytes(worker_stats.get('heapTotal', 0)), worker_stats.get('requests', 0),
+            worker_stats.get('uptime', 0)))
+
+    counters = get_counters()
+    lines.extend(['', 'Counters:', ''])
+    if not counters:
+        lines.append('  (none)')
+    for name in sorted(counters):
+        lines.append('  {0}: {1}'.format(name, counters[name]))
+
+    timings = get_timings()
+    lines.extend(['', 'Timings:', ''])
+    if not timings:
+        lines.append('  (none)')
+    for name in sorted(timings):
+        count, total, longest = timings[name]
+        lines.append('  {0}: {1} times, avg {2:.1f}ms, max {3:.1f}ms'.format(
+            name, count, total * 1000.0 / count, longest * 1000.0))
+
+    recycles = get_events('worker_recycles')
+    lines.extend(['', 'Worker recycles:', ''])
+    if not recycles:
+        lines.append('  (none)')
+    for event in recycles:
+        lines.append('  {0} {1} pid {2}: {3} (rss {4}, {5} requests)'.format(
+            time.strftime('%H:%M:%S', time.localtime(event['time'])), event.get('mode'), event.get('pid'),
+            event.get('reason'), format_bytes(event.get('rss', 0)), event.get('requests', 0)))
+    return '\n'.join(lines) + '\n'
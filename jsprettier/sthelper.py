@@ -2,10 +2,16 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 from .util import \
+    _climb_dirs, \
+    _list_dir, \
     which, \
     is_str_none_or_empty, \
+    find_project_root, \
     find_prettier_config, \
-    get_file_abs_dir
+    get_file_abs_dir, \
+    get_proc_env_path
+
+from .lazy import LazyModule
 
 from .const import \
     SETTINGS_FILENAME, \
@@ -17,11 +23,27 @@ from .const import \
 import os
 import sublime
 
+# imported on first use, to keep the plugin's load time down:
+_noderuntime = LazyModule('.noderuntime', __package__)
+_workspace = LazyModule('.workspace', __package__)
+
 
 def st_status_message(msg):
     sublime.set_timeout(lambda: sublime.status_message('{0}: {1}'.format('JsPretter', msg)), 0)
 
 
+def get_cache_dir():
+    """Get (and create) the plugin's cache directory."""
+    if hasattr(sublime, 'cache_path'):
+        cache_dir = os.path.join(sublime.cache_path(), PLUGIN_NAME)
+    else:
+        # sublime text 2x has no cache dir:
+        cache_dir = os.path.join(sublime.packages_path(), 'User', '{0}.cache'.format(PLUGIN_NAME))
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    return cache_dir
+
+
 def get_setting(view, key, default_value=None):
     settings = view.settings().get(PLUGIN_NAME)
     if settings is None or settings.get(key) is None:
@@ -81,8 +103,9 @@ def _get_project_sub_setting(option):
     return None
 
 
-def is_file_auto_formattable(view):
-    filename = view.file_name()
+def is_file_auto_formattable(view, filename=None):
+    """Check the file extension of a view's file (or of filename)."""
+    filename = filename or view.file_name()
     if not filename:
         return False
     file_ext = os.path.splitext(filename)[1][1:]
@@ -93,30 +116,25 @@ def is_file_auto_formattable(view):
     return False
 
 
-def get_st_project_path():
-    """Get the active Sublime Text project path.
+def get_st_project_path(view=None, file_name=None):
+    """Get the Sublime Text project path of a view.
 
     Original: https://gist.github.com/astronaughts/9678368
 
+    :param view: The view, defaults to the active window's active view.
+    :param file_name: The file to get the project path of, defaults to
+        the view's file.
     :rtype: object
-    :return: The active Sublime Text project path.
+    :return: The Sublime Text project path of the view.
     """
-    window = sublime.active_window()
-    folders = window.folders()
-    if len(folders) == 1:
-        return folders[0]
-    else:
-        active_view = window.active_view()
-        if active_view:
-            active_file_name = active_view.file_name()
-        else:
-            active_file_name = None
-        if not active_file_name:
-            return folders[0] if len(folders) else os.path.expanduser('~')
-        for folder in folders:
-            if active_file_name.startswith(folder):
-                return folder
-        return os.path.dirname(active_file_name)
+    window = view.window() if view is not None else None
+    if window is None:
+        window = sublime.active_window()
+    if view is None:
+        view = window.active_view()
+    if file_name is None and view is not None:
+        file_name = view.file_name()
+    return find_project_root(window.folders(), file_name)
 
 
 def scroll_view_to(view, row_no, col_no):
@@ -139,15 +157,54 @@ def has_selection(view):
     return False
 
 
-def resolve_prettier_cli_path(view, plugin_path):
+def resolve_workspace(view, source_file_path, project_path):
+    """Resolve a file's package, local prettier, config and ignore file
+    with the project's workspace index.
+
+    :return: A `WorkspaceResolution`, or None when the `workspace_index`
+        setting is disabled, the file isn't in a project folder, or the
+        index isn't built yet.
+    """
+    if not get_setting(view, 'workspace_index', True):
+        return None
+    window = view.window() or sublime.active_window()
+    if project_path not in window.folders():
+        return None
+    resolution = _workspace.get_workspace_index(project_path).resolve(source_file_path)
+    debug(view, 'Workspace index resolution: {0}'.format(resolution))
+    return resolution
+
+
+def find_local_prettier_cli_path(source_file_dir, project_path):
+    """Find the prettier cli installed by the nearest package of a file.
+
+    :return: The `node_modules/.bin/prettier` path in the nearest dir from
+        source_file_dir up to project_path, or None.
+    """
+    project_root = project_path.rstrip('/\\') or project_path
+    if not (source_file_dir + os.sep).startswith(project_root + os.sep):
+        return None
+    for d in _climb_dirs(source_file_dir, limit=100):
+        if 'node_modules' in _list_dir(d):
+            prettier_cli_path = os.path.join(d, 'node_modules', '.bin', 'prettier')
+            if os.path.exists(prettier_cli_path):
+                return prettier_cli_path
+        if d == project_root:
+            break
+    return None
+
+
+def resolve_prettier_cli_path(view, plugin_path, node_bin_dir=None, source_file_dir=None, workspace=None,
+                              project_path=None):
     """The prettier cli path.
 
     When the `prettier_cli_path` setting is empty (""),
     the path is resolved by searching locations in the following order,
     returning the first match of the prettier cli path...
 
-    - Locally installed prettier, relative to a Sublime Text Project
-      file's root directory, e.g.: `node_modules/.bin/prettier'.
+    - Locally installed prettier, in the nearest package of the file
+      (up to the Sublime Text Project's root directory), e.g.:
+      `packages/app/node_modules/.bin/prettier'.
     - User's $HOME/node_modules directory.
     - Look in the JsPrettier Sublime Text plug-in directory for
       `node_modules/.bin/prettier`.
@@ -155,13 +212,27 @@ def resolve_prettier_cli_path(view, plugin_path):
       e.g.: `yarn global add prettier`
         or: `npm install -g prettier`
 
+    :param node_bin_dir: The bin dir of the project's pinned node runtime,
+        searched first for a globally installed prettier.
+    :param source_file_dir: The dir of the file to format.
+    :param workspace: The file's `WorkspaceResolution`, if indexed.
+    :param project_path: The Sublime Text project path of the file,
+        defaults to the view's project path.
     :return: The prettier cli path.
     """
     custom_prettier_cli_path = get_setting(view, 'prettier_cli_path', '')
-    project_path = get_st_project_path()
+    if project_path is None:
+        project_path = get_st_project_path(view)
 
     if is_str_none_or_empty(custom_prettier_cli_path):
-        global_prettier_path = which('prettier')
+        if workspace is not None:
+            if workspace.prettier_cli_path:
+                return workspace.prettier_cli_path
+        elif source_file_dir:
+            local_prettier_path = find_local_prettier_cli_path(source_file_dir, project_path)
+            if local_prettier_path:
+                return local_prettier_path
+
         project_prettier_path = os.path.join(project_path, 'node_modules', '.bin', 'prettier')
         plugin_prettier_path = os.path.join(plugin_path, 'node_modules', '.bin', 'prettier')
 
@@ -170,7 +241,7 @@ def resolve_prettier_cli_path(view, plugin_path):
         if os.path.exists(plugin_prettier_path):
             return plugin_prettier_path
 
-        return global_prettier_path
+        return which('prettier', get_proc_env_path(node_bin_dir))
 
     # handle cases when the user specifies a prettier cli path that is
     # relative to the working file or project:
@@ -180,6 +251,23 @@ def resolve_prettier_cli_path(view, plugin_path):
     return custom_prettier_cli_path
 
 
+def resolve_node_bin_dir(view, source_file_dir):
+    """Resolve the bin dir of the node runtime pinned by the project.
+
+    Only used when the `resolve_node_version` setting is enabled and no
+    explicit `node_path` is set. See :func:`noderuntime.resolve_node_runtime`.
+
+    :return: The runtime's bin dir, or None to use the default environment.
+    """
+    if not get_setting(view, 'resolve_node_version', False):
+        return None
+    if not is_str_none_or_empty(get_setting(view, 'node_path')):
+        return None
+    node_bin_dir = _noderuntime.resolve_node_runtime(source_file_dir)
+    debug(view, "Resolved pinned node runtime '{0}'".format(node_bin_dir))
+    return node_bin_dir
+
+
 def log(msg):
     print("{0}: {1}".format(PLUGIN_NAME, msg))
 
@@ -194,16 +282,21 @@ def debug_enabled(view):
     return bool(get_setting(view, 'debug', False))
 
 
-def resolve_prettier_config(view):
+def resolve_prettier_config(view, workspace=None, source_file=None):
     """
     Look for prettier config file in 'additional_cli_args',
     then starting from in source file dir, or up the dir
     tree until a match is (or isn't) found.
+
+    :param workspace: The file's `WorkspaceResolution`, if indexed.
+    :param source_file: The file to format, defaults to the view's file.
     """
+    if workspace is not None and workspace.config_path:
+        return workspace.config_path
     resolved_prettier_config_path = None
-    source_file = view.file_name()
+    source_file = source_file or view.file_name()
     if source_file:
         resolved_prettier_config_path = find_prettier_config(get_file_abs_dir(source_file))
         if not resolved_prettier_config_path:
-            resolved_prettier_config_path = find_prettier_config(get_st_project_path())
+            resolved_prettier_config_path = find_prettier_config(get_st_project_path(view, source_file))
     return resolved_prettier_config_path
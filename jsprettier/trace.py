@@ -0,0 +1,133 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .const import PLUGIN_NAME
+
+# the trace file is rotated (to `<trace file>.1`) when it grows larger:
+MAX_TRACE_FILE_SIZE = 10 * 1024 * 1024
+
+_tracers = {}
+_tracers_lock = threading.Lock()
+
+
+class _Span(object):
+    __slots__ = ('name', 'start', 'args')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.start = time.time()
+        self.args = args
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class NullTracer(object):
+    """A tracer that records nothing, used while tracing is disabled."""
+
+    @contextmanager
+    def span(self, name, **args):
+        yield _Span(name, args)
+
+    def annotate(self, **args):
+        pass
+
+
+class Tracer(object):
+    """Record format requests as span trees, in the Chrome Trace Event format.
+
+    Spans are "complete" (`X`) events, nested by time on the thread that
+    recorded them. The events of a request are buffered until its root
+    span ends, and are then appended to the trace file in one write. The
+    file is a json array without the closing bracket, which trace viewers
+    (chrome://tracing, Perfetto) accept, so events can be appended as is.
+    """
+
+    def __init__(self, trace_file, max_size=MAX_TRACE_FILE_SIZE):
+        self.trace_file = trace_file
+        self.max_size = max_size
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            self._local.events = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **args):
+        """Record a span, nested in the current thread's enclosing span.
+
+        The yielded span's attributes can be added to with `span.set()`.
+        """
+        stack = self._stack()
+        current = _Span(name, args)
+        stack.append(current)
+        try:
+            yield current
+        finally:
+            stack.pop()
+            end = time.time()
+            self._local.events.append({
+                'name': name,
+                'cat': 'jsprettier',
+                'ph': 'X',
+                'ts': int(current.start * 1e6),
+                'dur': int((end - current.start) * 1e6),
+                'pid': os.getpid(),
+                'tid': threading.current_thread().ident,
+                'args': current.args
+            })
+            if not stack:
+                events, self._local.events = self._local.events, []
+                self._write(events)
+
+    def annotate(self, **args):
+        """Add attributes to the current thread's innermost span."""
+        stack = self._stack()
+        if stack:
+            stack[-1].set(**args)
+
+    def _write(self, events):
+        data = ''.join(json.dumps(event, default=str) + ',\n' for event in events)
+        with self._write_lock:
+            try:
+                trace_dir = os.path.dirname(self.trace_file)
+                if trace_dir and not os.path.isdir(trace_dir):
+                    os.makedirs(trace_dir)
+                if os.path.exists(self.trace_file) and os.path.getsize(self.trace_file) > self.max_size:
+                    rotated_file = self.trace_file + '.1'
+                    if os.path.exists(rotated_file):
+                        os.remove(rotated_file)
+                    os.rename(self.trace_file, rotated_file)
+                new_file = not os.path.exists(self.trace_file)
+                with io.open(self.trace_file, 'a', encoding='utf-8') as f:
+                    if new_file:
+                        f.write(u'[\n')
+                    f.write(type(u'')(data))
+            except (IOError, OSError) as ex:
+                print('{0}: failed to write the trace file: {1}'.format(PLUGIN_NAME, ex))
+
+
+NULL_TRACER = NullTracer()
+
+
+def get_tracer(trace_file):
+    """Get the tracer writing to trace_file, or a no-op tracer if it's empty."""
+    if not trace_file:
+        return NULL_TRACER
+    trace_file = os.path.expanduser(trace_file)
+    with _tracers_lock:
+        tracer = _tracers.get(trace_file)
+        if tracer is None:
+            tracer = _tracers[trace_file] = Tracer(trace_file)
+        return tracer
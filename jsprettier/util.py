@@ -2,17 +2,47 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import with_statement
 
+import errno
 import functools
+import io
 import json
 import os
 import platform
-from re import sub
+import threading
+from collections import namedtuple
+from re import M, S, escape, finditer, match, search, sub
+from subprocess import PIPE, Popen
 
 from .const import \
     PLUGIN_NAME, \
     PRETTIER_IGNORE_FILE, \
     PRETTIER_CONFIG_FILES
 
+LOGIN_SHELL_ENV_MARKER = '__JSPRETTIER_ENV__'
+
+DIR_CACHE_MAX_ENTRIES = 4096
+
+_dir_list_cache = {}
+_json_file_cache = {}
+_proc_env = None
+_runtime_proc_envs = {}
+_login_shell_env = None
+_project_root_cache = {}
+
+# The resolved paths and options of one format request. It's immutable, so
+# formats can safely run from background threads, without sharing state:
+FormatContext = namedtuple('FormatContext', [
+    'source_file_path',
+    'project_path',
+    'cwd',
+    'node_path',
+    'node_bin_dir',
+    'prettier_cli_path',
+    'prettier_options',
+    # the config file prettier uses, or None:
+    'prettier_config_path'
+])
+
 
 def memoize(obj):
     cache = obj.cache = {}
@@ -33,6 +63,18 @@ def contains(needle, haystack):
     return needle in haystack
 
 
+def contains_path(path, txt):
+    """Check if txt contains the whole path, e.g. in prettier's error output.
+
+    The path must be delimited by whitespace, quotes, brackets or a colon
+    (e.g. `/tmp/block-1.js: SyntaxError`), so `/tmp/block-1.js` isn't found
+    in `/tmp/block-1.jsx`.
+    """
+    if not path or not txt:
+        return False
+    return search(r'(?:^|[\s\'"(\[]){0}(?=$|[\s\'"):\]])'.format(escape(path)), txt, M) is not None
+
+
 def find_prettier_config(start_dir, alt_dirs=None):
     if alt_dirs is None:
         alt_dirs = []
@@ -88,13 +130,11 @@ def _find_file(start_dir, filename, parent=False, limit=None, aux_dirs=None):
     if aux_dirs is None:
         aux_dirs = []
     for d in _climb_dirs(start_dir, limit=limit):
-        target = os.path.join(d, filename)
-
-        if os.path.exists(target):
+        if filename in _list_dir(d):
             if parent:
                 return d
 
-            return target
+            return os.path.join(d, filename)
 
     for d in aux_dirs:
         d = os.path.expanduser(d)
@@ -107,16 +147,59 @@ def _find_file(start_dir, filename, parent=False, limit=None, aux_dirs=None):
             return target
 
 
-def _prettier_opts_in_package_json(package_json_file):
-    has_key = False
-    with open(package_json_file) as package_file:
-        json_data = json.load(package_file, encoding='utf-8')
+def _list_dir(directory):
+    """Get the (cached) names of the entries in a directory.
+
+    Walking up the file hierarchy is repeated for every config file name
+    and on every format, so directory listings are cached and only
+    re-read when the directory's mtime changes.
+
+    :param directory: The directory path.
+    :return: A frozenset of entry names (empty when not a directory).
+    """
     try:
-        if 'prettier' in json_data:
-            has_key = True
-    except KeyError:
-        pass
-    return has_key
+        mtime = os.stat(directory).st_mtime
+    except OSError:
+        return frozenset()
+    cached = _dir_list_cache.get(directory)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        names = frozenset(os.listdir(directory))
+    except OSError:
+        names = frozenset()
+    if len(_dir_list_cache) >= DIR_CACHE_MAX_ENTRIES:
+        _dir_list_cache.clear()
+    _dir_list_cache[directory] = (mtime, names)
+    return names
+
+
+def load_json_file(json_file):
+    """Load a json file, cached until the file's mtime changes.
+
+    :return: The decoded json data, or None if the file can't be read or parsed.
+    """
+    try:
+        mtime = os.stat(json_file).st_mtime
+    except OSError:
+        return None
+    cached = _json_file_cache.get(json_file)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        with io.open(json_file, encoding='utf-8') as f:
+            json_data = json.load(f)
+    except (IOError, OSError, ValueError):
+        json_data = None
+    if len(_json_file_cache) >= DIR_CACHE_MAX_ENTRIES:
+        _json_file_cache.clear()
+    _json_file_cache[json_file] = (mtime, json_data)
+    return json_data
+
+
+def _prettier_opts_in_package_json(package_json_file):
+    json_data = load_json_file(package_json_file)
+    return isinstance(json_data, dict) and 'prettier' in json_data
 
 
 def is_mac_os():
@@ -203,6 +286,165 @@ def is_str_none_or_empty(val):
     return False
 
 
+def get_indentation(txt):
+    """Get the common leading whitespace of the non-blank lines in txt.
+
+    :param txt: The (multi-line) str.
+    :return: The common leading whitespace str.
+    """
+    indentation = None
+    for line in txt.splitlines():
+        if not line.strip():
+            continue
+        line_indentation = line[:len(line) - len(line.lstrip())]
+        if indentation is None or line_indentation.startswith(indentation):
+            if indentation is None:
+                indentation = line_indentation
+            continue
+        # keep the longest shared prefix:
+        i = 0
+        while i < len(indentation) and i < len(line_indentation) and indentation[i] == line_indentation[i]:
+            i += 1
+        indentation = indentation[:i]
+    return indentation or ''
+
+
+def dedent_str(txt, indentation):
+    """Remove the indentation prefix from each line in txt."""
+    if not indentation:
+        return txt
+    lines = []
+    for line in txt.split('\n'):
+        if line.startswith(indentation):
+            line = line[len(indentation):]
+        elif not line.strip():
+            line = ''
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def indent_str(txt, indentation):
+    """Prefix each non-blank line in txt with indentation."""
+    if not indentation:
+        return txt
+    return '\n'.join(indentation + line if line.strip() else line for line in txt.split('\n'))
+
+
+def get_line_range_offsets(txt, first_line, last_line):
+    """Get the character offsets spanning a range of lines.
+
+    :param first_line: The first line, 1-based.
+    :param last_line: The last line (inclusive).
+    :return: A (start, end) tuple, e.g. for prettier's `--range-start`
+        and `--range-end` options.
+    """
+    lines = txt.splitlines(True)
+    start = sum(len(line) for line in lines[:first_line - 1])
+    end = start + sum(len(line) for line in lines[first_line - 1:last_line])
+    return start, end
+
+
+def get_first_diff_line(txt, other_txt):
+    """Get the first line that differs between two texts.
+
+    :return: The line number (1-based), or 0 if the texts are equal.
+    """
+    if txt == other_txt:
+        return 0
+    lines, other_lines = txt.splitlines(True), other_txt.splitlines(True)
+    for index, (line, other_line) in enumerate(zip(lines, other_lines)):
+        if line != other_line:
+            return index + 1
+    return min(len(lines), len(other_lines)) + 1
+
+
+def apply_line_hunks(txt, hunks):
+    """Apply line hunks to a text, as returned by the prettier worker.
+
+    :param hunks: A list of [start, delete count, inserted lines] hunks, in
+        ascending order, where start is the (0-based) index of a line in
+        txt, and lines are split on '\\n' (without line endings).
+    :return: The changed text.
+    """
+    lines = txt.split('\n')
+    result = []
+    pos = 0
+    for start, count, inserted_lines in hunks:
+        if start < pos or start + count > len(lines):
+            raise ValueError('Invalid hunk [{0}, {1}]'.format(start, count))
+        result.extend(lines[pos:start])
+        result.extend(inserted_lines)
+        pos = start + count
+    result.extend(lines[pos:])
+    return '\n'.join(result)
+
+
+def remove_cli_args(cli_args, arg_keys):
+    """Remove options, and their values, from a list of cli args.
+
+    :param cli_args: The list of cli args, e.g. ['--parser', 'css', '--no-config'].
+    :param arg_keys: The option names to remove.
+    :return: A new list without the options.
+    """
+    result = []
+    removing_value = False
+    for arg in cli_args:
+        if removing_value:
+            removing_value = False
+            if not str(arg).startswith('--'):
+                continue
+        if arg in arg_keys:
+            removing_value = True
+            continue
+        result.append(arg)
+    return result
+
+
+def get_argv_value(cli_args, arg_key, default=None):
+    """Get the value of an option in a list of cli args.
+
+    :param cli_args: The list of cli args, e.g. ['--parser', 'css', '--no-config'].
+    :return: The value following the (last) arg_key option, or default.
+    """
+    result = default
+    for i, arg in enumerate(cli_args):
+        if arg == arg_key and i + 1 < len(cli_args) and not str(cli_args[i + 1]).startswith('--'):
+            result = cli_args[i + 1]
+    return result
+
+
+def find_project_root(folders, file_name):
+    """Find the project folder of a file.
+
+    The lookup is a longest-prefix match over the project folders (so
+    nested folders win), and is cached per set of folders and file dir.
+
+    :param folders: The window's project folders.
+    :param file_name: The file path, or None.
+    :return: The project folder, or a fallback: the only folder, the first
+        folder, or the file's dir, in that order.
+    """
+    folders = tuple(folders)
+    if len(folders) == 1:
+        return folders[0]
+    if not file_name:
+        return folders[0] if folders else os.path.expanduser('~')
+    file_dir = os.path.dirname(file_name)
+    cache_key = (folders, file_dir)
+    project_root = _project_root_cache.get(cache_key)
+    if project_root is None:
+        project_root = file_dir
+        longest = -1
+        for folder in folders:
+            prefix = folder.rstrip('/\\')
+            if (file_dir == prefix or file_dir.startswith(prefix + os.sep)) and len(prefix) > longest:
+                project_root, longest = folder, len(prefix)
+        if len(_project_root_cache) >= DIR_CACHE_MAX_ENTRIES:
+            _project_root_cache.clear()
+        _project_root_cache[cache_key] = project_root
+    return project_root
+
+
 def get_file_abs_dir(filepath):
     return os.path.abspath(os.path.dirname(filepath))
 
@@ -241,12 +483,7 @@ def which(executable, path=None):
         return executable
 
     if is_str_none_or_empty(path):
-        path = os.environ['PATH']
-        if not is_windows():
-            usr_path = ':/usr/local/bin'
-            if not env_path_contains(usr_path, path) \
-                    and env_path_exists(usr_path):
-                path += usr_path
+        path = get_proc_env_path()
 
     paths = path.split(os.pathsep)
     if not os.path.isfile(executable):
@@ -258,17 +495,192 @@ def which(executable, path=None):
     return executable
 
 
-def get_proc_env():
-    env = None
-    if not is_windows():
+def get_proc_env(node_bin_dir=None):
+    """Get the (cached) environment passed to the prettier subprocess.
+
+    The environment is computed once, seeded from the login shell
+    environment when one was captured, and then reused for every
+    format until :func:`reset_proc_env` is called.
+
+    :param node_bin_dir: An optional node runtime bin directory to put
+        in front of the PATH, e.g. a project's pinned node version.
+    :return: The environment dict, or None on Windows (inherit).
+    """
+    global _proc_env
+    if node_bin_dir:
+        env = _runtime_proc_envs.get(node_bin_dir)
+        if env is None:
+            env = (get_proc_env() or os.environ).copy()
+            env['PATH'] = os.pathsep.join([node_bin_dir, env.get('PATH', '')])
+            _runtime_proc_envs[node_bin_dir] = env
+        return env
+    if is_windows():
+        return None
+    env = _proc_env
+    if env is None:
         env = os.environ.copy()
+        if _login_shell_env:
+            env.update(_login_shell_env)
         usr_path = ':/usr/local/bin'
-        if not env_path_contains(usr_path) \
+        if not env_path_contains(usr_path, env.get('PATH')) \
                 and env_path_exists(usr_path):
-            env['PATH'] += usr_path
+            env['PATH'] = env.get('PATH', '') + usr_path
+        _proc_env = env
     return env
 
 
+def get_proc_env_path(node_bin_dir=None):
+    env = get_proc_env(node_bin_dir)
+    if env is None:
+        return os.environ['PATH']
+    return env.get('PATH', '')
+
+
+def reset_proc_env():
+    """Drop the cached subprocess environment, e.g. after a settings change."""
+    global _proc_env
+    _proc_env = None
+    _runtime_proc_envs.clear()
+
+
+def set_login_shell_env(env):
+    global _login_shell_env
+    _login_shell_env = env
+    reset_proc_env()
+
+
+def capture_login_shell_env(shell=None, timeout=10):
+    """Capture the environment of the user's login shell.
+
+    GUI launched editors (notably on Linux) don't inherit the PATH set up
+    by shell profiles, so nvm, volta and friends managed node installs are
+    not found. Running ``$SHELL -l -i -c env`` once picks those up (with
+    ``env -0`` where supported, so multi-line values are kept intact).
+
+    :param shell: The shell executable. Defaults to $SHELL.
+    :param timeout: Seconds to wait before the shell is killed.
+    :return: The captured environment dict, or None on failure.
+    """
+    if is_windows():
+        return None
+    if is_str_none_or_empty(shell):
+        shell = os.environ.get('SHELL') or '/bin/sh'
+    cmd = [shell, '-l', '-i', '-c',
+           "printf '\\n%s\\n' '{0}'; env -0 || env; printf '\\n%s\\n' '{0}'".format(LOGIN_SHELL_ENV_MARKER)]
+    try:
+        proc = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+    except OSError:
+        return None
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    try:
+        stdout, _ = proc.communicate(input=b'')
+    finally:
+        timer.cancel()
+    if proc.returncode != 0:
+        return None
+    return parse_env_output(stdout.decode('utf-8', 'replace'))
+
+
+def communicate(proc, input_data=None):
+    """Like `Popen.communicate()`, but also get the child's resource usage.
+
+    `Popen.communicate()` reaps the child with `waitpid()`, which drops its
+    resource usage. Instead, the pipes are read here (stderr and stdin in
+    threads, so full pipes can't deadlock), and the child is reaped with
+    `os.wait4()`, where available (i.e. not on windows).
+
+    :return: A (stdout, stderr, usage) tuple, where usage is a dict with the
+        child's 'user' and 'system' cpu seconds, and its peak rss in bytes
+        ('max_rss'), or None.
+    """
+    if not hasattr(os, 'wait4'):
+        stdout, stderr = proc.communicate(input=input_data)
+        return stdout, stderr, None
+
+    stderr_chunks = []
+
+    def write_stdin():
+        try:
+            if input_data:
+                proc.stdin.write(input_data)
+        except (IOError, OSError):
+            # the child exited early, its exit status tells why
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except (IOError, OSError):
+                pass
+
+    def read_stderr():
+        stderr_chunks.append(proc.stderr.read())
+
+    threads = [threading.Thread(target=write_stdin), threading.Thread(target=read_stderr)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    stdout = proc.stdout.read()
+    for thread in threads:
+        thread.join()
+    proc.stdout.close()
+    proc.stderr.close()
+
+    while True:
+        try:
+            _, status, rusage = os.wait4(proc.pid, 0)
+            break
+        except OSError as ex:
+            if ex.errno != errno.EINTR:
+                # already reaped
+                proc.wait()
+                return stdout, b''.join(stderr_chunks), None
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    # ru_maxrss is in kilobytes on linux, and in bytes on mac os:
+    max_rss = rusage.ru_maxrss if is_mac_os() else rusage.ru_maxrss * 1024
+    usage = {'user': rusage.ru_utime, 'system': rusage.ru_stime, 'max_rss': max_rss}
+    return stdout, b''.join(stderr_chunks), usage
+
+
+def parse_env_output(output, marker=LOGIN_SHELL_ENV_MARKER):
+    """Parse the `env` (or `env -0`) output printed between two marker lines.
+
+    Shell start-up files may print their own noise, so only the lines
+    between the markers are considered. NUL separated output is only split
+    on NULs, so the values are kept as is. Otherwise, lines that don't
+    start with a variable name are treated as a continuation of a
+    multi-line value.
+    """
+    markers = [m.span() for m in finditer(r'^{0}$'.format(escape(marker)), output, M)]
+    if len(markers) < 2:
+        return None
+    # the text between the marker lines, without the newline printed
+    # before the closing marker:
+    output = output[markers[0][1] + 1:markers[1][0] - 1]
+    env = {}
+    if '\0' in output:
+        for entry in output.split('\0'):
+            m = match(r'^([A-Za-z_][A-Za-z0-9_]*)=(.*)$', entry, S)
+            if m:
+                env[m.group(1)] = m.group(2)
+        return env or None
+    key = None
+    for line in output.split('\n'):
+        m = match(r'^([A-Za-z_][A-Za-z0-9_]*)=(.*)$', line)
+        if m:
+            key = m.group(1)
+            env[key] = m.group(2)
+        elif key is not None:
+            env[key] += '\n' + line
+    # the blank line printed before the closing marker:
+    if key is not None and env[key].endswith('\n'):
+        env[key] = env[key][:-1]
+    return env or None
+
+
 def resolve_prettier_ignore_path(source_file_dir, st_project_path):
     """Look for a '.prettierignore' file in ST project root (#97).
 
@@ -312,20 +724,36 @@ def parse_additional_cli_args(additional_cli_args_setting=None):
             and isinstance(additional_cli_args_setting, dict):
         for arg_key, arg_value in additional_cli_args_setting.items():
             arg_key = str(arg_key).strip()
-            arg_value = str(arg_value).strip()
             if arg_key == '':
                 # arg key cannot be empty
                 continue
-            listofargs.append(arg_key)
-            if arg_value == '':
-                # arg value can be empty... continue
-                continue
-            if is_bool_str(arg_value):
-                arg_value = arg_value.lower()
-            listofargs.append(arg_value)
+            # a list value repeats the option, e.g. {"--plugin": ["a", "b"]}:
+            arg_values = arg_value if isinstance(arg_value, list) else [arg_value]
+            for arg_value in arg_values:
+                arg_value = str(arg_value).strip()
+                listofargs.append(arg_key)
+                if arg_value == '':
+                    # arg value can be empty... continue
+                    continue
+                if is_bool_str(arg_value):
+                    arg_value = arg_value.lower()
+                listofargs.append(arg_value)
     return listofargs
 
 
+def get_plugin_cli_args(cli_args):
+    """Get the `--plugin` and `--plugin-search-dir` options of a list of cli args.
+
+    :return: A tuple of (option, value) tuples, in order.
+    """
+    plugin_args = []
+    for i, arg in enumerate(cli_args):
+        if arg in ('--plugin', '--plugin-search-dir') and i + 1 < len(cli_args) \
+                and not str(cli_args[i + 1]).startswith('--'):
+            plugin_args.append((arg, cli_args[i + 1]))
+    return tuple(plugin_args)
+
+
 def get_cli_arg_value(additional_cli_args, arg_key, arg_val_can_be_empty=False, default=None):
     if not additional_cli_args or not arg_key:
         return default
@@ -338,7 +766,7 @@ def get_cli_arg_value(additional_cli_args, arg_key, arg_val_can_be_empty=False,
                 result = key
             else:
                 result = val
-        break
+            break
     if result is None:
         return default
     return result
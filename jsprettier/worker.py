@@ -0,0 +1,747 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import errno
+import hashlib
+import json
+import os
+import select
+import socket
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+from subprocess import PIPE, Popen
+
+from . import stats
+from .const import \
+    WORKER_MODE_PROCESS, \
+    WORKER_MODE_SERVICE
+from .util import \
+    _climb_dirs, \
+    apply_line_hunks, \
+    is_windows, \
+    load_json_file
+
+WORKER_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prettier_worker.js')
+
+FRAME_HEADER = struct.Struct('>I')
+
+# seconds to wait for the shared service to come up:
+SERVICE_START_TIMEOUT = 5
+REQUEST_TIMEOUT = 30
+HEALTH_CHECK_TIMEOUT = 5
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half-open'
+
+# consecutive failures before the circuit breaker opens:
+BREAKER_FAILURE_THRESHOLD = 3
+# restart backoff, doubled on each consecutive failure (in seconds):
+RESTART_BACKOFF_BASE = 1
+RESTART_BACKOFF_MAX = 30
+
+_workers = {}
+_workers_lock = threading.Lock()
+# the start events of the workers being started, by key, see `_start_worker()`:
+_starting = {}
+_breakers = {}
+_logger = None
+
+
+class WorkerError(Exception):
+    """The worker process or service failed, or broke the protocol."""
+
+
+def set_logger(logger):
+    """Set the function worker state changes are logged with, e.g. `debug` output."""
+    global _logger
+    _logger = logger
+
+
+def _log(msg):
+    if _logger is not None:
+        _logger(msg)
+
+
+class CircuitBreaker(object):
+    """Track the failures of a worker, and decide when it may be (re)started.
+
+    Consecutive failures delay the next restart with an exponential
+    backoff. After `failure_threshold` consecutive failures the breaker
+    opens, and the worker isn't used for `cooldown` seconds, i.e. the
+    prettier cli is used instead. After the cooldown, one restart is tried
+    (half-open): a success closes the breaker, a failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.retry_at = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, state, reason):
+        if state != self.state:
+            _log("Worker '{0}' circuit breaker: {1} -> {2} ({3})".format(self.name, self.state, state, reason))
+            self.state = state
+            stats.increment('worker_breaker_{0}'.format(state.replace('-', '_')))
+
+    def allow(self, now=None):
+        """Check if the worker may be started now."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if now < self.retry_at:
+                return False
+            if self.state == BREAKER_OPEN:
+                self._transition(BREAKER_HALF_OPEN, 'cooldown of {0}s elapsed'.format(self.cooldown))
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.retry_at = 0
+            self._transition(BREAKER_CLOSED, 'request succeeded')
+
+    def record_failure(self, reason, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self.failures += 1
+            if self.state == BREAKER_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.retry_at = now + self.cooldown
+                self._transition(BREAKER_OPEN, '{0} consecutive failures, last: {1}'.format(self.failures, reason))
+            else:
+                backoff = min(RESTART_BACKOFF_BASE * 2 ** (self.failures - 1), RESTART_BACKOFF_MAX)
+                self.retry_at = now + backoff
+                _log("Worker '{0}' failed ({1}), restart in {2}s".format(self.name, reason, backoff))
+
+
+def find_prettier_package_dir(prettier_cli_path):
+    """Find the prettier package directory of a prettier cli executable.
+
+    :param prettier_cli_path: The prettier cli path, e.g. `node_modules/.bin/prettier`.
+    :return: The directory of prettier's package.json, or None.
+    """
+    if not prettier_cli_path:
+        return None
+    cli_dir = os.path.dirname(os.path.realpath(prettier_cli_path))
+    candidates = []
+    if os.path.basename(cli_dir) == '.bin':
+        # windows (and other non-symlinked) `.bin` shims:
+        candidates.append(os.path.join(os.path.dirname(cli_dir), 'prettier'))
+    candidates.extend(_climb_dirs(cli_dir, limit=4))
+    for candidate in candidates:
+        package_json = load_json_file(os.path.join(candidate, 'package.json'))
+        if isinstance(package_json, dict) and package_json.get('name') == 'prettier':
+            return candidate
+    return None
+
+
+def get_prettier_version(prettier_cli_path):
+    """Get the version of a prettier cli, from its package.json.
+
+    :return: The version, or (when the package isn't found) the cli's
+        real path and mtime, which change when prettier is upgraded.
+    """
+    prettier_dir = find_prettier_package_dir(prettier_cli_path)
+    if prettier_dir is not None:
+        package_json = load_json_file(os.path.join(prettier_dir, 'package.json'))
+        if isinstance(package_json, dict) and package_json.get('version'):
+            return str(package_json['version'])
+    real_path = os.path.realpath(prettier_cli_path)
+    try:
+        return '{0}@{1}'.format(real_path, os.path.getmtime(real_path))
+    except OSError:
+        return real_path
+
+
+def _encode_frame(message):
+    payload = json.dumps(message).encode('utf-8')
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def _request(transport, message, timeout=REQUEST_TIMEOUT):
+    """Send a framed message over a transport, and read the framed response.
+
+    A transport (`_PipeTransport` or `_SocketTransport`) sends bytes, and
+    reads an exact number of bytes.
+    """
+    transport.send(_encode_frame(message))
+    header = transport.recv_exact(FRAME_HEADER.size, timeout)
+    size, = FRAME_HEADER.unpack(header)
+    payload = transport.recv_exact(size, timeout)
+    try:
+        return json.loads(payload.decode('utf-8'))
+    except ValueError as ex:
+        raise WorkerError('Invalid response: {0}'.format(ex))
+
+
+class _PipeTransport(object):
+    """Frames over the stdin/stdout pipes of a worker process."""
+
+    def __init__(self, proc):
+        self.proc = proc
+
+    def send(self, data):
+        try:
+            self.proc.stdin.write(data)
+            self.proc.stdin.flush()
+        except (IOError, OSError) as ex:
+            raise WorkerError('Write to worker failed: {0}'.format(ex))
+
+    def recv_exact(self, size, timeout):
+        fd = self.proc.stdout.fileno()
+        chunks = []
+        remaining = size
+        deadline = time.time() + timeout
+        while remaining > 0:
+            if not is_windows():
+                # select doesn't support pipes on windows
+                ready, _, _ = select.select([fd], [], [], max(0, deadline - time.time()))
+                if not ready:
+                    raise WorkerError('Worker timed out after {0}s'.format(timeout))
+            chunk = os.read(fd, remaining)
+            if not chunk:
+                raise WorkerError('Worker exited (code {0})'.format(self.proc.poll()))
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except (IOError, OSError):
+            pass
+        if self.proc.poll() is None:
+            try:
+                self.proc.terminate()
+            except OSError:
+                pass
+
+
+class _SocketTransport(object):
+    """Frames over a unix domain socket connection to the shared service."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def send(self, data):
+        try:
+            self.sock.settimeout(REQUEST_TIMEOUT)
+            self.sock.sendall(data)
+        except (socket.error, OSError) as ex:
+            raise WorkerError('Write to service failed: {0}'.format(ex))
+
+    def recv_exact(self, size, timeout):
+        chunks = []
+        remaining = size
+        self.sock.settimeout(timeout)
+        while remaining > 0:
+            try:
+                chunk = self.sock.recv(min(remaining, 1024 * 1024))
+            except socket.timeout:
+                raise WorkerError('Service timed out after {0}s'.format(timeout))
+            except (socket.error, OSError) as ex:
+                raise WorkerError('Read from service failed: {0}'.format(ex))
+            if not chunk:
+                raise WorkerError('Service closed the connection')
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except (socket.error, OSError):
+            pass
+
+
+class PrettierWorker(object):
+    """A warm prettier, kept loaded in a node process.
+
+    The node process is either a private child process talking over
+    stdio ('process' mode), or the shared per-user service listening on a
+    unix domain socket ('service' mode). Both use the same framing, so a
+    worker only differs in how its transport is opened.
+
+    Prettier plugins (see `util.get_plugin_cli_args()`) are loaded once,
+    when the worker starts, so a worker only serves requests with the same
+    plugin options, resolved from the same plugin_cwd.
+    """
+
+    def __init__(self, node_path, prettier_dir, env=None, mode=WORKER_MODE_PROCESS, idle_timeout=600,
+                 plugin_args=(), plugin_cwd=None):
+        self.node_path = node_path
+        self.prettier_dir = prettier_dir
+        self.plugin_args = tuple(plugin_args)
+        self.plugin_cwd = plugin_cwd
+        self.env = env
+        self.mode = mode
+        self.idle_timeout = idle_timeout
+        self.info = {}
+        self._transport = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._stderr_lines = []
+        # the memory usage the worker reported with its last response:
+        self.last_stats = {}
+        self.started_at = None
+        self.retired = False
+        self.breaker = None
+
+    @property
+    def is_alive(self):
+        return self._transport is not None
+
+    def start(self):
+        if self.mode == WORKER_MODE_SERVICE:
+            self._transport = _SocketTransport(self._connect_service())
+        else:
+            self._transport = _PipeTransport(self._spawn_process())
+        try:
+            self.info = self.request('hello')
+        except WorkerError:
+            self.close()
+            raise
+        self.started_at = time.time()
+        return self
+
+    def close(self):
+        transport, self._transport = self._transport, None
+        if transport is not None:
+            transport.close()
+
+    def request(self, method, params=None, timeout=REQUEST_TIMEOUT, blocking=True):
+        """Send a request, and wait for its response.
+
+        :param blocking: When False, return None instead of waiting for
+            another request in flight.
+        :raise WorkerError: If the worker failed, in which case it's stopped.
+        """
+        if not self._lock.acquire(blocking):
+            return None
+        try:
+            if self._transport is None:
+                raise WorkerError('Worker is not running')
+            self._next_id += 1
+            message = {'id': self._next_id, 'method': method, 'params': params or {}}
+            try:
+                response = _request(self._transport, message, timeout)
+                if not isinstance(response, dict) or response.get('id') != message['id']:
+                    raise WorkerError('Unexpected response {0!r:.100}'.format(response))
+            except WorkerError as ex:
+                transport, self._transport = self._transport, None
+                transport.close()
+                self._record_failure(ex)
+                raise
+        finally:
+            self._lock.release()
+        if response.get('worker'):
+            self.last_stats = response['worker']
+        if 'error' in response:
+            raise WorkerError(response['error'])
+        if self.breaker is not None and method != 'hello':
+            self.breaker.record_success()
+        return response.get('result') or {}
+
+    def _record_failure(self, ex):
+        if self.breaker is not None and not self.retired:
+            self.breaker.record_failure(ex)
+
+    def format(self, prettier_options, source, cwd, source_path=None):
+        """Format source with the prettier cli args in prettier_options.
+
+        The worker only sends the formatted code back when it changed, as the
+        changed lines when that's much smaller (see `util.apply_line_hunks()`).
+
+        :param source: The code to format, or None to have the worker read
+            it from source_path.
+        :return: A (formatted, error, usage) tuple, where error is the
+            prettier error output when formatting failed, e.g. on syntax
+            errors, and usage the cpu time and peak rss (see `util.communicate()`).
+            When the code is formatted already, formatted is source, i.e.
+            None when the worker read source_path.
+        """
+        params = {'argv': prettier_options, 'cwd': cwd, 'compact': True}
+        if source is None:
+            params['sourcePath'] = source_path
+        else:
+            params['source'] = source
+        result = self.request('format', params)
+        formatted, error = result.get('formatted'), result.get('error')
+        unchanged = result.get('unchanged') is True
+        if unchanged:
+            formatted = source
+        elif 'hunks' in result and source is not None:
+            try:
+                formatted = apply_line_hunks(source, result['hunks'])
+            except (TypeError, ValueError):
+                formatted = None
+        if not unchanged and not isinstance(formatted, type(u'')) and not isinstance(error, type(u'')):
+            # a worker returning garbage is as good as a crashed one:
+            self.close()
+            ex = WorkerError('Invalid format result {0!r:.100}'.format(result))
+            self._record_failure(ex)
+            raise ex
+        if error is None:
+            stats.increment('worker_unchanged' if unchanged else
+                            'worker_hunks' if 'hunks' in result else 'worker_formatted')
+        usage = result.get('usage')
+        if usage:
+            usage = {'user': usage.get('user', 0), 'system': usage.get('system', 0),
+                     'max_rss': usage.get('maxRss', 0)}
+        return formatted, error, usage
+
+    def recycle_reason(self, max_requests=0, max_memory_mb=0):
+        """Check the last reported stats against the recycle limits.
+
+        :param max_requests: Recycle after this many requests, 0 for no limit.
+        :param max_memory_mb: Recycle above this RSS, 0 for no limit.
+        :return: The reason to recycle the worker, or None.
+        """
+        requests = self.last_stats.get('requests', 0)
+        rss = self.last_stats.get('rss', 0)
+        if max_requests and requests >= max_requests:
+            return 'served {0} requests'.format(requests)
+        if max_memory_mb and rss > max_memory_mb * 1024 * 1024:
+            return 'rss {0} MB above {1} MB'.format(rss // (1024 * 1024), max_memory_mb)
+        return None
+
+    def drain(self):
+        """Close the worker once its in-flight request (if any) is done."""
+        with self._lock:
+            transport, self._transport = self._transport, None
+        if transport is not None:
+            transport.close()
+
+    @property
+    def stderr_output(self):
+        return ''.join(self._stderr_lines)
+
+    def _worker_cmd(self):
+        cmd = [self.node_path, WORKER_SCRIPT_PATH, '--prettier', self.prettier_dir]
+        for option, value in self.plugin_args:
+            cmd += [option, value]
+        if self.plugin_args:
+            cmd += ['--plugin-cwd', self.plugin_cwd or os.getcwd()]
+        return cmd
+
+    def _spawn_process(self):
+        try:
+            proc = Popen(self._worker_cmd(), stdin=PIPE, stdout=PIPE, stderr=PIPE, env=self.env)
+        except OSError as ex:
+            raise WorkerError('Failed to start the worker: {0}'.format(ex))
+
+        def drain_stderr():
+            # keep the last lines only, a full stderr pipe would block the worker
+            for line in iter(proc.stderr.readline, b''):
+                self._stderr_lines.append(line.decode('utf-8', 'replace'))
+                del self._stderr_lines[:-100]
+
+        thread = threading.Thread(target=drain_stderr)
+        thread.daemon = True
+        thread.start()
+        return proc
+
+    def _connect_service(self):
+        socket_path = get_service_socket_path(self.node_path, self.prettier_dir, self.plugin_args, self.plugin_cwd)
+        if socket_path is None:
+            raise WorkerError('No safe dir for the service socket')
+        sock = _connect_unix_socket(socket_path)
+        if sock is not None:
+            return sock
+
+        # auto-spawn the service on first use:
+        log_path = socket_path + '.log'
+        cmd = self._worker_cmd() + ['--socket', socket_path, '--idle-timeout', str(self.idle_timeout)]
+        try:
+            with open(os.devnull, 'rb') as devnull, open(log_path, 'ab') as log_file:
+                proc = _spawn_detached(cmd, devnull, log_file, self.env)
+        except (IOError, OSError) as ex:
+            raise WorkerError('Failed to start the service: {0}'.format(ex))
+
+        deadline = time.time() + SERVICE_START_TIMEOUT
+        while time.time() < deadline:
+            sock = _connect_unix_socket(socket_path)
+            if sock is not None:
+                return sock
+            if proc.poll() not in (None, 0):
+                break
+            time.sleep(0.05)
+        raise WorkerError('Failed to connect to the service at {0} (see {1})'.format(socket_path, log_path))
+
+
+def _spawn_detached(cmd, stdin, stdout, env):
+    # the service outlives the plugin host, so it gets its own session
+    # (preexec_fn isn't safe in the multi-threaded plugin host, it's only
+    # used on python 2, which lacks start_new_session):
+    if sys.version_info[0] >= 3:
+        session_kwargs = {'start_new_session': True}
+    else:
+        session_kwargs = {'preexec_fn': os.setsid}
+    proc = Popen(cmd, stdin=stdin, stdout=stdout, stderr=stdout, env=env, close_fds=True, **session_kwargs)
+    _detached_procs.append(proc)
+    # reap services that exited meanwhile:
+    _detached_procs[:] = [p for p in _detached_procs if p.poll() is None]
+    return proc
+
+
+_detached_procs = []
+
+
+def _connect_unix_socket(socket_path):
+    if not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (socket.error, OSError) as ex:
+        sock.close()
+        if ex.errno in (errno.ECONNREFUSED, errno.ENOENT):
+            return None
+        raise WorkerError('Failed to connect to the service: {0}'.format(ex))
+    return sock
+
+
+def get_service_dir():
+    """Get (and create) the per-user dir of the shared service sockets.
+
+    The dir is in the shared temp dir, so it's only used if the user owns
+    it, and other users can't access it. Otherwise another user could own
+    the sockets, and receive the code of every file formatted.
+
+    :return: The dir, or None if it's not safe to use.
+    """
+    service_dir = os.path.join(tempfile.gettempdir(), 'jsprettier-{0}'.format(os.getuid()))
+    try:
+        os.mkdir(service_dir, 0o700)
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            _log("Failed to create the service dir '{0}': {1}".format(service_dir, ex))
+            return None
+    try:
+        dir_stat = os.lstat(service_dir)
+    except OSError as ex:
+        _log("Failed to stat the service dir '{0}': {1}".format(service_dir, ex))
+        return None
+    if not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_uid != os.getuid() or dir_stat.st_mode & 0o077:
+        _log("Not using the service dir '{0}', it's not a private dir of the user".format(service_dir))
+        return None
+    return service_dir
+
+
+def get_service_socket_path(node_path, prettier_dir, plugin_args=(), plugin_cwd=None):
+    """Get the per-user unix domain socket path of the shared service.
+
+    There's one service per node and prettier install, and plugin set.
+
+    :return: The socket path, or None if the service dir isn't safe to use
+        (see `get_service_dir()`).
+    """
+    service_dir = get_service_dir()
+    if service_dir is None:
+        return None
+    service_key = '{0}\n{1}'.format(node_path, prettier_dir)
+    if plugin_args:
+        service_key += '\n{0!r}\n{1}'.format(tuple(plugin_args), plugin_cwd)
+    service_id = hashlib.sha1(service_key.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(service_dir, 'prettier-{0}.sock'.format(service_id))
+
+
+def _worker_key(worker):
+    return worker.mode, worker.node_path, worker.prettier_dir, worker.plugin_args, worker.plugin_cwd
+
+
+def _get_breaker(key, cooldown):
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker('{0}:{1}'.format(key[0], key[2]), cooldown=cooldown)
+    breaker.cooldown = cooldown
+    return breaker
+
+
+def _start_worker(key, env, idle_timeout, breaker, started):
+    """Start the worker of key, in the start slot reserved by the caller (see `_starting`).
+
+    Called without `_workers_lock` held, so a cold start (spawning node,
+    and the hello round trip) doesn't block the formats using other workers.
+
+    :param started: The slot's event, set once the worker is started (or failed to).
+    """
+    try:
+        if not breaker.allow():
+            raise WorkerError('Worker circuit breaker is {0}, retrying in {1:.0f}s'.format(
+                breaker.state, max(0, breaker.retry_at - time.time())))
+        mode, node_path, prettier_dir, plugin_args, plugin_cwd = key
+        worker = PrettierWorker(node_path, prettier_dir, env, mode, idle_timeout, plugin_args, plugin_cwd)
+        try:
+            worker.start()
+        except WorkerError as ex:
+            breaker.record_failure(ex)
+            raise
+        # set once started, so a failed hello isn't recorded twice:
+        worker.breaker = breaker
+        _log("Worker '{0}' started (pid {1})".format(breaker.name, worker.info.get('pid')))
+        with _workers_lock:
+            _workers[key] = worker
+        return worker
+    finally:
+        with _workers_lock:
+            _starting.pop(key, None)
+        started.set()
+
+
+def get_worker(node_path, prettier_dir, env=None, mode=WORKER_MODE_PROCESS, idle_timeout=600, cooldown=60,
+               plugin_args=(), plugin_cwd=None):
+    """Get a running worker, starting one if necessary.
+
+    :param plugin_args: The plugin options of the request, the worker
+        preloads (see `PrettierWorker`).
+    :param plugin_cwd: The dir relative plugin options are resolved from.
+    :param cooldown: The seconds the worker isn't used after repeated
+        failures, see `CircuitBreaker`.
+    :raise WorkerError: If the worker can't be started, or it's not
+        restarted yet after failures.
+    """
+    if mode == WORKER_MODE_SERVICE and (is_windows() or get_service_dir() is None):
+        # no unix domain sockets on windows, or no safe dir for them:
+        mode = WORKER_MODE_PROCESS
+    plugin_args = tuple(plugin_args)
+    key = (mode, node_path, prettier_dir, plugin_args, plugin_cwd if plugin_args else None)
+    while True:
+        with _workers_lock:
+            worker = _workers.get(key)
+            # a retired worker keeps serving until its replacement is up:
+            if worker is not None and worker.is_alive:
+                return worker
+            breaker = _get_breaker(key, cooldown)
+            started = _starting.get(key)
+            if started is None:
+                started = _starting[key] = threading.Event()
+                break
+        # another thread is starting the worker, use it once it's up:
+        started.wait(SERVICE_START_TIMEOUT + REQUEST_TIMEOUT)
+    return _start_worker(key, env, idle_timeout, breaker, started)
+
+
+def check_workers_health():
+    """Ping the idle workers, and restart the failed ones (see `CircuitBreaker`).
+
+    Meant to be called periodically, from a background thread.
+    """
+    with _workers_lock:
+        workers = list(_workers.items())
+    for key, worker in workers:
+        if worker.is_alive:
+            try:
+                # busy workers are obviously alive
+                worker.request('ping', timeout=HEALTH_CHECK_TIMEOUT, blocking=False)
+                continue
+            except WorkerError as ex:
+                _log("Worker '{0}' health check failed: {1}".format(key[0], ex))
+        with _workers_lock:
+            if _workers.get(key) is not worker or worker.retired or key in _starting:
+                continue
+            started = _starting[key] = threading.Event()
+        try:
+            _start_worker(key, worker.env, worker.idle_timeout, worker.breaker, started)
+        except WorkerError:
+            # retried on the next check (or use)
+            pass
+
+
+def recycle_if_needed(worker, max_requests=0, max_memory_mb=0):
+    """Replace a worker that served too many requests, or grew too large.
+
+    The replacement is started in a background thread, and swapped in
+    before the old worker is drained, so formatting never waits on a cold
+    start. In 'service' mode the old service is asked to retire first: it
+    hands over its socket path, and exits once its clients disconnect.
+
+    :return: The recycle thread, or None if the worker is within limits.
+    """
+    reason = worker.recycle_reason(max_requests, max_memory_mb)
+    if reason is None:
+        return None
+    with _workers_lock:
+        if worker.retired:
+            return None
+        worker.retired = True
+
+    def recycle():
+        old_stats = dict(worker.last_stats)
+        if worker.mode == WORKER_MODE_SERVICE:
+            try:
+                worker.request('retire')
+            except WorkerError:
+                pass
+        replacement = None
+        try:
+            replacement = PrettierWorker(worker.node_path, worker.prettier_dir, worker.env, worker.mode,
+                                         worker.idle_timeout, worker.plugin_args, worker.plugin_cwd)
+            replacement.breaker = worker.breaker
+            replacement.start()
+        except WorkerError as ex:
+            # get_worker() starts a fresh worker on next use
+            _log('Failed to start a replacement worker: {0}'.format(ex))
+        with _workers_lock:
+            key = _worker_key(worker)
+            if _workers.get(key) is worker:
+                if replacement is not None:
+                    _workers[key] = replacement
+                else:
+                    del _workers[key]
+            elif replacement is not None:
+                # the old worker died meanwhile, and get_worker() replaced it
+                replacement.close()
+        worker.drain()
+        stats.record_event('worker_recycles', {
+            'mode': worker.mode,
+            'pid': worker.info.get('pid'),
+            'reason': reason,
+            'requests': old_stats.get('requests', 0),
+            'rss': old_stats.get('rss', 0)
+        })
+
+    thread = threading.Thread(target=recycle)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def get_workers_stats():
+    """Get the last reported stats of the running workers.
+
+    :return: A list of dicts, with the worker's mode, pid, node and prettier
+        versions, and memory usage.
+    """
+    with _workers_lock:
+        workers = list(_workers.values())
+    workers_stats = []
+    for worker in workers:
+        worker_stats = {
+            'mode': worker.mode,
+            'pid': worker.info.get('pid'),
+            'node': worker.info.get('node'),
+            'prettier': worker.info.get('prettier'),
+            'plugins': len(worker.info.get('plugins') or ()),
+            'alive': worker.is_alive,
+            'uptime': time.time() - worker.started_at if worker.started_at else 0
+        }
+        worker_stats.update(worker.last_stats)
+        workers_stats.append(worker_stats)
+    return workers_stats
+
+
+def shutdown_workers():
+    """Stop the worker processes, and disconnect from the shared service."""
+    with _workers_lock:
+        for worker in _workers.values():
+            worker.close()
+        _workers.clear()
+        _breakers.clear()
@@ -0,0 +1,233 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+from .const import \
+    PRETTIER_CONFIG_FILES, \
+    PRETTIER_IGNORE_FILE
+from .util import load_json_file
+
+# directories never indexed (besides hidden ones):
+SKIPPED_DIRS = frozenset(['node_modules', 'bower_components'])
+
+# stop indexing huge trees, files outside the index use the regular lookups:
+MAX_INDEXED_DIRS = 50000
+
+# seconds between (incremental) index refreshes:
+REFRESH_INTERVAL = 5
+
+PRETTIER_BIN_PATH = os.path.join('node_modules', '.bin', 'prettier')
+
+# what a file resolves to, each of the paths may be None:
+WorkspaceResolution = namedtuple('WorkspaceResolution', [
+    'package_root',
+    'prettier_cli_path',
+    'config_path',
+    'ignore_path'
+])
+
+_DirEntry = namedtuple('_DirEntry', [
+    'mtime',
+    'subdirs',
+    'config_path',
+    'ignore_path',
+    'is_package',
+    # the mtimes of package.json and node_modules/.bin, which don't
+    # change the directory's mtime when modified:
+    'package_mtimes'
+])
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _stat_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _scan_dir(directory):
+    """Scan a directory for its subdirs, prettier config and ignore files.
+
+    :return: A `_DirEntry`, or None if the directory is gone.
+    """
+    mtime = _stat_mtime(directory)
+    if mtime is None:
+        return None
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None
+    name_set = frozenset(names)
+    subdirs = tuple(sorted(
+        name for name in names
+        if not name.startswith('.') and name not in SKIPPED_DIRS and os.path.isdir(os.path.join(directory, name))))
+
+    config_path = None
+    for config_file in PRETTIER_CONFIG_FILES:
+        if config_file not in name_set:
+            continue
+        path = os.path.join(directory, config_file)
+        if config_file == 'package.json':
+            package_json = load_json_file(path)
+            if not isinstance(package_json, dict) or 'prettier' not in package_json:
+                continue
+        config_path = path
+        break
+
+    ignore_path = os.path.join(directory, PRETTIER_IGNORE_FILE) if PRETTIER_IGNORE_FILE in name_set else None
+    is_package = 'package.json' in name_set
+    package_mtimes = None
+    if is_package:
+        package_mtimes = (_stat_mtime(os.path.join(directory, 'package.json')),
+                          _stat_mtime(os.path.join(directory, 'node_modules', '.bin')))
+    return _DirEntry(mtime, subdirs, config_path, ignore_path, is_package, package_mtimes)
+
+
+class WorkspaceIndex(object):
+    """An index of the package roots, prettier configs and ignore files of a project.
+
+    The index is built in a background thread, by walking the project
+    tree once (skipping `node_modules` and hidden directories). Later
+    refreshes only rescan the directories whose mtime changed. Files are
+    resolved to their nearest package, config and ignore file by walking
+    up the indexed directories, i.e. a longest-prefix lookup that needs no
+    file system access.
+    """
+
+    def __init__(self, project_path):
+        self.project_path = project_path.rstrip('/\\') or project_path
+        self.ready = False
+        self.truncated = False
+        self.refreshed_at = 0
+        self._entries = {}
+        self._prettier_bins = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+
+    def start_refresh(self):
+        """Build or refresh the index in a background thread."""
+        with self._lock:
+            if self._refreshing:
+                return None
+            self._refreshing = True
+        thread = threading.Thread(target=self.refresh)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def refresh(self):
+        """Build the index, or rescan the directories that changed."""
+        try:
+            with self._refresh_lock:
+                with self._lock:
+                    known_dirs = list(self._entries.items())
+                if not known_dirs:
+                    self._index_tree(self.project_path)
+                else:
+                    for directory, entry in known_dirs:
+                        if self._is_stale(directory, entry):
+                            self._index_tree(directory)
+                self.ready = True
+                self.refreshed_at = time.time()
+        finally:
+            self._refreshing = False
+
+    def _is_stale(self, directory, entry):
+        if _stat_mtime(directory) != entry.mtime:
+            return True
+        if entry.is_package:
+            return entry.package_mtimes != (_stat_mtime(os.path.join(directory, 'package.json')),
+                                            _stat_mtime(os.path.join(directory, 'node_modules', '.bin')))
+        return False
+
+    def _index_tree(self, top):
+        """(Re)index top, and the subdirs that are new or changed."""
+        pending = [top]
+        while pending:
+            directory = pending.pop()
+            entry = _scan_dir(directory)
+            with self._lock:
+                old_entry = self._entries.get(directory)
+                if entry is None:
+                    self._remove_tree(directory)
+                    continue
+                if old_entry is None and len(self._entries) >= MAX_INDEXED_DIRS:
+                    self.truncated = True
+                    continue
+                self._entries[directory] = entry
+                self._prettier_bins.pop(directory, None)
+                if entry.is_package:
+                    prettier_bin = os.path.join(directory, PRETTIER_BIN_PATH)
+                    if os.path.exists(prettier_bin):
+                        self._prettier_bins[directory] = prettier_bin
+                old_subdirs = set(old_entry.subdirs) if old_entry is not None else set()
+                for name in old_subdirs.difference(entry.subdirs):
+                    self._remove_tree(os.path.join(directory, name))
+            for name in entry.subdirs:
+                subdir = os.path.join(directory, name)
+                if name not in old_subdirs or subdir not in self._entries:
+                    pending.append(subdir)
+
+    def _remove_tree(self, top):
+        # called with the lock held
+        prefix = top + os.sep
+        for directory in [d for d in self._entries if d == top or d.startswith(prefix)]:
+            del self._entries[directory]
+            self._prettier_bins.pop(directory, None)
+
+    def resolve(self, file_path):
+        """Resolve a file to its package root, local prettier, config and ignore file.
+
+        :return: A `WorkspaceResolution`, or None if the file's directory
+            isn't indexed (yet).
+        """
+        if time.time() - self.refreshed_at > REFRESH_INTERVAL:
+            self.start_refresh()
+        directory = os.path.dirname(file_path)
+        with self._lock:
+            if not self.ready or directory not in self._entries:
+                return None
+            package_root = prettier_cli_path = config_path = ignore_path = None
+            while True:
+                entry = self._entries.get(directory)
+                if entry is None:
+                    break
+                if package_root is None and entry.is_package:
+                    package_root = directory
+                if prettier_cli_path is None:
+                    prettier_cli_path = self._prettier_bins.get(directory)
+                if config_path is None:
+                    config_path = entry.config_path
+                if ignore_path is None:
+                    ignore_path = entry.ignore_path
+                if directory == self.project_path:
+                    break
+                directory = os.path.dirname(directory)
+        return WorkspaceResolution(package_root, prettier_cli_path, config_path, ignore_path)
+
+
+def get_workspace_index(project_path):
+    """Get the index of a project, starting to build it if necessary.
+
+    The index isn't ready before its first (background) build finished,
+    see `WorkspaceIndex.resolve()`.
+    """
+    with _indexes_lock:
+        index = _indexes.get(project_path)
+        if index is None:
+            index = _indexes[project_path] = WorkspaceIndex(project_path)
+            index.start_refresh()
+        return index
+
+
+def clear_workspace_indexes():
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,73 @@
+#!/usr/bin/env node
+/*
+ * A stand-in for the prettier cli, used to test the plugin's cli runs.
+ *
+ * `--support-info` prints the options (and deprecations) of prettier 2.4.
+ * Otherwise, the source (from stdin, or the file path argument) is
+ * "formatted" by upper casing its x characters. Like prettier, nothing is
+ * printed for a file path matched by the `--ignore-path` file (which only
+ * lists file names here).
+ */
+
+'use strict';
+
+var fs = require('fs');
+var path = require('path');
+
+var args = process.argv.slice(2);
+
+if (args.indexOf('--support-info') !== -1) {
+    process.stdout.write(JSON.stringify({
+        languages: [],
+        options: [
+            {name: 'printWidth', type: 'int', default: 80},
+            {name: 'bracketSameLine', type: 'boolean', default: false},
+            {name: 'jsxBracketSameLine', type: 'boolean', deprecated: '2.4.0'},
+            {
+                name: 'parser',
+                type: 'choice',
+                choices: [
+                    {value: 'flow'},
+                    {value: 'babel'},
+                    {value: 'babylon', deprecated: '1.16.0', redirect: 'babel'},
+                    {value: 'postcss', deprecated: '1.14.0', redirect: 'css'},
+                    {value: 'css'}
+                ]
+            },
+            {
+                name: 'proseWrap',
+                type: 'choice',
+                choices: [
+                    {value: 'always'},
+                    {value: false, deprecated: '1.9.0', redirect: 'preserve'},
+                    {value: 'preserve'}
+                ]
+            }
+        ]
+    }, null, 2) + '\n');
+    process.exit(0);
+}
+
+function format(source) {
+    process.stdout.write(source.replace(/x/g, 'X'));
+}
+
+if (args.indexOf('--stdin') !== -1) {
+    var chunks = [];
+    process.stdin.on('data', function (chunk) {
+        chunks.push(chunk);
+    });
+    process.stdin.on('end', function () {
+        format(Buffer.concat(chunks).toString('utf8'));
+    });
+} else {
+    var filePath = args[args.length - 1];
+    var ignorePathIndex = args.indexOf('--ignore-path');
+    if (ignorePathIndex !== -1) {
+        var ignored = fs.readFileSync(args[ignorePathIndex + 1], 'utf8').split('\n');
+        if (ignored.indexOf(path.basename(filePath)) !== -1) {
+            process.exit(0);
+        }
+    }
+    format(fs.readFileSync(filePath, 'utf8'));
+}
@@ -0,0 +1,28 @@
+/*
+ * A stand-in for the prettier api, used to test the worker protocol.
+ *
+ * `format` echoes the source and the options it was called with, except
+ * for the test parsers: `test-identity` returns the source as is, and
+ * `test-upper-x` upper cases the x characters of the source.
+ */
+
+'use strict';
+
+module.exports = {
+    version: '0.0.0-test',
+
+    format: function (source, options) {
+        if (source.indexOf('syntax error') !== -1) {
+            var error = new SyntaxError('Unexpected token (1:8)');
+            error.loc = {start: {line: 1, column: 8}};
+            throw error;
+        }
+        if (options.parser === 'test-identity') {
+            return source;
+        }
+        if (options.parser === 'test-upper-x') {
+            return source.replace(/x/g, 'X');
+        }
+        return JSON.stringify({source: source, options: options});
+    }
+};
@@ -0,0 +1,9 @@
+/*
+ * A stand-in for a prettier plugin, preloaded by the worker.
+ */
+
+'use strict';
+
+module.exports = {
+    name: 'test-plugin'
+};
@@ -0,0 +1,28 @@
+"""Load the plugin like sublime text does, and print its load time and modules as json.
+
+Run in a new interpreter, so nothing is imported beforehand.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import importlib
+import json
+import os
+import sys
+import types
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(FIXTURE_DIR)))
+
+sys.path[:0] = [FIXTURE_DIR, ROOT_DIR]
+
+# the plugin is loaded as the `JsPrettier.JsPrettier` module of the package dir:
+package = types.ModuleType('JsPrettier')
+package.__path__ = [ROOT_DIR]
+sys.modules['JsPrettier'] = package
+importlib.import_module('JsPrettier.JsPrettier')
+
+# the plugin imports `jsprettier` absolutely on python 2x:
+stats = sys.modules.get('JsPrettier.jsprettier.stats') or sys.modules['jsprettier.stats']
+count, total, longest = stats.get_timings()['plugin_load']
+print(json.dumps({'load_time': total, 'modules': sorted(sys.modules)}))
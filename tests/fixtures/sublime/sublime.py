@@ -0,0 +1,104 @@
+"""A stand-in for the `sublime` module, with just enough to load the plugin and run its commands."""
+
+# the settings files, by name:
+_settings = {}
+
+
+def version():
+    return '4000'
+
+
+def packages_path():
+    return '/tmp/Packages'
+
+
+def cache_path():
+    return '/tmp/Cache'
+
+
+def load_settings(name):
+    return _settings.setdefault(name, Settings())
+
+
+def set_timeout(callback, delay=0):
+    pass
+
+
+def status_message(msg):
+    pass
+
+
+def active_window():
+    return Window()
+
+
+class Settings(dict):
+    def add_on_change(self, key, callback):
+        pass
+
+    def clear_on_change(self, key):
+        pass
+
+
+class Region(object):
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+
+class View(object):
+    _next_id = 1
+
+    def __init__(self, file_name=None, settings=None, scope='source.js', text=''):
+        self._id = View._next_id
+        View._next_id += 1
+        self._file_name = file_name
+        self._settings = Settings(settings or {})
+        self._scope = scope
+        self._text = text
+        self._change_count = 0
+
+    def id(self):
+        return self._id
+
+    def change_count(self):
+        return self._change_count
+
+    def set_text(self, text):
+        """Replace the buffer, like an edit (not part of the sublime api)."""
+        self._text = text
+        self._change_count += 1
+
+    def file_name(self):
+        return self._file_name
+
+    def scope_name(self, pt):
+        return self._scope
+
+    def sel(self):
+        return [Region(0)]
+
+    def size(self):
+        return len(self._text)
+
+    def substr(self, region):
+        return self._text[region.begin():region.end()]
+
+    def line(self, pt):
+        begin = self._text.rfind('\n', 0, pt) + 1
+        end = self._text.find('\n', pt)
+        return Region(begin, len(self._text) if end == -1 else end)
+
+    def settings(self):
+        return self._settings
+
+
+class Window(object):
+    def active_view(self):
+        return View()
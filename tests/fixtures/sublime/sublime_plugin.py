@@ -0,0 +1,15 @@
+"""A stand-in for the `sublime_plugin` module, with just enough to load the plugin."""
+
+
+class TextCommand(object):
+    def __init__(self, view):
+        self.view = view
+
+
+class WindowCommand(object):
+    def __init__(self, window):
+        self.window = window
+
+
+class EventListener(object):
+    pass
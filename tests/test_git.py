@@ -0,0 +1,71 @@
+"""Git helper tests."""
+from __future__ import absolute_import
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from jsprettier.git import \
+    ChangedFile, \
+    find_repo_root, \
+    get_changed_files, \
+    get_changed_line_ranges, \
+    parse_diff_hunks, \
+    parse_status
+from jsprettier.util import get_line_range_offsets
+
+
+def _has_git():
+    try:
+        subprocess.check_output(['git', '--version'])
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return True
+
+
+class TestGit(unittest.TestCase):
+    def test_parse_status(self):
+        output = ' M src/a.js\0A  b.css\0R  new.js\0old.js\0 D gone.js\0?? c.md\0'
+        self.assertEqual(parse_status(output, '/repo'), [
+            ChangedFile(os.path.normpath('/repo/b.css'), False),
+            ChangedFile(os.path.normpath('/repo/c.md'), True),
+            ChangedFile(os.path.normpath('/repo/new.js'), False),
+            ChangedFile(os.path.normpath('/repo/src/a.js'), False)])
+
+    def test_parse_diff_hunks(self):
+        output = '--- a/a.js\n+++ b/a.js\n@@ -1 +1 @@\n-a\n+b\n@@ -5,0 +6,3 @@\n@@ -10,2 +12,0 @@\n'
+        self.assertEqual(parse_diff_hunks(output), [(1, 1), (6, 8)])
+
+    def test_line_range_offsets(self):
+        self.assertEqual(get_line_range_offsets('a\nbb\r\nccc\n', 2, 3), (2, 10))
+        self.assertEqual(get_line_range_offsets('a\nbb', 2, 5), (2, 4))
+
+    @unittest.skipUnless(_has_git(), 'git is not installed')
+    def test_changed_files(self):
+        repo = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, repo)
+
+        def git(*args):
+            subprocess.check_output(['git', '-c', 'user.name=t', '-c', 'user.email=t@t'] + list(args), cwd=repo)
+
+        def write(name, text):
+            with io.open(os.path.join(repo, name), 'w', newline='') as f:
+                f.write(text)
+
+        git('init', '-q')
+        write('a.js', u'1\n2\n3\n4\n')
+        git('add', 'a.js')
+        git('commit', '-q', '-m', 'init')
+        write('a.js', u'1\nx\n3\n4\ny\n')
+        write('b.js', u'new\n')
+
+        self.assertEqual(find_repo_root(repo), repo)
+        changed_files = get_changed_files(repo)
+        self.assertEqual(changed_files, [ChangedFile(os.path.join(repo, 'a.js'), False),
+                                         ChangedFile(os.path.join(repo, 'b.js'), True)])
+        self.assertEqual(get_changed_line_ranges(repo, changed_files[0]), [(2, 2), (5, 5)])
+        self.assertIsNone(get_changed_line_ranges(repo, changed_files[1]))
+        self.assertIsNone(find_repo_root(tempfile.gettempdir()))
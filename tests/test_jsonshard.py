@@ -0,0 +1,103 @@
+"""Large json sharding tests."""
+from __future__ import absolute_import
+
+import io
+import json
+import os
+import random
+import unittest
+from collections import OrderedDict
+
+from jsprettier.jsonshard import \
+    SHARD_KEY, \
+    join_json_shards, \
+    split_json
+from jsprettier.util import which
+from jsprettier.worker import \
+    PrettierWorker, \
+    WORKER_MODE_PROCESS, \
+    find_prettier_package_dir
+
+NODE_PATH = which('node')
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'json')
+
+
+def _find_prettier_dir():
+    prettier_dir = os.environ.get('JSPRETTIER_TEST_PRETTIER_DIR')
+    if prettier_dir:
+        return prettier_dir
+    prettier_cli_path = which('prettier')
+    return find_prettier_package_dir(prettier_cli_path) if prettier_cli_path else None
+
+
+PRETTIER_DIR = _find_prettier_dir()
+
+
+def _load_corpus():
+    corpus = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        with io.open(os.path.join(CORPUS_DIR, name), encoding='utf-8') as f:
+            corpus[name] = f.read()
+    rand = random.Random(41)
+    elements = []
+    for index in range(300):
+        element = OrderedDict([('id', index), ('name', 'item {0}'.format(index) * rand.randint(1, 12))])
+        if rand.random() < 0.5:
+            element['values'] = [rand.randint(-1000, 1000) for _ in range(rand.randint(0, 30))]
+        elements.append(json.dumps(element, indent=rand.choice([None, 1])))
+    corpus['generated.json'] = '[' + ''.join(
+        element + (',' + '\n' * rand.randint(0, 2) if i < len(elements) - 1 else '')
+        for i, element in enumerate(elements)) + ']'
+    return corpus
+
+
+def _loads(source):
+    return json.loads(source, object_pairs_hook=OrderedDict)
+
+
+def _dumps(data):
+    return json.dumps(data, indent=2, separators=(',', ': '))
+
+
+class TestJsonShard(unittest.TestCase):
+    def test_split(self):
+        for name, source in _load_corpus().items():
+            kind, shards = split_json(source, shard_size=100)
+            self.assertGreater(len(shards), 1, name)
+            if kind == '[':
+                data = [e for shard in shards for e in _loads(shard) if e != {SHARD_KEY: 0}]
+            else:
+                data = OrderedDict((k, v) for shard in shards for k, v in _loads(shard).items() if k != SHARD_KEY)
+            self.assertEqual(data, _loads(source), name)
+
+    def test_unsplittable(self):
+        for source in ('1', '"a"', '[]', '{}', '[1, 2, 3, 4]', '[1, 2] x', '[1, // c\n 2]', '{"a": 1, }', '[1, 2'):
+            self.assertIsNone(split_json(source, shard_size=1), source)
+
+    def test_join(self):
+        # json.dumps() stands in for prettier, which formats the same way
+        # every element or member of a broken container:
+        for name, source in _load_corpus().items():
+            kind, shards = split_json(source, shard_size=100)
+            joined = join_json_shards(kind, [_dumps(_loads(shard)) + '\n' for shard in shards])
+            self.assertEqual(joined, _dumps(_loads(source)) + '\n', name)
+        self.assertIsNone(join_json_shards('[', ['[\n  1\n]\n', '[\n  2\n]\n']))
+
+    @unittest.skipIf(NODE_PATH is None or PRETTIER_DIR is None, 'node or prettier is not installed')
+    def test_same_as_single_pass(self):
+        worker = PrettierWorker(NODE_PATH, PRETTIER_DIR, mode=WORKER_MODE_PROCESS).start()
+        try:
+            for print_width in ('80', '40'):
+                argv = ['--no-config', '--parser', 'json', '--print-width', print_width]
+                for name, source in _load_corpus().items():
+                    expected, error, _ = worker.format(argv, source, CORPUS_DIR)
+                    self.assertIsNone(error, name)
+                    for shard_size in (1, 100, 1000):
+                        split = split_json(source, shard_size)
+                        if split is None:
+                            continue
+                        kind, shards = split
+                        formatted_shards = [worker.format(argv, shard, CORPUS_DIR)[0] for shard in shards]
+                        self.assertEqual(join_json_shards(kind, formatted_shards), expected, name)
+        finally:
+            worker.close()
@@ -0,0 +1,55 @@
+"""Lazy module and plugin load time tests."""
+from __future__ import absolute_import
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from jsprettier import stats
+from jsprettier.lazy import LazyModule
+
+LOAD_PLUGIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'sublime', 'load_plugin.py')
+
+# the plugin's load time budget (in seconds), excluding the standard library
+# and sublime modules, which sublime text loads before the plugin:
+LOAD_TIME_BUDGET = 0.1
+
+# the subsystems imported on first use only:
+DEFERRED_MODULES = ['git', 'jsonshard', 'manifest', 'markdown', 'nativejson', 'noderuntime', 'probe', 'profiler',
+                    'scheduler', 'standby', 'trace', 'worker', 'workspace']
+
+
+class TestLazyModule(unittest.TestCase):
+    def setUp(self):
+        stats.reset()
+
+    def test_load_on_first_use(self):
+        loaded = []
+        module = LazyModule('.manifest', 'jsprettier', on_load=loaded.append)
+        self.assertFalse(module.is_loaded)
+        self.assertEqual(module.hash_bytes(b''), 'da39a3ee5e6b4b0d3255bfef95601890afd80709')
+        self.assertTrue(module.is_loaded)
+        self.assertEqual([m.__name__ for m in loaded], ['jsprettier.manifest'])
+        module.hash_argv([])
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(stats.get_timings()['import_manifest'][0], 1)
+
+    def test_missing_attribute(self):
+        with self.assertRaises(AttributeError):
+            LazyModule('jsprettier.manifest').missing
+
+
+class TestPluginLoad(unittest.TestCase):
+    def test_load_time_budget(self):
+        output = subprocess.check_output([sys.executable, LOAD_PLUGIN_SCRIPT])
+        result = json.loads(output.decode('utf-8'))
+        self.assertLess(result['load_time'], LOAD_TIME_BUDGET)
+        for name in DEFERRED_MODULES:
+            self.assertNotIn('JsPrettier.jsprettier.' + name, result['modules'])
+        self.assertNotIn('cProfile', result['modules'])
+
+
+if __name__ == '__main__':
+    unittest.main()
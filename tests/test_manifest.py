@@ -0,0 +1,57 @@
+"""Check manifest tests."""
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from jsprettier.manifest import \
+    CheckManifest, \
+    hash_argv, \
+    hash_bytes, \
+    hash_file
+from jsprettier.util import get_first_diff_line
+
+
+class TestManifest(unittest.TestCase):
+    def test_results(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        manifest_file = os.path.join(temp_dir, 'check.json')
+        argv_hash = hash_argv(['--no-config'])
+
+        manifest = CheckManifest(manifest_file).load()
+        self.assertIsNone(manifest.get_result('/a.js', 1.0, 10, argv_hash, '2.0.0'))
+        manifest.set_result('/a.js', 1.0, 10, hash_bytes(b'a'), argv_hash, '2.0.0', 3)
+        manifest.set_result('/b.js', 1.0, 10, hash_bytes(b'b'), argv_hash, '2.0.0', 0)
+        manifest.retain(['/a.js'])
+        manifest.save()
+
+        manifest = CheckManifest(manifest_file).load()
+        self.assertEqual(manifest.get_result('/a.js', 1.0, 10, argv_hash, '2.0.0'), 3)
+        self.assertIsNone(manifest.get_result('/b.js', 1.0, 10, argv_hash, '2.0.0'))
+        # other options, prettier version, or modified:
+        self.assertIsNone(manifest.get_result('/a.js', 1.0, 10, hash_argv([]), '2.0.0'))
+        self.assertIsNone(manifest.get_result('/a.js', 1.0, 10, argv_hash, '2.1.0'))
+        self.assertIsNone(manifest.get_result('/a.js', 2.0, 10, argv_hash, '2.0.0'))
+        self.assertIsNone(manifest.get_result('/a.js', 2.0, 10, argv_hash, '2.0.0', hash_bytes(b'x')))
+        # touched, but not modified:
+        self.assertEqual(manifest.get_result('/a.js', 2.0, 10, argv_hash, '2.0.0', hash_bytes(b'a')), 3)
+        self.assertEqual(manifest.get_result('/a.js', 2.0, 10, argv_hash, '2.0.0'), 3)
+
+    def test_hash_file(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        file_path = os.path.join(temp_dir, 'a.js')
+        for data in (b'', b'a = 1;\n', os.urandom(10000)):
+            with open(file_path, 'wb') as f:
+                f.write(data)
+            self.assertEqual(hash_file(file_path), hash_bytes(data))
+            self.assertEqual(hash_file(file_path, chunk_size=4096), hash_bytes(data))
+
+    def test_first_diff_line(self):
+        self.assertEqual(get_first_diff_line('a\nb\n', 'a\nb\n'), 0)
+        self.assertEqual(get_first_diff_line('a\nb\n', 'a\nc\n'), 2)
+        self.assertEqual(get_first_diff_line('a\nb', 'a\nb\n'), 2)
+        self.assertEqual(get_first_diff_line('a\n', 'a\nb\n'), 2)
@@ -0,0 +1,61 @@
+"""Markdown code block tests."""
+from __future__ import absolute_import
+
+import unittest
+
+from jsprettier.markdown import \
+    CodeBlock, \
+    is_prettier_ignored, \
+    parse_code_block
+
+DOC = '''# Title
+
+```js {1}
+const a = 1
+```
+
+  ~~~~TypeScript
+  let b: number
+  ~~~
+  ```
+  ~~~~
+
+<!-- prettier-ignore -->
+
+```css
+a{}
+```
+
+```json
+{}
+'''
+
+
+class TestMarkdown(unittest.TestCase):
+    def _block_at(self, line):
+        return parse_code_block(DOC, DOC.index(line))
+
+    def test_parse_code_block(self):
+        block = self._block_at('```js')
+        self.assertEqual(block[:2], ('js', ''))
+        self.assertEqual(DOC[block.begin:block.end], 'const a = 1\n')
+
+        # closed by a fence of the same character, at least as long:
+        block = self._block_at('  ~~~~TypeScript')
+        self.assertEqual(block[:2], ('typescript', '  '))
+        self.assertEqual(DOC[block.begin:block.end], '  let b: number\n  ~~~\n  ```\n')
+
+    def test_not_a_code_block(self):
+        self.assertIsNone(parse_code_block(DOC, 0))
+        # not closed:
+        self.assertIsNone(self._block_at('```json'))
+        self.assertEqual(parse_code_block('```\n```', 0), CodeBlock('', '', 4, 4))
+
+    def test_prettier_ignored(self):
+        self.assertTrue(is_prettier_ignored(DOC, DOC.index('```css')))
+        self.assertFalse(is_prettier_ignored(DOC, DOC.index('```js')))
+        self.assertFalse(is_prettier_ignored(DOC, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
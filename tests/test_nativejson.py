@@ -0,0 +1,86 @@
+"""Native json formatter tests."""
+from __future__ import absolute_import
+
+import os
+import unittest
+
+from jsprettier.nativejson import \
+    format_json, \
+    parse_version
+from jsprettier.util import \
+    get_argv_value, \
+    load_json_file
+from jsprettier.worker import \
+    PrettierWorker, \
+    WORKER_MODE_PROCESS
+
+from .test_jsonshard import \
+    CORPUS_DIR, \
+    NODE_PATH, \
+    PRETTIER_DIR, \
+    _load_corpus
+
+ARGV = ['--no-config', '--parser', 'json', '--print-width', '80', '--tab-width', '2', '--use-tabs', 'false',
+        '--trailing-comma', 'none', '--require-pragma', 'false', '--stdin-filepath', 'test.json']
+
+
+def _format(source, argv=None, version='2.8.8'):
+    return format_json(source, ARGV + (argv or []), version)
+
+
+class NativeJsonTest(unittest.TestCase):
+    def test_objects(self):
+        self.assertEqual(_format('{"a":1,"b":[1,2,3]}'), '{ "a": 1, "b": [1, 2, 3] }\n')
+        self.assertEqual(_format('{"a":1,"b":[]}', ['--bracket-spacing', 'false']), '{"a": 1, "b": []}\n')
+        # expanded objects stay expanded:
+        self.assertEqual(_format('{\n"a":{}}'), '{\n  "a": {}\n}\n')
+        self.assertEqual(_format('{"a":1,\n\n"b":2}', ['--print-width', '10', '--use-tabs', 'true']),
+                         '{\n\t"a": 1,\n\n\t"b": 2\n}\n')
+
+    def test_arrays(self):
+        self.assertEqual(_format('[[1],[2,3]]'), '[[1], [2, 3]]\n')
+        self.assertEqual(_format('[{"a":1,"b":2},{"c":3,"d":4}]'),
+                         '[\n  { "a": 1, "b": 2 },\n  { "c": 3, "d": 4 }\n]\n')
+        self.assertEqual(_format('[\n"a",\n\n"b"]', ['--print-width', '8']), '[\n  "a",\n\n  "b"\n]\n')
+
+    def test_number_arrays_are_filled(self):
+        source = '[' + ', '.join(str(i * 1000) for i in range(12)) + ']'
+        self.assertEqual(_format(source, ['--print-width', '40']),
+                         '[\n  0, 1000, 2000, 3000, 4000, 5000, 6000,\n  7000, 8000, 9000, 10000, 11000\n]\n')
+        self.assertEqual(_format('[1,2,\n\n3]'), '[\n  1, 2,\n\n  3\n]\n')
+
+    def test_end_of_line(self):
+        self.assertEqual(_format('{\r\n"a":1}', ['--end-of-line', 'crlf']), '{\r\n  "a": 1\r\n}\r\n')
+        self.assertEqual(_format('{\r\n"a":1}', ['--end-of-line', 'auto']), '{\r\n  "a": 1\r\n}\r\n')
+
+    def test_falls_back_to_prettier(self):
+        for source in ('// comment\n{}', '{"a": 1.0}', '{"a": 1E5}', '{a: 1}', "['a']", '"é"', '', '[1,]'):
+            self.assertIsNone(_format(source), source)
+        for argv in (['--trailing-comma', 'all'], ['--require-pragma'], ['--object-wrap', 'collapse'],
+                     ['--parser', 'json5']):
+            self.assertIsNone(_format('{}', argv), argv)
+        self.assertIsNone(format_json('{}', ['--parser', 'json'], '2.8.8'))
+        self.assertIsNone(_format('{}', version='2.2.1'))
+        self.assertIsNone(_format('{}', version='/usr/bin/prettier@1600000000.0'))
+        self.assertIsNone(_format('[' * 5000 + ']' * 5000))
+
+    def test_parse_version(self):
+        self.assertEqual(parse_version('3.0.0-alpha.1'), (3, 0, 0))
+        self.assertIsNone(parse_version('/usr/bin/prettier'))
+
+    @unittest.skipIf(NODE_PATH is None or PRETTIER_DIR is None, 'node or prettier is not installed')
+    def test_same_as_prettier(self):
+        worker = PrettierWorker(NODE_PATH, PRETTIER_DIR, mode=WORKER_MODE_PROCESS).start()
+        try:
+            version = load_json_file(os.path.join(PRETTIER_DIR, 'package.json'))['version']
+            for extra_argv in ([], ['--print-width', '40'], ['--use-tabs', 'true', '--bracket-spacing', 'false']):
+                argv = ARGV + extra_argv
+                for name, source in _load_corpus().items():
+                    native = format_json(source, argv, version)
+                    if native is None:
+                        continue
+                    expected, error, _ = worker.format(argv, source, CORPUS_DIR)
+                    self.assertIsNone(error, name)
+                    self.assertEqual(native, expected, '{0} {1}'.format(name, get_argv_value(argv, '--print-width')))
+        finally:
+            worker.close()
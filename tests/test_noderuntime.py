@@ -0,0 +1,61 @@
+"""Node runtime resolution tests."""
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from jsprettier.noderuntime import \
+    find_node_version_spec, \
+    match_node_version, \
+    satisfies
+
+INSTALLED = [
+    ((20, 1, 0), '/v20.1.0/bin'),
+    ((18, 17, 1), '/v18.17.1/bin'),
+    ((16, 3, 0), '/v16.3.0/bin'),
+    ((14, 0, 0), '/v14.0.0/bin')
+]
+
+
+class TestNodeRuntime(unittest.TestCase):
+    def test_satisfies(self):
+        self.assertTrue(satisfies((16, 3, 0), '16'))
+        self.assertTrue(satisfies((16, 3, 0), 'v16.3'))
+        self.assertTrue(satisfies((16, 3, 0), '>= 14 < 17'))
+        self.assertFalse(satisfies((18, 0, 0), '>= 14 < 17'))
+        self.assertTrue(satisfies((16, 9, 1), '^16.2'))
+        self.assertFalse(satisfies((17, 0, 0), '^16.2'))
+        self.assertFalse(satisfies((0, 3, 0), '^0.2.3'))
+        self.assertTrue(satisfies((18, 17, 5), '~18.17.1'))
+        self.assertFalse(satisfies((18, 18, 0), '~18.17.1'))
+        self.assertTrue(satisfies((14, 2, 0), '12.x || 14.x'))
+
+    def test_match_node_version(self):
+        self.assertEqual(match_node_version('16', INSTALLED), '/v16.3.0/bin')
+        self.assertEqual(match_node_version('>=14', INSTALLED), '/v20.1.0/bin')
+        self.assertEqual(match_node_version('lts/gallium', INSTALLED), '/v16.3.0/bin')
+        self.assertEqual(match_node_version('node', INSTALLED), '/v20.1.0/bin')
+        self.assertIsNone(match_node_version('system', INSTALLED))
+        self.assertIsNone(match_node_version('12', INSTALLED))
+
+    def test_find_node_version_spec(self):
+        root = tempfile.mkdtemp()
+        try:
+            src_dir = os.path.join(root, 'packages', 'app', 'src')
+            os.makedirs(src_dir)
+            with open(os.path.join(root, '.nvmrc'), 'w') as f:
+                f.write('# pinned\nv18\n')
+            with open(os.path.join(root, 'packages', 'app', 'package.json'), 'w') as f:
+                f.write('{"name": "app"}')
+            self.assertEqual(find_node_version_spec(src_dir), ('v18', os.path.join(root, '.nvmrc')))
+
+            package_json = os.path.join(root, 'packages', 'app', 'package.json')
+            with open(package_json, 'w') as f:
+                f.write('{"name": "app", "volta": {"node": "16.3.0"}}')
+            # bump the mtime, so the cached package.json is re-read
+            os.utime(package_json, (0, 1))
+            self.assertEqual(find_node_version_spec(src_dir), ('16.3.0', package_json))
+        finally:
+            shutil.rmtree(root)
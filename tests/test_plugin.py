@@ -0,0 +1,187 @@
+"""Plugin command tests, with the sublime stand-ins of the test fixtures."""
+from __future__ import absolute_import
+
+import importlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+from jsprettier.const import PRETTIER_OPTION_CLI_MAP
+from jsprettier.util import which
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NODE_PATH = which('node')
+FAKE_PRETTIER_CLI = os.path.join(FIXTURES_DIR, 'prettier', 'bin-prettier.js')
+
+
+def load_plugin():
+    """Load the plugin like sublime text does, i.e. as `JsPrettier.JsPrettier`."""
+    if os.path.join(FIXTURES_DIR, 'sublime') not in sys.path:
+        sys.path.insert(0, os.path.join(FIXTURES_DIR, 'sublime'))
+    if 'JsPrettier' not in sys.modules:
+        package = types.ModuleType('JsPrettier')
+        package.__path__ = [ROOT_DIR]
+        sys.modules['JsPrettier'] = package
+    return importlib.import_module('JsPrettier.JsPrettier')
+
+
+plugin = load_plugin()
+sublime = sys.modules['sublime']
+
+
+@unittest.skipIf(NODE_PATH is None, 'node is not installed')
+class TestFormatFromFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, 'a.js')
+        with io.open(self.file_path, 'w', encoding='utf-8') as f:
+            f.write(u'x = 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _context(self, *prettier_options):
+        return plugin.FormatContext(
+            source_file_path=self.file_path, project_path=self.temp_dir, cwd=self.temp_dir,
+            node_path=NODE_PATH, node_bin_dir=None, prettier_cli_path=FAKE_PRETTIER_CLI,
+            prettier_options=tuple(prettier_options) + ('--stdin-filepath', self.file_path),
+            prettier_config_path=None)
+
+    def test_format_clean_view(self):
+        view = sublime.View(self.file_path)
+        command = plugin.JsPrettierCommand(view)
+        transformed = command.format_code(None, self._context(), view, interactive=False,
+                                          source_path=self.file_path)
+        self.assertFalse(command.has_error, command.error_message)
+        self.assertEqual(transformed, u'X = 1\n')
+
+    def test_format_ignored_clean_view(self):
+        ignore_path = os.path.join(self.temp_dir, '.prettierignore')
+        with io.open(ignore_path, 'w', encoding='utf-8') as f:
+            f.write(u'a.js\n')
+        view = sublime.View(self.file_path)
+        command = plugin.JsPrettierCommand(view)
+        transformed = command.format_code(None, self._context('--ignore-path', ignore_path), view,
+                                          interactive=False, source_path=self.file_path)
+        self.assertFalse(command.has_error, command.error_message)
+        self.assertTrue(command.unchanged)
+        self.assertEqual(transformed, u'')
+
+
+class TestFileIndentation(unittest.TestCase):
+    def setUp(self):
+        # the active view's settings:
+        options = dict((mapping['option'], '') for mapping in PRETTIER_OPTION_CLI_MAP)
+        self.view = sublime.View('/project/a.js', {
+            'JsPrettier': {'prettier_options': options},
+            'tab_size': 8,
+            'translate_tabs_to_spaces': False})
+        self.command = plugin.JsPrettierCommand(self.view)
+        self.preferences = sublime.load_settings('Preferences.sublime-settings')
+        self.preferences.update({'tab_size': 4, 'translate_tabs_to_spaces': True})
+
+    def tearDown(self):
+        self.preferences.clear()
+
+    def _parse_options(self, prettier_config_path, view_indentation):
+        options = self.command.parse_prettier_options(
+            self.view, [], prettier_config_path, False, False, False, None, '/project/b.js',
+            view_indentation=view_indentation)
+        return dict(zip(options, options[1:]))
+
+    def test_view_indentation(self):
+        options = self._parse_options(None, True)
+        self.assertEqual(options['--tab-width'], '8')
+        self.assertEqual(options['--use-tabs'], 'true')
+
+    def test_file_indentation_from_preferences(self):
+        options = self._parse_options(None, False)
+        self.assertEqual(options['--tab-width'], '4')
+        self.assertEqual(options['--use-tabs'], 'false')
+
+    def test_file_indentation_from_config(self):
+        options = self._parse_options('/project/.prettierrc', False)
+        self.assertNotIn('--tab-width', options)
+        self.assertNotIn('--use-tabs', options)
+
+
+class TestSplitEmbeddedBlock(unittest.TestCase):
+    def _split(self, text, source, **settings):
+        view = sublime.View('/project/a.html', settings, scope='text.html.basic', text=text)
+        begin = text.index(source)
+        region = sublime.Region(begin, begin + len(source))
+        return plugin.JsPrettierFormatEmbeddedCommand(view).split_embedded_block(view, region, source)
+
+    def test_block(self):
+        text = '  <script>\n\n      a()\n\n        b()\n  </script>\n'
+        self.assertEqual(self._split(text, '\n\n      a()\n\n        b()\n  '),
+                         ('      a()\n\n        b()', '      ', '\n', '\n  '))
+
+    def test_block_with_tabs(self):
+        text = '\t<style>\n\t\ta {}\n\t</style>\n'
+        self.assertEqual(self._split(text, '\n\t\ta {}\n\t'), ('\t\ta {}', '\t\t', '\n', '\n\t'))
+
+    def test_block_without_closing_tag_line(self):
+        text = '  <script>\n    a()</script>\n'
+        self.assertEqual(self._split(text, '\n    a()'), ('    a()', '    ', '\n', '\n  '))
+
+    def test_inline_block(self):
+        text = '  <script> a() </script>\n'
+        self.assertEqual(self._split(text, ' a() ', tab_size=4), ('a()', '      ', '\n', '\n  '))
+        self.assertEqual(self._split(text, ' a() ', translate_tabs_to_spaces=False), ('a()', '  \t', '\n', '\n  '))
+
+
+class StubRunnerCommand(plugin.JsPrettierCommand):
+    """Formats by upper-casing the source, instead of running prettier."""
+
+    def format_code(self, source, context, view, interactive=True, priority=plugin.PRIORITY_INTERACTIVE,
+                    source_path=None):
+        return source.upper()
+
+
+class TestSpeculativeFormat(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, 'a.js')
+        with io.open(self.file_path, 'w', encoding='utf-8') as f:
+            f.write(u'x = 1\n')
+        self.view = sublime.View(self.file_path, text=u'x = 2\n')
+        self.context = plugin.FormatContext(
+            source_file_path=self.file_path, project_path=self.temp_dir, cwd=self.temp_dir,
+            node_path=None, node_bin_dir=None, prettier_cli_path='prettier',
+            prettier_options=('--stdin-filepath', self.file_path), prettier_config_path=None)
+
+    def tearDown(self):
+        plugin._speculative_results.pop(self.view.id(), None)
+        shutil.rmtree(self.temp_dir)
+
+    def _speculative_format(self):
+        command = StubRunnerCommand(self.view)
+        command.speculative_format(context=self.context).join()
+        return command
+
+    def test_result_handed_to_save(self):
+        command = self._speculative_format()
+        self.assertEqual(command.take_speculative_result(self.view, self.context), u'X = 2\n')
+        # taken once:
+        self.assertIsNone(command.take_speculative_result(self.view, self.context))
+
+    def test_result_dropped_when_buffer_changed(self):
+        command = self._speculative_format()
+        self.view.set_text(u'x = 3\n')
+        self.assertIsNone(command.take_speculative_result(self.view, self.context))
+        self.assertNotIn(self.view.id(), plugin._speculative_results)
+
+    def test_result_dropped_when_context_changed(self):
+        command = self._speculative_format()
+        context = self.context._replace(prettier_options=('--no-semi',) + self.context.prettier_options)
+        self.assertIsNone(command.take_speculative_result(self.view, context))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Prettier probe tests."""
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from jsprettier import probe, stats
+from jsprettier.util import which
+
+NODE_PATH = which('node')
+FAKE_PRETTIER_CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'prettier', 'bin-prettier.js')
+
+SUPPORT_INFO = {
+    'options': [
+        {'name': 'jsxBracketSameLine', 'type': 'boolean', 'deprecated': '2.4.0'},
+        {'name': 'parser', 'type': 'choice', 'choices': [
+            {'value': 'babel'},
+            {'value': 'babylon', 'deprecated': '1.16.0', 'redirect': 'babel'},
+            {'value': 'css'}
+        ]},
+        {'name': 'proseWrap', 'type': 'choice', 'choices': [
+            {'value': False, 'deprecated': '1.9.0', 'redirect': 'preserve'},
+            {'value': 'preserve'}
+        ]},
+        {'name': 'semi', 'type': 'boolean'}
+    ]
+}
+
+
+class TestProbe(unittest.TestCase):
+    def test_parse_support_info(self):
+        options = probe.parse_support_info(SUPPORT_INFO)
+        self.assertEqual(options['parser'], {'deprecated': False, 'choices': ['babel', 'css'],
+                                             'redirects': {'babylon': 'babel'}})
+        self.assertEqual(options['proseWrap']['redirects'], {'false': 'preserve'})
+        self.assertEqual(options['jsxBracketSameLine'], {'deprecated': True})
+
+    def test_get_option_value(self):
+        options = probe.parse_support_info(SUPPORT_INFO)
+        self.assertEqual(probe.get_option_value(options, 'parser', 'css'), 'css')
+        self.assertEqual(probe.get_option_value(options, 'parser', 'babylon'), 'babel')
+        self.assertIsNone(probe.get_option_value(options, 'parser', 'vue'))
+        self.assertEqual(probe.get_option_value(options, 'semi', 'false'), 'false')
+        # not supported:
+        self.assertIsNone(probe.get_option_value(options, 'arrowParens', 'avoid'))
+        # deprecated, only passed when set:
+        self.assertIsNone(probe.get_option_value(options, 'jsxBracketSameLine', 'false', 'false'))
+        self.assertEqual(probe.get_option_value(options, 'jsxBracketSameLine', 'true', 'false'), 'true')
+        # not probed:
+        self.assertEqual(probe.get_option_value(None, 'parser', 'babylon'), 'babylon')
+
+
+@unittest.skipIf(NODE_PATH is None, 'node is not installed')
+class TestGetProbe(unittest.TestCase):
+    def setUp(self):
+        stats.reset()
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, 'probes.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_probe_once(self):
+        options = probe.get_probe(NODE_PATH, FAKE_PRETTIER_CLI, self.cache_file)
+        self.assertEqual(probe.get_option_value(options, 'parser', 'babylon'), 'babel')
+        self.assertTrue(os.path.exists(self.cache_file))
+        self.assertEqual(probe.get_probe(NODE_PATH, FAKE_PRETTIER_CLI, self.cache_file), options)
+        self.assertEqual((stats.get_counters()['probe_runs'], stats.get_counters()['probe_hits']), (1, 1))
+
+        # loaded from disk:
+        with probe._probes_lock:
+            probe._probes.clear()
+        probe._loaded_cache_file = None
+        self.assertEqual(probe.get_probe(NODE_PATH, FAKE_PRETTIER_CLI, self.cache_file), options)
+        self.assertEqual(stats.get_counters()['probe_runs'], 1)
+
+    def test_failed_probe(self):
+        cli = os.path.join(self.temp_dir, 'prettier.js')
+        with open(cli, 'w') as f:
+            f.write('process.exit(2);\n')
+        self.assertIsNone(probe.get_probe(NODE_PATH, cli, self.cache_file))
+        # not probed again, until the cli changes:
+        self.assertIsNone(probe.get_probe(NODE_PATH, cli, self.cache_file))
+        self.assertEqual(stats.get_counters()['probe_runs'], 1)
+
+    def test_probe_again_when_upgraded(self):
+        prettier_dir = os.path.join(self.temp_dir, 'node_modules', 'prettier')
+        os.makedirs(prettier_dir)
+        cli = os.path.join(prettier_dir, 'bin-prettier.js')
+        shutil.copy(FAKE_PRETTIER_CLI, cli)
+        # npm installs the package files with a fixed mtime:
+        os.utime(cli, (499162500, 499162500))
+
+        def install(version):
+            with open(os.path.join(prettier_dir, 'package.json'), 'w') as f:
+                json.dump({'name': 'prettier', 'version': version}, f)
+
+        install('2.3.0')
+        probe.get_probe(NODE_PATH, cli, self.cache_file)
+        probe.get_probe(NODE_PATH, cli, self.cache_file)
+        self.assertEqual(stats.get_counters()['probe_runs'], 1)
+        install('2.4.0')
+        self.assertIsNotNone(probe.get_probe(NODE_PATH, cli, self.cache_file))
+        self.assertEqual(stats.get_counters()['probe_runs'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""Format profiler tests."""
+from __future__ import absolute_import
+
+import time
+import unittest
+
+from jsprettier.profiler import \
+    FormatProfiler, \
+    request_profile, \
+    take_profile_request, \
+    waiting
+
+
+def _busy(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+def _format():
+    _busy(0.02)
+    with waiting():
+        time.sleep(0.2)
+
+
+class TestProfiler(unittest.TestCase):
+    def _total_time(self, profiler):
+        return sum(entry.totaltime for entry in profiler.profile.getstats())
+
+    def test_exclude_waits(self):
+        profiler = FormatProfiler(exclude_waits=True)
+        profiler.run(_format)
+        self.assertGreaterEqual(profiler.excluded, 0.2)
+        self.assertLess(self._total_time(profiler), 0.2)
+        self.assertIn('_busy', profiler.format_stats())
+
+        profiler = FormatProfiler(exclude_waits=False)
+        profiler.run(_format)
+        self.assertEqual(profiler.excluded, 0)
+        self.assertGreaterEqual(self._total_time(profiler), 0.2)
+
+    def test_profile_request(self):
+        self.assertIsNone(take_profile_request())
+        request_profile(exclude_waits=False)
+        self.assertEqual(take_profile_request(), {'exclude_waits': False, 'stats_file': None})
+        self.assertIsNone(take_profile_request())
@@ -0,0 +1,65 @@
+"""Format scheduler tests."""
+from __future__ import absolute_import
+
+import threading
+import time
+import unittest
+
+from jsprettier import stats
+from jsprettier.scheduler import \
+    PRIORITY_BATCH, \
+    PRIORITY_INTERACTIVE, \
+    PRIORITY_SAVE, \
+    PRIORITY_SPECULATIVE, \
+    Scheduler, \
+    SchedulerFullError
+
+
+class TestScheduler(unittest.TestCase):
+    def _start(self, scheduler, priority, order):
+        def job():
+            with scheduler.slot(priority):
+                order.append(priority)
+        queued = sum(scheduler.get_stats()['queued'].values())
+        thread = threading.Thread(target=job)
+        thread.start()
+        # wait until queued:
+        while sum(scheduler.get_stats()['queued'].values()) == queued:
+            time.sleep(0.01)
+        return thread
+
+    def test_priority_order(self):
+        scheduler = Scheduler(slots=1)
+        order = []
+        scheduler.acquire(PRIORITY_SAVE)
+        threads = [self._start(scheduler, p, order)
+                   for p in (PRIORITY_BATCH, PRIORITY_SPECULATIVE, PRIORITY_SAVE, PRIORITY_INTERACTIVE)]
+        self.assertEqual(scheduler.get_stats()['queued'], {
+            'interactive': 1, 'save': 1, 'speculative': 1, 'batch': 1})
+        scheduler.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [PRIORITY_INTERACTIVE, PRIORITY_SAVE, PRIORITY_SPECULATIVE, PRIORITY_BATCH])
+
+    def test_reserved_slot(self):
+        scheduler = Scheduler(slots=2, reserved_slots=1, max_queued=1)
+        order = []
+        scheduler.acquire(PRIORITY_BATCH)
+        # the second slot is for foreground jobs only:
+        thread = self._start(scheduler, PRIORITY_SPECULATIVE, order)
+        self.assertRaises(SchedulerFullError, scheduler.acquire, PRIORITY_BATCH)
+        with scheduler.slot(PRIORITY_INTERACTIVE):
+            self.assertEqual(scheduler.get_stats()['running'], 2)
+        self.assertEqual(order, [])
+        scheduler.release()
+        thread.join()
+        self.assertEqual(order, [PRIORITY_SPECULATIVE])
+
+    def test_wait_times(self):
+        stats.reset()
+        scheduler = Scheduler(slots=1)
+        with scheduler.slot(PRIORITY_SAVE):
+            pass
+        count, total, longest = stats.get_timings()['scheduler_wait_save']
+        self.assertEqual(count, 1)
+        self.assertLess(longest, 1)
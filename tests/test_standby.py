@@ -0,0 +1,55 @@
+"""Standby prettier process tests."""
+from __future__ import absolute_import
+
+import sys
+import unittest
+
+from jsprettier import stats
+from jsprettier.standby import \
+    discard_standbys, \
+    spawn_standby, \
+    take_standby
+from jsprettier.util import communicate
+
+BINARY = (sys.executable,)
+UPPER_CMD = [sys.executable, '-c', 'import sys; sys.stdout.write(sys.stdin.read().upper())']
+LOWER_CMD = [sys.executable, '-c', 'import sys; sys.stdout.write(sys.stdin.read().lower())']
+
+
+class TestStandby(unittest.TestCase):
+    def setUp(self):
+        stats.reset()
+
+    def tearDown(self):
+        discard_standbys()
+
+    def test_take_matching_standby(self):
+        self.assertIsNone(take_standby(BINARY, UPPER_CMD))
+        spawn_standby(BINARY, UPPER_CMD).join()
+        proc = take_standby(BINARY, UPPER_CMD)
+        self.assertIsNotNone(proc)
+        stdout, _, _ = communicate(proc, b'abc')
+        self.assertEqual(stdout, b'ABC')
+        self.assertEqual(proc.returncode, 0)
+        # taken:
+        self.assertIsNone(take_standby(BINARY, UPPER_CMD))
+        counters = stats.get_counters()
+        self.assertEqual((counters['standby_hits'], counters['standby_misses']), (1, 2))
+
+    def test_discard_other_command(self):
+        spawn_standby(BINARY, UPPER_CMD).join()
+        self.assertIsNone(take_standby(BINARY, LOWER_CMD))
+        self.assertEqual(stats.get_counters()['standby_discards'], 1)
+        # discarded:
+        self.assertIsNone(take_standby(BINARY, UPPER_CMD))
+
+    def test_replace_standby(self):
+        spawn_standby(BINARY, UPPER_CMD).join()
+        spawn_standby(BINARY, LOWER_CMD).join()
+        proc = take_standby(BINARY, LOWER_CMD)
+        stdout, _, _ = communicate(proc, b'ABC')
+        self.assertEqual(stdout, b'abc')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+"""Stats tests."""
+from __future__ import absolute_import
+
+import unittest
+
+from jsprettier import stats
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        stats.reset()
+
+    def test_usage(self):
+        stats.record_usage('/p/a.js', '/p', {'user': 1.0, 'system': 0.5, 'max_rss': 100})
+        stats.record_usage('/p/a.js', '/p', {'user': 1.0, 'system': 0.0, 'max_rss': 50})
+        stats.record_usage('/p/b.css', '/p', {'user': 0.1, 'system': 0.0, 'max_rss': 200})
+        self.assertEqual(stats.get_top_usage(stats.USAGE_BY_FILE),
+                         [('/p/a.js', 2, 2.0, 0.5, 100), ('/p/b.css', 1, 0.1, 0.0, 200)])
+        self.assertEqual(stats.get_top_usage(stats.USAGE_BY_EXTENSION, limit=1), [('.js', 2, 2.0, 0.5, 100)])
+        self.assertEqual(stats.get_top_usage(stats.USAGE_BY_PROJECT), [('/p', 3, 2.1, 0.5, 200)])
+        self.assertIn('/p/a.js', stats.format_usage_report())
@@ -0,0 +1,47 @@
+"""Trace recorder tests."""
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from jsprettier.trace import NULL_TRACER, Tracer, get_tracer
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.trace_file = os.path.join(self.temp_dir, 'trace.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def load_events(self, trace_file):
+        with open(trace_file) as f:
+            # trace viewers accept the unterminated array:
+            return json.loads(f.read().rstrip(',\n') + ']')
+
+    def test_span_tree(self):
+        self.assertIs(get_tracer(''), NULL_TRACER)
+        tracer = Tracer(self.trace_file)
+        for _ in range(2):
+            with tracer.span('format', size=10) as span:
+                with tracer.span('queue_wait'):
+                    pass
+                tracer.annotate(parser='babel')
+                span.set(cache_hit=False)
+        events = self.load_events(self.trace_file)
+        self.assertEqual([e['name'] for e in events], ['queue_wait', 'format'] * 2)
+        self.assertEqual(events[1]['args'], {'size': 10, 'parser': 'babel', 'cache_hit': False})
+        self.assertEqual(events[1]['ph'], 'X')
+        self.assertGreaterEqual(events[0]['ts'], events[1]['ts'])
+
+    def test_rotation(self):
+        tracer = Tracer(self.trace_file, max_size=100)
+        for _ in range(3):
+            with tracer.span('format'):
+                pass
+        self.assertEqual(len(self.load_events(self.trace_file)), 1)
+        self.assertEqual(len(self.load_events(self.trace_file + '.1')), 1)
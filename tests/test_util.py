@@ -0,0 +1,128 @@
+"""Utility function tests."""
+from __future__ import absolute_import
+
+import os
+import sys
+import unittest
+from subprocess import PIPE, Popen
+
+from jsprettier.util import \
+    LOGIN_SHELL_ENV_MARKER, \
+    apply_line_hunks, \
+    capture_login_shell_env, \
+    communicate, \
+    contains_path, \
+    dedent_str, \
+    find_project_root, \
+    get_cli_arg_value, \
+    get_indentation, \
+    get_plugin_cli_args, \
+    indent_str, \
+    parse_additional_cli_args, \
+    parse_env_output
+
+
+class TestUtil(unittest.TestCase):
+    def test_find_project_root(self):
+        folders = ['/work/app', '/work/app/packages/ui', '/work/app-legacy']
+        self.assertEqual(find_project_root(folders, '/work/app/packages/ui/src/a.js'), '/work/app/packages/ui')
+        self.assertEqual(find_project_root(folders, '/work/app/src/a.js'), '/work/app')
+        # not a path prefix of '/work/app':
+        self.assertEqual(find_project_root(folders, '/work/app-legacy/a.js'), '/work/app-legacy')
+        self.assertEqual(find_project_root(folders, '/tmp/a.js'), '/tmp')
+        self.assertEqual(find_project_root(folders, None), '/work/app')
+        self.assertEqual(find_project_root(['/work/app'], '/tmp/a.js'), '/work/app')
+        self.assertEqual(find_project_root([], None), os.path.expanduser('~'))
+
+    def test_communicate(self):
+        proc = Popen([sys.executable, '-c', 'import sys; sys.stdout.write(sys.stdin.read().upper()); sys.exit(3)'],
+                     stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        stdout, stderr, usage = communicate(proc, b'abc')
+        self.assertEqual((stdout, stderr, proc.returncode), (b'ABC', b'', 3))
+        if hasattr(os, 'wait4'):
+            self.assertGreater(usage['max_rss'], 0)
+            self.assertGreaterEqual(usage['user'] + usage['system'], 0)
+
+    def test_contains_path(self):
+        error_output = '[error] /tmp/JsPrettier-1/block-1.jsx: SyntaxError: Unexpected token (1:3)\n'
+        self.assertTrue(contains_path('/tmp/JsPrettier-1/block-1.jsx', error_output))
+        self.assertFalse(contains_path('/tmp/JsPrettier-1/block-1.js', error_output))
+        self.assertFalse(contains_path('/JsPrettier-1/block-1.jsx', error_output))
+        self.assertTrue(contains_path('/tmp/a b.js', "Unable to read '/tmp/a b.js'"))
+        self.assertTrue(contains_path('/tmp/a.js', '/tmp/a.js'))
+        self.assertFalse(contains_path('/tmp/a.js', ''))
+
+    def test_parse_env_output(self):
+        output = 'motd noise\n\n{0}\nPATH=/usr/bin:/bin\nOPTS=--a=1 --b=2\nMULTI=a\nb\n\n{0}\nbye\n'.format(
+            LOGIN_SHELL_ENV_MARKER)
+        self.assertEqual(parse_env_output(output), {
+            'PATH': '/usr/bin:/bin', 'OPTS': '--a=1 --b=2', 'MULTI': 'a\nb'})
+        # malformed lines before the first variable are skipped:
+        output = '\n{0}\n=x\n1A=b\nA=b\n\n{0}\n'.format(LOGIN_SHELL_ENV_MARKER)
+        self.assertEqual(parse_env_output(output), {'A': 'b'})
+        self.assertIsNone(parse_env_output('A=b\n'))
+        self.assertIsNone(parse_env_output('\n{0}\nA=b\n'.format(LOGIN_SHELL_ENV_MARKER)))
+        self.assertIsNone(parse_env_output('\n{0}\n\n{0}\n'.format(LOGIN_SHELL_ENV_MARKER)))
+
+    def test_parse_nul_separated_env_output(self):
+        output = '\n{0}\nPATH=/usr/bin\0MULTI=a\nB=c\n\0EQ==x=\0=x\0bad\0\n{0}\n'.format(
+            LOGIN_SHELL_ENV_MARKER)
+        self.assertEqual(parse_env_output(output), {'PATH': '/usr/bin', 'MULTI': 'a\nB=c\n', 'EQ': '=x='})
+        # values are kept as is, e.g. with carriage returns and other line separators:
+        output = 'noise\r\n\n{0}\nCR=a\r\nb\rc\0LS=a\x0bb\x0cc\x1cd\x85e\u2028f\0\n{0}\n'.format(
+            LOGIN_SHELL_ENV_MARKER)
+        self.assertEqual(parse_env_output(output), {
+            'CR': 'a\r\nb\rc', 'LS': 'a\x0bb\x0cc\x1cd\x85e\u2028f'})
+
+    @unittest.skipIf(not os.path.exists('/bin/sh'), 'no /bin/sh')
+    def test_capture_login_shell_env(self):
+        os.environ['JSPRETTIER_TEST_VALUE'] = 'a=b\nc'
+        try:
+            env = capture_login_shell_env('/bin/sh')
+        finally:
+            del os.environ['JSPRETTIER_TEST_VALUE']
+        self.assertEqual(env['JSPRETTIER_TEST_VALUE'], 'a=b\nc')
+        self.assertIn('PATH', env)
+
+    def test_get_indentation(self):
+        self.assertEqual(get_indentation('    a\n      b\n    c'), '    ')
+        self.assertEqual(get_indentation('\ta\n\t\tb'), '\t')
+        # tabs and spaces don't share a prefix:
+        self.assertEqual(get_indentation('\ta\n    b'), '')
+        self.assertEqual(get_indentation('  \ta\n  b'), '  ')
+        # blank (and whitespace only) lines are ignored:
+        self.assertEqual(get_indentation('\n    a\n\n  \n    b\n'), '    ')
+        self.assertEqual(get_indentation('a'), '')
+        self.assertEqual(get_indentation(''), '')
+
+    def test_dedent_and_indent_str(self):
+        txt = '    if (a) {\n\n      b()\n  \n    }'
+        dedented = dedent_str(txt, '    ')
+        self.assertEqual(dedented, 'if (a) {\n\n  b()\n\n}')
+        # blank lines stay blank, instead of getting trailing whitespace:
+        self.assertEqual(indent_str(dedented, '    '), '    if (a) {\n\n      b()\n\n    }')
+        self.assertEqual(indent_str(dedent_str('\ta\n\t\tb', '\t'), '\t'), '\ta\n\t\tb')
+        # leading and trailing newlines round-trip:
+        self.assertEqual(indent_str(dedent_str('\n  a\n', '  '), '  '), '\n  a\n')
+        # lines without the prefix are kept:
+        self.assertEqual(dedent_str('  a\n b', '  '), 'a\n b')
+        self.assertEqual(dedent_str(' a', ''), ' a')
+        self.assertEqual(indent_str('a', ''), 'a')
+
+    def test_apply_line_hunks(self):
+        self.assertEqual(apply_line_hunks('a\nb\nc\n', [[1, 1, ['B', 'b2']], [3, 0, ['d']]]), 'a\nB\nb2\nc\nd\n')
+        self.assertEqual(apply_line_hunks('a\nb\n', [[0, 2, []]]), '')
+        self.assertRaises(ValueError, apply_line_hunks, 'a\n', [[1, 5, []]])
+
+    def test_plugin_cli_args(self):
+        cli_args = parse_additional_cli_args({'--plugin': ['a', './b'], '--with-node-modules': ''})
+        self.assertEqual(cli_args, ['--plugin', 'a', '--plugin', './b', '--with-node-modules'])
+        self.assertEqual(get_plugin_cli_args(cli_args + ['--plugin-search-dir', '.']),
+                         (('--plugin', 'a'), ('--plugin', './b'), ('--plugin-search-dir', '.')))
+
+    def test_get_cli_arg_value(self):
+        additional_cli_args = {'--with-node-modules': '', '--config': 'path/to/.prettierrc'}
+        self.assertEqual(get_cli_arg_value(additional_cli_args, '--config'), 'path/to/.prettierrc')
+        self.assertEqual(get_cli_arg_value(additional_cli_args, '--with-node-modules', True), '--with-node-modules')
+        self.assertEqual(get_cli_arg_value(additional_cli_args, '--ignore-path', default='x'), 'x')
+        self.assertIsNone(get_cli_arg_value(None, '--config'))
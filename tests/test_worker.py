@@ -0,0 +1,235 @@
+"""Prettier worker protocol tests."""
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from jsprettier import stats
+from jsprettier import worker as worker_module
+from jsprettier.util import which
+from jsprettier.worker import \
+    BREAKER_CLOSED, \
+    BREAKER_HALF_OPEN, \
+    BREAKER_OPEN, \
+    CircuitBreaker, \
+    PrettierWorker, \
+    WorkerError, \
+    WORKER_MODE_PROCESS, \
+    WORKER_MODE_SERVICE, \
+    find_prettier_package_dir, \
+    get_service_dir, \
+    get_service_socket_path, \
+    get_worker, \
+    recycle_if_needed, \
+    shutdown_workers
+
+NODE_PATH = which('node')
+MISSING_PRETTIER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'missing')
+FAKE_PRETTIER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'prettier')
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_backoff_and_cooldown(self):
+        breaker = CircuitBreaker('test', failure_threshold=3, cooldown=60)
+        self.assertTrue(breaker.allow(now=0))
+        breaker.record_failure('crash', now=0)
+        self.assertFalse(breaker.allow(now=0.5))
+        self.assertTrue(breaker.allow(now=1))
+        breaker.record_failure('crash', now=1)
+        # the backoff doubles:
+        self.assertFalse(breaker.allow(now=2.5))
+        self.assertTrue(breaker.allow(now=3))
+        breaker.record_failure('crash', now=3)
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertFalse(breaker.allow(now=62))
+        self.assertTrue(breaker.allow(now=63))
+        self.assertEqual(breaker.state, BREAKER_HALF_OPEN)
+        # a single failure while half-open opens the breaker again:
+        breaker.record_failure('crash', now=63)
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertTrue(breaker.allow(now=123))
+        breaker.record_success()
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+        self.assertEqual(breaker.failures, 0)
+
+
+@unittest.skipIf(NODE_PATH is None, 'node is not installed')
+class TestWorker(unittest.TestCase):
+    def _format(self, worker, argv, source='a = 1'):
+        formatted, error, usage = worker.format(argv, source, '/project')
+        self.assertGreater(usage['max_rss'], 0)
+        self.assertIsNone(error)
+        return json.loads(formatted)
+
+    def test_find_prettier_package_dir(self):
+        self.assertEqual(find_prettier_package_dir(os.path.join(FAKE_PRETTIER_DIR, 'index.js')), FAKE_PRETTIER_DIR)
+        self.assertIsNone(find_prettier_package_dir(__file__))
+
+    def test_process_worker(self):
+        worker = PrettierWorker(NODE_PATH, FAKE_PRETTIER_DIR, mode=WORKER_MODE_PROCESS).start()
+        try:
+            self.assertEqual(worker.info['prettier'], '0.0.0-test')
+            result = self._format(worker, [
+                '--no-config', '--print-width', '100', '--use-tabs', 'false',
+                '--stdin-filepath', 'src/a.js', '--no-bracket-spacing'])
+            self.assertEqual(result['source'], 'a = 1')
+            self.assertEqual(result['options'], {
+                'printWidth': 100,
+                'useTabs': False,
+                'bracketSpacing': False,
+                'filepath': '/project/src/a.js'
+            })
+
+            # clean files are read by the worker:
+            source_file = tempfile.NamedTemporaryFile(suffix='.js', delete=False)
+            self.addCleanup(os.remove, source_file.name)
+            with source_file:
+                source_file.write(b'b = 2\n')
+            formatted, error, _ = worker.format(['--no-config'], None, '/project', source_path=source_file.name)
+            self.assertIsNone(error)
+            self.assertEqual(json.loads(formatted)['source'], 'b = 2\n')
+
+            formatted, error, _ = worker.format(['--stdin-filepath', 'a.js'], 'syntax error', '/project')
+            self.assertIsNone(formatted)
+            self.assertTrue(error.startswith('[error] /project/a.js: SyntaxError: Unexpected token (1:8)'))
+        finally:
+            worker.close()
+        self.assertRaises(WorkerError, worker.request, 'ping')
+
+    def test_compact_results(self):
+        worker = PrettierWorker(NODE_PATH, FAKE_PRETTIER_DIR, mode=WORKER_MODE_PROCESS).start()
+        try:
+            source = ''.join('line {0}\n'.format(i) for i in range(100))
+            stats.reset()
+            formatted, error, _ = worker.format(['--parser', 'test-identity'], source, '/project')
+            self.assertIs(formatted, source)
+            self.assertIsNone(error)
+
+            changed_source = source.replace('line 10\n', 'x 10\nx\n').replace('line 99', 'x')
+            formatted, _, _ = worker.format(['--parser', 'test-upper-x'], changed_source, '/project')
+            self.assertEqual(formatted, changed_source.replace('x', 'X'))
+            self.assertEqual(stats.get_counters()['worker_hunks'], 1)
+            self.assertEqual(stats.get_counters()['worker_unchanged'], 1)
+        finally:
+            worker.close()
+
+    def test_preloaded_plugins(self):
+        plugin_args = (('--plugin', './plugin.js'),)
+        worker = get_worker(NODE_PATH, FAKE_PRETTIER_DIR, plugin_args=plugin_args, plugin_cwd=FAKE_PRETTIER_DIR)
+        try:
+            self.assertEqual(worker.info['plugins'], [{'name': './plugin.js', 'preloaded': True}])
+            # workers are keyed by plugin set:
+            self.assertIsNot(worker, get_worker(NODE_PATH, FAKE_PRETTIER_DIR))
+            self.assertIs(worker, get_worker(NODE_PATH, FAKE_PRETTIER_DIR, plugin_args=plugin_args,
+                                             plugin_cwd=FAKE_PRETTIER_DIR))
+
+            result = self._format(worker, ['--no-config', '--plugin', './plugin.js'])
+            self.assertEqual(result['options']['plugins'], [{'name': 'test-plugin'}])
+            # other plugins are left to prettier:
+            result = self._format(worker, ['--no-config', '--plugin', 'other'])
+            self.assertEqual(result['options']['plugins'], ['other'])
+        finally:
+            shutdown_workers()
+
+    def test_service_worker(self):
+        socket_path = get_service_socket_path(NODE_PATH, FAKE_PRETTIER_DIR)
+        first = PrettierWorker(NODE_PATH, FAKE_PRETTIER_DIR, mode=WORKER_MODE_SERVICE, idle_timeout=1).start()
+        second = PrettierWorker(NODE_PATH, FAKE_PRETTIER_DIR, mode=WORKER_MODE_SERVICE, idle_timeout=1).start()
+        try:
+            # both clients share the same service process:
+            self.assertEqual(first.info['pid'], second.info['pid'])
+            self.assertEqual(self._format(second, ['--no-config'])['source'], 'a = 1')
+            first.close()
+            time.sleep(1.5)
+            # still referenced by the second client:
+            self.assertEqual(second.request('ping'), {})
+        finally:
+            first.close()
+            second.close()
+
+        # the service exits once idle, and removes its socket:
+        deadline = time.time() + 5
+        while os.path.exists(socket_path) and time.time() < deadline:
+            time.sleep(0.1)
+        self.assertFalse(os.path.exists(socket_path))
+
+    def test_concurrent_cold_start(self):
+        workers = []
+
+        def get():
+            workers.append(get_worker(NODE_PATH, FAKE_PRETTIER_DIR))
+
+        threads = [threading.Thread(target=get) for _ in range(3)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # started once, outside the workers lock:
+            self.assertEqual(len(workers), 3)
+            self.assertEqual(len(set(id(worker) for worker in workers)), 1)
+        finally:
+            shutdown_workers()
+
+    def test_unsafe_service_dir(self):
+        temp_dir = tempfile.mkdtemp()
+        tempfile.tempdir, previous_temp_dir = temp_dir, tempfile.tempdir
+        try:
+            # e.g. created by another user first:
+            service_dir = os.path.join(temp_dir, 'jsprettier-{0}'.format(os.getuid()))
+            os.mkdir(service_dir)
+            os.chmod(service_dir, 0o777)
+            self.assertIsNone(get_service_dir())
+            self.assertIsNone(get_service_socket_path(NODE_PATH, FAKE_PRETTIER_DIR))
+            # falls back to a worker process:
+            worker = get_worker(NODE_PATH, FAKE_PRETTIER_DIR, mode=WORKER_MODE_SERVICE)
+            self.assertEqual(worker.mode, WORKER_MODE_PROCESS)
+        finally:
+            tempfile.tempdir = previous_temp_dir
+            shutdown_workers()
+            shutil.rmtree(temp_dir)
+
+    def test_recycle_service_worker(self):
+        stats.reset()
+        old = get_worker(NODE_PATH, FAKE_PRETTIER_DIR, mode=WORKER_MODE_SERVICE, idle_timeout=1)
+        try:
+            self._format(old, ['--no-config'])
+            self.assertGreater(old.last_stats['rss'], 0)
+            self.assertEqual(old.last_stats['requests'], 2)
+            self.assertIsNone(recycle_if_needed(old, max_requests=3))
+
+            recycle_if_needed(old, max_requests=2).join()
+            new = get_worker(NODE_PATH, FAKE_PRETTIER_DIR, mode=WORKER_MODE_SERVICE, idle_timeout=1)
+            # a new service took over the socket:
+            self.assertIsNot(new, old)
+            self.assertNotEqual(new.info['pid'], old.info['pid'])
+            self.assertFalse(old.is_alive)
+            self.assertEqual(self._format(new, ['--no-config'])['source'], 'a = 1')
+            recycles = stats.get_events('worker_recycles')
+            self.assertEqual([(e['pid'], e['reason']) for e in recycles], [(old.info['pid'], 'served 2 requests')])
+        finally:
+            shutdown_workers()
+
+    def test_failing_worker_is_not_restarted_during_backoff(self):
+        try:
+            self.assertRaises(WorkerError, get_worker, NODE_PATH, MISSING_PRETTIER_DIR)
+            # the restart is delayed, rather than retried on every format:
+            with self.assertRaises(WorkerError) as cm:
+                get_worker(NODE_PATH, MISSING_PRETTIER_DIR)
+            self.assertIn('circuit breaker is closed, retrying in', str(cm.exception))
+        finally:
+            shutdown_workers()
+
+    def test_failed_start_is_recorded_once(self):
+        try:
+            self.assertRaises(WorkerError, get_worker, NODE_PATH, MISSING_PRETTIER_DIR)
+            breaker, = worker_module._breakers.values()
+            self.assertEqual(breaker.failures, 1)
+            self.assertEqual(breaker.state, BREAKER_CLOSED)
+        finally:
+            shutdown_workers()
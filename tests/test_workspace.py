@@ -0,0 +1,79 @@
+"""Workspace index tests."""
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from jsprettier.workspace import WorkspaceIndex
+
+
+def touch(path, content='{}'):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class TestWorkspaceIndex(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def test_resolve(self):
+        touch(self.path('package.json'), '{"prettier": {"semi": false}}')
+        touch(self.path('node_modules', '.bin', 'prettier'))
+        touch(self.path('.prettierignore'), 'dist')
+        touch(self.path('packages', 'ui', 'package.json'))
+        touch(self.path('packages', 'ui', 'node_modules', '.bin', 'prettier'))
+        touch(self.path('packages', 'ui', 'src', '.prettierrc'))
+        touch(self.path('packages', 'api', 'package.json'))
+        touch(self.path('packages', 'api', 'src', 'index.js'))
+
+        index = WorkspaceIndex(self.root)
+        # not built yet (and no background build racing the assertion):
+        index.refreshed_at = time.time()
+        self.assertIsNone(index.resolve(self.path('packages', 'api', 'src', 'index.js')))
+        index.refresh()
+
+        resolution = index.resolve(self.path('packages', 'ui', 'src', 'a.js'))
+        self.assertEqual(resolution.package_root, self.path('packages', 'ui'))
+        self.assertEqual(resolution.prettier_cli_path, self.path('packages', 'ui', 'node_modules', '.bin', 'prettier'))
+        self.assertEqual(resolution.config_path, self.path('packages', 'ui', 'src', '.prettierrc'))
+        self.assertEqual(resolution.ignore_path, self.path('.prettierignore'))
+
+        # hoisted prettier, and a package.json config:
+        resolution = index.resolve(self.path('packages', 'api', 'src', 'index.js'))
+        self.assertEqual(resolution.package_root, self.path('packages', 'api'))
+        self.assertEqual(resolution.prettier_cli_path, self.path('node_modules', '.bin', 'prettier'))
+        self.assertEqual(resolution.config_path, self.path('package.json'))
+
+        # not indexed:
+        self.assertIsNone(index.resolve(self.path('node_modules', 'x', 'index.js')))
+
+    def test_incremental_refresh(self):
+        touch(self.path('package.json'))
+        touch(self.path('packages', 'api', 'src', 'index.js'))
+        index = WorkspaceIndex(self.root)
+        index.refresh()
+        self.assertIsNone(index.resolve(self.path('packages', 'api', 'src', 'index.js')).config_path)
+
+        touch(self.path('packages', 'api', '.prettierrc.json'))
+        touch(self.path('packages', 'web', 'src', 'index.js'))
+        shutil.rmtree(self.path('packages', 'api', 'src'))
+        # directory mtimes may have a coarse resolution:
+        for d in (self.path('packages'), self.path('packages', 'api')):
+            os.utime(d, (time.time() + 10, time.time() + 10))
+        index.refresh()
+
+        self.assertEqual(index.resolve(self.path('packages', 'api', 'a.js')).config_path,
+                         self.path('packages', 'api', '.prettierrc.json'))
+        self.assertIsNotNone(index.resolve(self.path('packages', 'web', 'src', 'index.js')))
+        self.assertIsNone(index.resolve(self.path('packages', 'api', 'src', 'index.js')))